@@ -25,6 +25,54 @@ class FlashcardStore: ObservableObject {
         loadStatistics()
     }
     
+    // MARK: - Manifest Loading
+    
+    // Written to EarLiLy/Images/ (bundled as Images/) by tools/export_assets.py:
+    // {"version": 1, "categories": [...], "cards": [[word, category, image, width, height, hash], ...]}
+    // where image is the card's imageset name, e.g. "food___drink-orange"
+    static let manifestVersion = 1
+    
+    static func loadFlashcardsFromManifest() -> [Flashcard]? {
+        guard let resourcePath = Bundle.main.resourcePath,
+              let data = FileManager.default.contents(atPath: resourcePath + "/Images/flashcards_manifest.json"),
+              let manifest = try? JSONSerialization.jsonObject(with: data) as? [String: Any],
+              manifest["version"] as? Int == manifestVersion,
+              let categories = manifest["categories"] as? [String],
+              let cards = manifest["cards"] as? [[Any]] else {
+            return nil
+        }
+        
+        var flashcards: [Flashcard] = []
+        flashcards.reserveCapacity(cards.count)
+        for card in cards where card.count >= 3 {
+            guard let word = card[0] as? String,
+                  let categoryIndex = card[1] as? Int, categoryIndex < categories.count,
+                  let image = card[2] as? String else {
+                continue
+            }
+            flashcards.append(Flashcard(
+                word: word.prefix(1).uppercased() + word.dropFirst(),
+                imageName: image,
+                category: category(forVocabularyCategory: categories[categoryIndex]),
+                difficulty: .easy
+            ))
+        }
+        
+        print("🗂️ Loaded \(flashcards.count) flashcards from manifest")
+        return flashcards.sorted { $0.word < $1.word }
+    }
+    
+    // Vocabulary list headings ("Animals & Creatures") -> app categories
+    static func category(forVocabularyCategory name: String) -> Flashcard.Category {
+        let name = name.lowercased()
+        let keywords: [(String, Flashcard.Category)] = [
+            ("animal", .animals), ("food", .food), ("color", .colors), ("number", .numbers),
+            ("shape", .shapes), ("people", .family), ("family", .family), ("toy", .toys),
+            ("nature", .nature), ("weather", .nature)
+        ]
+        return keywords.first { name.contains($0.0) }?.1 ?? .objects
+    }
+    
     // MARK: - Dynamic Image Loading
     
     static func loadFlashcardsFromImages() -> [Flashcard] {
@@ -142,8 +190,8 @@ class FlashcardStore: ObservableObject {
     // MARK: - Persistence
     
     private func loadFlashcards() {
-        // Always load flashcards dynamically from Images directory
-        flashcards = FlashcardStore.loadFlashcardsFromImages()
+        // One read of the generated manifest; scan the Images directory only without one
+        flashcards = FlashcardStore.loadFlashcardsFromManifest() ?? FlashcardStore.loadFlashcardsFromImages()
         
         // Fallback to sample data if no images found
         if flashcards.isEmpty {
@@ -7,11 +7,84 @@
 
 import SwiftUI
 
+// Sprite atlases packed by `tools/export_assets.py --atlases`: one index read at
+// first use, atlas pages decoded on demand and cached until memory runs low
+final class SpriteAtlas {
+    static let shared = SpriteAtlas()
+    
+    private struct Index: Decodable {
+        let version: Int
+        let scale: Int
+        let categories: [String: Category]
+    }
+    
+    private struct Category: Decodable {
+        let pages: [String]
+        let sprites: [String: [Int]] // word: [page, x, y, width, height]
+    }
+    
+    private var sprites: [String: (page: String, rect: CGRect)] = [:]
+    private var scale: CGFloat = 2
+    private let pages = NSCache<NSString, UIImage>()
+    private let atlasPath = (Bundle.main.resourcePath ?? "") + "/Atlases/"
+    
+    private init() {
+        guard let data = FileManager.default.contents(atPath: atlasPath + "atlas_index.json"),
+              let index = try? JSONDecoder().decode(Index.self, from: data),
+              index.version == 1 else {
+            return
+        }
+        scale = CGFloat(index.scale)
+        for name in index.categories.keys.sorted() {
+            let category = index.categories[name]!
+            for (word, rect) in category.sprites where rect.count == 5 && rect[0] < category.pages.count {
+                let sprite: (page: String, rect: CGRect) = (category.pages[rect[0]], CGRect(x: rect[1], y: rect[2], width: rect[3], height: rect[4]))
+                // By imageset name ("food___drink-orange", as the manifest lists cards) and by bare word
+                sprites["\(name)-\(word)"] = sprite
+                if sprites[word] == nil {
+                    sprites[word] = sprite
+                }
+            }
+        }
+        print("🗺️ Atlas index: \(sprites.count) sprites")
+    }
+    
+    // Asset name as the tools write it: lowercase, anything but [a-z0-9_-] becomes "_"
+    static func spriteName(for imageName: String) -> String {
+        let word = (imageName as NSString).lastPathComponent.lowercased()
+        return String(word.map { $0.isASCII && ($0.isLetter || $0.isNumber || $0 == "-" || $0 == "_") ? $0 : "_" })
+    }
+    
+    func image(named imageName: String) -> UIImage? {
+        guard let sprite = sprites[SpriteAtlas.spriteName(for: imageName)] else { return nil }
+        
+        var page = pages.object(forKey: sprite.page as NSString)
+        if page == nil, let loaded = UIImage(contentsOfFile: atlasPath + sprite.page) {
+            pages.setObject(loaded, forKey: sprite.page as NSString)
+            page = loaded
+        }
+        guard let cropped = page?.cgImage?.cropping(to: sprite.rect) else { return nil }
+        return UIImage(cgImage: cropped, scale: scale, orientation: .up)
+    }
+}
+
 // Helper function to load images from the Images folder in the bundle
 func loadImageFromBundle(named imageName: String) -> UIImage? {
     // Debug: Print what we're looking for
     print("🔍 Looking for image: \(imageName)")
     
+    // Packed atlases first, when the app was built with them
+    if let image = SpriteAtlas.shared.image(named: imageName) {
+        print("   ✅ Found in sprite atlas")
+        return image
+    }
+    
+    // Imageset in the asset catalog (manifest cards are named after theirs)
+    if let image = UIImage(named: imageName) {
+        print("   ✅ Found in asset catalog")
+        return image
+    }
+    
     // Try direct path in bundle (Images is copied as folder reference)
     if let resourcePath = Bundle.main.resourcePath {
         let imagePath = resourcePath + "/Images/" + imageName + ".png"
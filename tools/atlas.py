@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Sprite Atlases
+Packs each category's images from GeneratedImages/ into a few large
+texture atlases plus one compact index, instead of an imageset directory
+per word:
+
+    EarLiLy/Atlases/animals_creatures-0.png       cell grid, 2px gutters
+    EarLiLy/Atlases/atlas_index.json              word -> atlas page + rect
+
+Flashcards are all 1:1, so a fixed grid packs them without waste. Cells
+are filled in sorted word order and the PNGs carry no timestamps, so the
+same sources always give byte-identical atlases. Every category gets a
+fingerprint of its sources (names, sizes, mtimes) and the packing
+settings. Categories whose fingerprint matches the index are not
+repacked, and the changed ones are packed in a process pool.
+
+    python3 export_assets.py --atlases
+"""
+
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from image_io import DEFAULT_POINT_SIZE, write_bytes_atomic
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_ATLAS_DIR = BASE_DIR / 'EarLiLy' / 'Atlases'
+INDEX_NAME = 'atlas_index.json'
+INDEX_VERSION = 1
+
+ATLAS_SCALE = 2          # cells hold the @2x rendition of the flashcard's point size
+MAX_ATLAS_SIZE = 4096    # largest texture every supported device can load
+GUTTER = 2               # blank pixels between cells, so filtering never bleeds a neighbour in
+
+
+def category_sources(source_dir: Path) -> Dict[str, List[Path]]:
+    """Source PNGs per category directory under GeneratedImages/, in word order"""
+    sources: Dict[str, List[Path]] = {}
+    for path in sorted(Path(source_dir).glob('*/*.png')):
+        sources.setdefault(path.parent.name, []).append(path)
+    return sources
+
+
+def grid_for(count: int, cell: int, max_size: int = MAX_ATLAS_SIZE) -> Tuple[int, int]:
+    """(columns, rows per page) for `count` cells of `cell` px"""
+    pitch = cell + GUTTER
+    per_side = max(1, (max_size + GUTTER) // pitch)
+    columns = min(per_side, max(1, math.ceil(math.sqrt(count))))
+    return columns, per_side
+
+
+def fingerprint(paths: List[Path], cell: int, max_size: int) -> str:
+    """Changes whenever a source is added, removed or rewritten, or the packing settings change"""
+    digest = hashlib.sha256(f"{INDEX_VERSION}:{cell}:{GUTTER}:{max_size}".encode())
+    for path in paths:
+        stat = path.stat()
+        digest.update(f"\n{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def pack_category(task: Tuple[str, List[Path], Path, int, int]) -> Tuple[str, Dict]:
+    """
+    Worker: pack one category into atlas pages.
+
+    Returns the category's index entry: its page filenames and, for each
+    word, [page, x, y, width, height] in atlas pixels.
+    """
+    from io import BytesIO
+    from PIL import Image
+    
+    category, paths, atlas_dir, cell, max_size = task
+    columns, rows_per_page = grid_for(len(paths), cell, max_size)
+    per_page = columns * rows_per_page
+    pitch = cell + GUTTER
+    
+    pages: List[str] = []
+    sprites: Dict[str, List[int]] = {}
+    written = 0
+    for page, first in enumerate(range(0, len(paths), per_page)):
+        chunk = paths[first:first + per_page]
+        rows = math.ceil(len(chunk) / columns)
+        used_columns = min(columns, len(chunk))
+        sheet = Image.new('RGB', (used_columns * pitch - GUTTER, rows * pitch - GUTTER), 'white')
+        
+        for i, path in enumerate(chunk):
+            with Image.open(path) as img:
+                img = img.convert('RGB')
+                # Fit inside the cell, keeping the aspect ratio, centred
+                scale = min(cell / img.width, cell / img.height, 1.0)
+                size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                if size != img.size:
+                    img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+                x = (i % columns) * pitch + (cell - size[0]) // 2
+                y = (i // columns) * pitch + (cell - size[1]) // 2
+                sheet.paste(img, (x, y))
+            sprites[path.stem] = [page, x, y, size[0], size[1]]
+        
+        filename = f"{category}-{page}.png"
+        out = BytesIO()
+        sheet.save(out, 'PNG')
+        write_bytes_atomic(Path(atlas_dir) / filename, out.getvalue())
+        written += out.tell()
+        pages.append(filename)
+    
+    return category, {'pages': pages, 'sprites': sprites, 'bytes': written}
+
+
+def load_index(atlas_dir: Path) -> Dict:
+    """The current atlas index, or an empty one if missing, unreadable or from another version"""
+    try:
+        index = json.loads((Path(atlas_dir) / INDEX_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+    return index if index.get('version') == INDEX_VERSION else {}
+
+
+def pack_atlases(source_dir: Path, atlas_dir: Path = DEFAULT_ATLAS_DIR,
+                 point_size: int = DEFAULT_POINT_SIZE, max_size: int = MAX_ATLAS_SIZE,
+                 workers: Optional[int] = None, force: bool = False) -> Dict:
+    """Repack every category whose sources changed and rewrite the index; returns counts"""
+    atlas_dir = Path(atlas_dir)
+    atlas_dir.mkdir(parents=True, exist_ok=True)
+    cell = min(point_size * ATLAS_SCALE, max_size)
+    
+    previous = load_index(atlas_dir).get('categories', {})
+    categories: Dict[str, Dict] = {}
+    tasks = []
+    for category, paths in category_sources(source_dir).items():
+        key = fingerprint(paths, cell, max_size)
+        old = previous.get(category)
+        if (not force and old and old.get('fingerprint') == key
+                and all((atlas_dir / page).exists() for page in old['pages'])):
+            categories[category] = old
+        else:
+            categories[category] = {'fingerprint': key}
+            tasks.append((category, paths, atlas_dir, cell, max_size))
+    
+    stats = {'packed': len(tasks), 'skipped': len(categories) - len(tasks), 'bytes': 0, 'removed': 0}
+    if tasks:
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        with ProcessPoolExecutor(workers) as pool:
+            for category, entry in pool.map(pack_category, tasks):
+                stats['bytes'] += entry.pop('bytes')
+                categories[category].update(entry)
+    
+    # Pages of removed categories, or beyond a category's new page count
+    keep = {page for entry in categories.values() for page in entry['pages']}
+    for entry in previous.values():
+        for page in entry.get('pages', []):
+            if page not in keep and (atlas_dir / page).exists():
+                (atlas_dir / page).unlink()
+                stats['removed'] += 1
+    
+    index = {
+        'version': INDEX_VERSION,
+        'cell': cell,
+        'scale': ATLAS_SCALE,
+        'categories': {category: categories[category] for category in sorted(categories)},
+    }
+    data = json.dumps(index, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    index_path = atlas_dir / INDEX_NAME
+    if not index_path.exists() or index_path.read_bytes() != data:
+        write_bytes_atomic(index_path, data)
+    
+    stats['categories'] = len(categories)
+    stats['sprites'] = sum(len(entry['sprites']) for entry in categories.values())
+    stats['pages'] = len(keep)
+    stats['index_bytes'] = len(data)
+    return stats
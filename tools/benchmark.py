@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Generation Benchmark
+Runs ImagenFlashcardGenerator.generate_all end to end against the local
+mock Imagen server and reports throughput, tail latency, CPU time and peak
+RSS as JSON, so runs can be compared across changes.
+
+Each scenario runs the generator in a fresh subprocess with its own temp
+output, metadata and cache directories; the mock server stays in this
+process so its CPU time isn't counted against the generator.
+
+`--startup` instead times how long each earlily-tools command takes to
+reach its argument parser (median of fresh interpreters), and fails if a
+light command (plan, status, verify) imports requests, PIL, tqdm or numpy.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from earlily_tools import COMMANDS, HEAVY_MODULES, LIGHT_COMMANDS
+from mock_imagen_server import MockImagenConfig, MockImagenServer, add_config_arguments, config_from_args
+from planner import percentile
+from vocabulary import parse_vocabulary
+
+VOCAB_FILE = Path(__file__).parent / 'earlily_vocab_list.md'
+
+# Built-in suite: realistic latency, then the same under throttling and errors
+SCENARIOS = {
+    'baseline': MockImagenConfig(latency_ms=400, p95_ms=900, per_image_ms=50, payload_kb=400, seed=1),
+    'throttled': MockImagenConfig(latency_ms=400, p95_ms=900, per_image_ms=50, payload_kb=400,
+                                  throttle_rate=0.1, retry_after=0.5, seed=1),
+    'flaky': MockImagenConfig(latency_ms=400, p95_ms=900, per_image_ms=50, payload_kb=400,
+                              error_rate=0.05, filter_rate=0.02, seed=1),
+}
+
+# Metrics shown by --compare; True when higher is better
+COMPARED_METRICS = {
+    'images_per_second': True,
+    'request_latency_p95': False,
+    'image_elapsed_p99': False,
+    'cpu_seconds': False,
+    'peak_rss_mb': False,
+}
+STARTUP_METRICS = {
+    'median_ms': False,
+}
+
+# Runs one tools command in a fresh interpreter, then prints which heavy modules it imported
+STARTUP_CHILD = """
+import json, runpy, sys
+sys.path.insert(0, sys.argv[1])
+sys.argv = sys.argv[2:]
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit:
+    pass
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+
+
+def rss_mb(maxrss: int) -> float:
+    """ru_maxrss is KB on Linux and bytes on macOS"""
+    return maxrss / 1024 ** 2 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def write_vocabulary(path: Path, words: int):
+    """Benchmark vocabulary: the first `words` words of the real list, round-robin across categories"""
+    categories = parse_vocabulary(VOCAB_FILE)
+    picked: Dict[str, List[str]] = {category: [] for category in categories}
+    queues = {category: list(dict.fromkeys(ws)) for category, ws in categories.items()}
+    seen = set()
+    while len(seen) < words and any(queues.values()):
+        for category, queue in queues.items():
+            while queue and queue[0] in seen:
+                queue.pop(0)
+            if queue and len(seen) < words:
+                word = queue.pop(0)
+                seen.add(word)
+                picked[category].append(word)
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# Benchmark Vocabulary\n")
+        for category, ws in picked.items():
+            if ws:
+                f.write(f"\n## {category}\n\n{', '.join(ws)}\n")
+
+
+def run_child(settings_file: Path):
+    """Subprocess body: one generate_all run, measured from the inside"""
+    with open(settings_file, 'r') as f:
+        settings = json.load(f)
+    work_dir = Path(settings['work_dir'])
+    
+    from generate_images_imagen import ImagenFlashcardGenerator
+    
+    start_self = resource.getrusage(resource.RUSAGE_SELF)
+    start_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    
+    with open(work_dir / 'generator.log', 'w') as log, redirect_stdout(log):
+        generator = ImagenFlashcardGenerator(
+            api_key='mock-key',
+            concurrency=settings['concurrency'],
+            requests_per_second=settings['rate'],
+            batch_size=settings['batch_size'],
+            cpu_workers=settings['cpu_workers'],
+            base_dir=work_dir,
+            metadata_file=work_dir / 'image_generation_log.json',
+            metrics_file=work_dir / 'metrics.json'
+        )
+        generator.generate_all(Path(settings['vocab_file']), confirm=False)
+    
+    wall = time.perf_counter() - start
+    end_self = resource.getrusage(resource.RUSAGE_SELF)
+    end_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    
+    entries = [e for e in generator.store.generated_entries() if not e.get('cached')]
+    latencies = [e['latency'] for e in entries if 'latency' in e]
+    elapsed = [e['elapsed'] for e in entries if 'elapsed' in e]
+    cpu = ((end_self.ru_utime + end_self.ru_stime) - (start_self.ru_utime + start_self.ru_stime)
+           + (end_children.ru_utime + end_children.ru_stime)
+           - (start_children.ru_utime + start_children.ru_stime))
+    
+    result = {
+        'images': len(entries),
+        'failed': generator.store.failure_count,
+        'wall_seconds': round(wall, 3),
+        'images_per_second': round(len(entries) / wall, 3) if wall else 0.0,
+        'request_latency_p50': round(percentile(latencies, 50), 4),
+        'request_latency_p95': round(percentile(latencies, 95), 4),
+        'request_latency_p99': round(percentile(latencies, 99), 4),
+        'image_elapsed_p50': round(percentile(elapsed, 50), 4),
+        'image_elapsed_p95': round(percentile(elapsed, 95), 4),
+        'image_elapsed_p99': round(percentile(elapsed, 99), 4),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_seconds_per_image': round(cpu / len(entries), 4) if entries else None,
+        'peak_rss_mb': round(rss_mb(end_self.ru_maxrss), 1),
+        'peak_rss_children_mb': round(rss_mb(end_children.ru_maxrss), 1),
+    }
+    with open(generator.metrics.path, 'r') as f:
+        histograms = json.load(f)['histograms']
+    # Per-stage p50/p95/p99 from the generator's own timers
+    result['stages'] = {
+        name.split('[stage=')[1].rstrip(']'): summary
+        for name, summary in histograms.items() if name.startswith('earlily_stage_seconds[')
+    }
+    generator.store.close()
+    
+    with open(settings['result_file'], 'w') as f:
+        json.dump(result, f)
+
+
+def run_scenario(name: str, config: MockImagenConfig, words: int, concurrency: int, rate: float,
+                 batch_size: int, cpu_workers: Optional[int], keep: bool = False) -> Dict:
+    """Start the mock server, run the generator subprocess against it, collect results"""
+    server = MockImagenServer(config).start()
+    work_dir = Path(tempfile.mkdtemp(prefix=f'earlily-bench-{name}-'))
+    try:
+        vocab_file = work_dir / 'vocabulary.md'
+        write_vocabulary(vocab_file, words)
+        settings = {
+            'work_dir': str(work_dir),
+            'vocab_file': str(vocab_file),
+            'result_file': str(work_dir / 'result.json'),
+            'concurrency': concurrency,
+            'rate': rate,
+            'batch_size': batch_size,
+            'cpu_workers': cpu_workers,
+        }
+        settings_file = work_dir / 'settings.json'
+        settings_file.write_text(json.dumps(settings))
+        
+        env = dict(os.environ,
+                   IMAGEN_ENDPOINT=server.endpoint,
+                   GENERATION_CACHE_DIR=str(work_dir / 'cache'),
+                   VOCAB_SNAPSHOT_FILE=str(work_dir / 'vocabulary_snapshot.json'))
+        subprocess.run([sys.executable, __file__, '--child', str(settings_file)],
+                       env=env, cwd=Path(__file__).parent, check=True, stderr=subprocess.DEVNULL)
+        
+        with open(settings['result_file'], 'r') as f:
+            result = json.load(f)
+        result['server'] = dict(server.stats)
+        result['mock'] = config.as_dict()
+        return result
+    finally:
+        server.stop()
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_startup(command: Optional[str], runs: int) -> Dict:
+    """Median time for `earlily-tools [command] --help` in fresh interpreters, and the heavy modules it loads"""
+    script = Path(__file__).parent / 'earlily_tools.py'
+    argv = [command, '--help'] if command else ['--help']
+    code = STARTUP_CHILD.format(heavy=HEAVY_MODULES)
+    times = []
+    heavy: List[str] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', code, str(script.parent), str(script), *argv],
+                                   capture_output=True, text=True, check=True)
+        times.append(time.perf_counter() - start)
+        heavy = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {
+        'median_ms': round(percentile(times, 50) * 1000, 1),
+        'min_ms': round(min(times) * 1000, 1),
+        'heavy_modules': heavy,
+    }
+
+
+def run_startup_suite(runs: int, max_ms: Optional[float] = None) -> Tuple[Dict, List[str]]:
+    """Time every command; problems are light commands that load heavy modules or exceed `max_ms`"""
+    interpreter = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        interpreter.append(time.perf_counter() - start)
+    results = {'python': {'median_ms': round(percentile(interpreter, 50) * 1000, 1), 'heavy_modules': []}}
+    problems = []
+    
+    for command in [None, *COMMANDS]:
+        name = command or 'earlily-tools'
+        result = run_startup(command, runs)
+        results[name] = result
+        light = command is None or command in LIGHT_COMMANDS
+        print(f"   {name}: {result['median_ms']:.0f} ms"
+              f"{' (loads ' + ', '.join(result['heavy_modules']) + ')' if result['heavy_modules'] else ''}",
+              file=sys.stderr)
+        if light and result['heavy_modules']:
+            problems.append(f"{name} imports {', '.join(result['heavy_modules'])}")
+        if light and max_ms is not None and result['median_ms'] > max_ms:
+            problems.append(f"{name} takes {result['median_ms']:.0f} ms (limit {max_ms:g} ms)")
+    return results, problems
+
+
+def compare(previous: Dict, current: Dict):
+    """Print metric changes between two result files (to stderr, keeping stdout JSON)"""
+    print("\n📈 Compared with previous run", file=sys.stderr)
+    for section, metrics in (('scenarios', COMPARED_METRICS), ('startup', STARTUP_METRICS)):
+        for name, result in current.get(section, {}).items():
+            old = previous.get(section, {}).get(name)
+            if not old:
+                continue
+            print(f"   {name}:", file=sys.stderr)
+            compare_metrics(old, result, metrics)
+
+
+def compare_metrics(old: Dict, result: Dict, metrics: Dict[str, bool]):
+    for metric, higher_is_better in metrics.items():
+        before, after = old.get(metric), result.get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        better = change > 0 if higher_is_better else change < 0
+        marker = '✅' if better else ('⚠️ ' if abs(change) > 0.05 else '  ')
+        print(f"     {marker} {metric}: {before:g} → {after:g} ({100 * change:+.1f}%)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark generate_all against a local mock Imagen server (no quota used)'
+    )
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS) + ['custom'],
+                        help='Scenario to run, repeatable (default: every built-in scenario); '
+                             'custom uses the mock options below')
+    parser.add_argument('--words', type=int, default=100, help='Words per scenario (default: 100)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Generator workers (default: 4)')
+    parser.add_argument('--rate', type=float, default=0, help='Requests per second, 0 = unlimited (default: 0)')
+    parser.add_argument('--batch-size', type=int, default=5, help='Words per request (default: 5)')
+    parser.add_argument('--cpu-workers', type=int, help='Asset-writing processes (default: CPU count)')
+    parser.add_argument('--output', type=Path, help='Write results JSON here (default: stdout)')
+    parser.add_argument('--compare', type=Path, help='Previous results JSON to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep each scenario\'s temp directory')
+    parser.add_argument('--startup', action='store_true',
+                        help='Time earlily-tools command startup instead of running scenarios')
+    parser.add_argument('--startup-runs', type=int, default=5, help='Interpreter launches per command (default: 5)')
+    parser.add_argument('--max-startup-ms', type=float,
+                        help='With --startup: fail if a light command (plan, status, verify) starts slower than this')
+    parser.add_argument('--child', type=Path, help=argparse.SUPPRESS)
+    add_config_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args.child)
+        return
+    
+    names = [] if args.startup else args.scenario or list(SCENARIOS)
+    results = {
+        'version': 1,
+        'timestamp': time.time(),
+        'git_commit': subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                     cwd=Path(__file__).parent).stdout.strip() or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {
+            'words': args.words,
+            'concurrency': args.concurrency,
+            'rate': args.rate,
+            'batch_size': args.batch_size,
+            'cpu_workers': args.cpu_workers,
+        },
+        'scenarios': {},
+    }
+    problems = []
+    if args.startup:
+        print(f"⏱️  earlily-tools startup, median of {args.startup_runs} run(s):", file=sys.stderr)
+        results['startup'], problems = run_startup_suite(args.startup_runs, args.max_startup_ms)
+    
+    for name in names:
+        config = config_from_args(args) if name == 'custom' else SCENARIOS[name]
+        print(f"⏱️  {name}: {args.words} words...", file=sys.stderr)
+        result = run_scenario(name, config, args.words, args.concurrency, args.rate,
+                              args.batch_size, args.cpu_workers, args.keep)
+        results['scenarios'][name] = result
+        print(f"   {result['images_per_second']:.2f} images/s, "
+              f"p95 request {result['request_latency_p95']:.2f}s, "
+              f"p99 per image {result['image_elapsed_p99']:.2f}s, "
+              f"CPU {result['cpu_seconds']:.1f}s, peak RSS {result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+    
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + '\n')
+        print(f"💾 Results: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), results)
+    
+    if problems:
+        print("\n❌ Startup regressions:", file=sys.stderr)
+        for problem in problems:
+            print(f"   - {problem}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Circuit Breaker
+Shared by every generation worker so an API outage or an exhausted quota
+pauses the whole run instead of burning every word's retries.
+
+    closed     requests flow; CIRCUIT_THRESHOLD consecutive quota / 5xx /
+               network errors trip it open
+    open       nothing is sent for the cool-down (CIRCUIT_COOLDOWN seconds,
+               doubling per failed probe up to CIRCUIT_MAX_COOLDOWN)
+    half-open  one probe request goes through: any answer from the API (even
+               a 429, which the rate limiter backs off from) closes the
+               circuit, another quota / 5xx / network error re-opens it
+
+Once the circuit has been open for CIRCUIT_GIVE_UP seconds in total, the
+breaker gives up: workers stop without sending (or failing) anything else,
+and the run exits with a resumable status.
+
+    python3 circuit_breaker.py    # check the state transitions (no API calls)
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+import rate_limiter
+from metrics import METRICS
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# Error classes that point at the API or the quota, not the request
+TRIPPING = {rate_limiter.QUOTA, rate_limiter.TRANSIENT}
+
+# Responses that prove the API is up (a filtered or rejected request still got an answer)
+HEALTHY = {rate_limiter.OK, rate_limiter.EMPTY, rate_limiter.FATAL}
+
+METRICS.describe('earlily_circuit_state', 'Circuit breaker state (0 closed, 1 open, 2 half-open)')
+METRICS.describe('earlily_circuit_trips_total', 'Times the circuit breaker opened')
+
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker:
+    """Consecutive-error breaker with a single half-open probe"""
+    
+    def __init__(self, threshold: Optional[int] = None, cooldown: Optional[float] = None,
+                 max_cooldown: Optional[float] = None, give_up_after: Optional[float] = None):
+        """
+        Args:
+            threshold: Consecutive errors that trip the circuit, 0 = disabled (or CIRCUIT_THRESHOLD, default 5)
+            cooldown: First pause before a probe (or CIRCUIT_COOLDOWN, default 60s)
+            max_cooldown: Longest pause between probes (or CIRCUIT_MAX_COOLDOWN, default 600s)
+            give_up_after: Total open time before the run stops (or CIRCUIT_GIVE_UP, default 1800s)
+        """
+        self.threshold = threshold if threshold is not None else int(os.getenv('CIRCUIT_THRESHOLD', 5))
+        self.base_cooldown = cooldown if cooldown is not None else float(os.getenv('CIRCUIT_COOLDOWN', 60))
+        self.max_cooldown = max_cooldown if max_cooldown is not None else float(os.getenv('CIRCUIT_MAX_COOLDOWN', 600))
+        self.give_up_after = (give_up_after if give_up_after is not None
+                              else float(os.getenv('CIRCUIT_GIVE_UP', 1800)))
+        
+        self.state = CLOSED
+        self.consecutive = 0
+        self.last_error: Optional[str] = None
+        self.cooldown = self.base_cooldown
+        self.opened_at = 0.0
+        self.outage_started: Optional[float] = None
+        self.probe_thread: Optional[int] = None
+        self.gave_up = False
+        self.trips = 0
+        self.condition = threading.Condition()
+        METRICS.set('earlily_circuit_state', 0)
+    
+    @property
+    def tripped(self) -> bool:
+        """Open, probing or given up - i.e. the API is currently considered down"""
+        return self.state != CLOSED or self.gave_up
+    
+    def _set_state(self, state: str):
+        self.state = state
+        METRICS.set('earlily_circuit_state', STATE_VALUES[state])
+    
+    def _open(self, now: float):
+        self._set_state(OPEN)
+        self.opened_at = now
+        self.probe_thread = None
+        if self.outage_started is None:
+            self.outage_started = now
+        if now - self.outage_started >= self.give_up_after:
+            self.gave_up = True
+            print(f"   🔌 API still failing after {now - self.outage_started:.0f}s "
+                  f"({self.last_error}) - stopping, rerun to resume")
+        else:
+            print(f"   🔌 Circuit open after {self.consecutive} consecutive {self.last_error} error(s) - "
+                  f"pausing {self.cooldown:.0f}s before a probe")
+        self.condition.notify_all()
+    
+    def _close(self):
+        print("   🔌 API responding again - circuit closed, resuming")
+        self.cooldown = self.base_cooldown
+        self.outage_started = None
+        self.probe_thread = None
+        self._set_state(CLOSED)
+        self.condition.notify_all()
+    
+    def allow(self, stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        Block while the circuit is open; True when a request may be sent.
+
+        Returns False if the breaker gave up or a stop was requested.
+        """
+        with self.condition:
+            while True:
+                if self.gave_up or (stop_event is not None and stop_event.is_set()):
+                    return False
+                if self.state == CLOSED:
+                    return True
+                
+                now = time.monotonic()
+                if self.state == OPEN and now >= self.opened_at + self.cooldown:
+                    # This caller is the probe; everyone else waits for its outcome
+                    self._set_state(HALF_OPEN)
+                    self.probe_thread = threading.get_ident()
+                    return True
+                
+                wait = self.opened_at + self.cooldown - now if self.state == OPEN else 1.0
+                # Wake periodically so a stop request is noticed
+                self.condition.wait(min(max(wait, 0.01), 1.0))
+    
+    def record(self, kind: str):
+        """Feed a response class back into the breaker"""
+        if self.threshold <= 0:
+            return
+        with self.condition:
+            now = time.monotonic()
+            if kind in HEALTHY:
+                if self.state != CLOSED:
+                    self._close()
+                self.consecutive = 0
+                return
+            
+            if kind not in TRIPPING:
+                # e.g. a 429: the API is up, so a probe that got one must still settle the
+                # state, or every worker waits on a half-open circuit forever
+                if self.state == HALF_OPEN:
+                    self._close()
+                    self.consecutive = 0
+                return
+            self.consecutive += 1
+            self.last_error = kind
+            
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._open(now)
+            elif self.state == CLOSED and self.consecutive >= self.threshold:
+                self.trips += 1
+                METRICS.inc('earlily_circuit_trips_total')
+                self._open(now)
+    
+    def release_probe(self):
+        """The calling thread's probe was never sent (e.g. no budget left) - let another caller probe"""
+        with self.condition:
+            if self.state == HALF_OPEN and self.probe_thread == threading.get_ident():
+                self._set_state(OPEN)
+                self.opened_at = time.monotonic() - self.cooldown
+                self.probe_thread = None
+                self.condition.notify_all()
+
+
+def check():
+    """Drive a breaker through its transitions; raises AssertionError on a regression"""
+    stop = threading.Event()
+    for probe_result, expected in ((rate_limiter.OK, CLOSED), (rate_limiter.THROTTLED, CLOSED),
+                                   (rate_limiter.TRANSIENT, OPEN)):
+        breaker = CircuitBreaker(threshold=2, cooldown=0, max_cooldown=0, give_up_after=60)
+        breaker.record(rate_limiter.TRANSIENT)
+        breaker.record(rate_limiter.THROTTLED)   # doesn't trip, doesn't reset the count either
+        breaker.record(rate_limiter.TRANSIENT)
+        assert breaker.state == OPEN, breaker.state
+        assert breaker.allow(stop) and breaker.state == HALF_OPEN
+        breaker.record(probe_result)
+        assert breaker.state == expected, f"probe got {probe_result}: {breaker.state}, expected {expected}"
+        if expected == CLOSED:
+            assert breaker.allow(stop)
+    print("✅ Circuit breaker transitions OK")
+
+
+if __name__ == '__main__':
+    check()
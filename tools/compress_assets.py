@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Asset Compression
+Converts FlashcardImages PNGs to 8-bit palette PNGs within a per-image
+byte budget. The flat cartoon-on-white art the prompts ask for needs far
+fewer than 256 colours, so this typically cuts file size by more than half.
+
+Each image is quantized at decreasing palette sizes (Pillow's C quantizer
+works on the whole image at once) and the first candidate that fits the
+budget is kept, unless it differs visibly from the original: every
+candidate must stay above a PSNR floor, or the image is left untouched.
+
+This rewrites PNGs in place, so the next export of a changed source (or
+`export_assets.py --force`) brings the full-colour renditions back. Use
+`export_assets.py --compress` to quantize as part of the export instead,
+which keeps the result through re-exports.
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from image_io import write_bytes_atomic
+
+DEFAULT_ASSETS_DIR = Path(__file__).parent.parent / 'EarLiLy' / 'Assets.xcassets' / 'FlashcardImages'
+PALETTE_SIZES = (256, 128, 64, 32)
+DEFAULT_BUDGET_KB = 150
+DEFAULT_MIN_PSNR = 38.0
+
+
+def psnr(original, candidate) -> float:
+    """Peak signal-to-noise ratio in dB across all channels (inf if identical)"""
+    from PIL import ImageChops, ImageStat
+    
+    diff = ImageChops.difference(original, candidate)
+    mse = sum(ImageStat.Stat(diff).sum2) / (diff.width * diff.height * len(diff.getbands()))
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 ** 2 / mse)
+
+
+def quantize_png(img, colors: int) -> Tuple[bytes, object]:
+    """Palette-quantize without dithering; returns PNG bytes and the image as decoded"""
+    from PIL import Image
+    
+    if img.mode == 'RGBA':
+        quantized = img.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    else:
+        quantized = img.quantize(colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    out = BytesIO()
+    quantized.save(out, 'PNG', optimize=True)
+    return out.getvalue(), quantized.convert(img.mode)
+
+
+def best_palette_png(img, budget: int, min_psnr: float) -> Tuple[Optional[Tuple[bytes, int, float]], bool]:
+    """
+    Largest palette that fits `budget` without falling below `min_psnr`.
+
+    Returns ((PNG bytes, colours, PSNR) or None, whether the first candidate
+    already fell below the floor). `img` must be RGB or RGBA.
+    """
+    best: Optional[Tuple[bytes, int, float]] = None
+    for colors in PALETTE_SIZES:
+        data, decoded = quantize_png(img, colors)
+        quality = psnr(img, decoded)
+        if quality < min_psnr:
+            # Fewer colours only gets worse
+            return best, best is None
+        best = (data, colors, quality)
+        if len(data) <= budget:
+            break
+    return best, False
+
+
+def encode_rendition(img, budget: int, min_psnr: float) -> bytes:
+    """PNG bytes for an export rendition: the palette candidate when it beats a plain PNG"""
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    out = BytesIO()
+    img.save(out, 'PNG')
+    best, _ = best_palette_png(img, budget, min_psnr)
+    if best is not None and len(best[0]) < out.tell():
+        return best[0]
+    return out.getvalue()
+
+
+def compress_png(path: Path, budget: int, min_psnr: float) -> Dict:
+    """
+    Compress one PNG in place.
+
+    Returns {'status', 'before', 'after', 'colors', 'psnr'} where status is
+    'compressed', 'skipped' (already a palette PNG), 'kept' (no candidate
+    beat the original) or 'regression' (every candidate fell below min_psnr).
+    """
+    from PIL import Image
+    
+    before = path.stat().st_size
+    result = {'status': 'kept', 'before': before, 'after': before, 'colors': None, 'psnr': None}
+    
+    with Image.open(path) as img:
+        if img.mode in ('P', 'L', '1'):
+            result['status'] = 'skipped'
+            return result
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    
+    best, regressed = best_palette_png(img, budget, min_psnr)
+    if best is None or len(best[0]) >= before:
+        if regressed:
+            result['status'] = 'regression'
+        return result
+    
+    data, colors, quality = best
+    write_bytes_atomic(path, data)
+    result.update(status='compressed', after=len(data), colors=colors, psnr=quality)
+    return result
+
+
+def compress_one(task: Tuple[Path, int, float]) -> Tuple[Path, Dict]:
+    """Worker wrapper that reports errors instead of raising"""
+    path, budget, min_psnr = task
+    try:
+        return path, compress_png(path, budget, min_psnr)
+    except Exception as e:
+        size = path.stat().st_size if path.exists() else 0
+        return path, {'status': f"{type(e).__name__}: {e}", 'before': size, 'after': size}
+
+
+def compress_all(assets_dir: Path = DEFAULT_ASSETS_DIR, budget: int = DEFAULT_BUDGET_KB * 1024,
+                 min_psnr: float = DEFAULT_MIN_PSNR, workers: int = None) -> Dict:
+    """Compress every imageset PNG; returns counts and byte totals"""
+    paths = sorted(Path(assets_dir).glob('*.imageset/*.png'))
+    workers = workers or os.cpu_count() or 1
+    
+    stats = {'compressed': 0, 'skipped': 0, 'kept': 0, 'regression': 0, 'failed': 0,
+             'bytes_before': 0, 'bytes_after': 0, 'over_budget': 0}
+    failures: List[Tuple[str, str]] = []
+    
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        tasks = [(path, budget, min_psnr) for path in paths]
+        chunksize = max(1, len(tasks) // (workers * 8))
+        for path, result in tqdm(pool.map(compress_one, tasks, chunksize=chunksize),
+                                 total=len(tasks), desc='Compressing'):
+            if result['status'] in stats:
+                stats[result['status']] += 1
+            else:
+                stats['failed'] += 1
+                failures.append((path.name, result['status']))
+            stats['bytes_before'] += result['before']
+            stats['bytes_after'] += result['after']
+            if result['after'] > budget:
+                stats['over_budget'] += 1
+    
+    stats['bytes_saved'] = stats['bytes_before'] - stats['bytes_after']
+    stats['failures'] = failures
+    stats['files'] = len(paths)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Palette-quantize FlashcardImages PNGs within a byte budget'
+    )
+    parser.add_argument('--assets', type=Path, default=DEFAULT_ASSETS_DIR, help='FlashcardImages asset folder')
+    parser.add_argument('--budget-kb', type=float, default=float(os.getenv('PNG_BUDGET_KB', DEFAULT_BUDGET_KB)),
+                        help=f'Target size per PNG (or set PNG_BUDGET_KB env var, default: {DEFAULT_BUDGET_KB})')
+    parser.add_argument('--min-psnr', type=float, default=float(os.getenv('PNG_MIN_PSNR', DEFAULT_MIN_PSNR)),
+                        help=f'Visual regression floor in dB (or set PNG_MIN_PSNR env var, default: {DEFAULT_MIN_PSNR})')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    
+    args = parser.parse_args()
+    
+    if not args.assets.exists():
+        print(f"❌ Error: Asset folder not found: {args.assets}")
+        return
+    
+    print("🗜️  Compressing flashcard assets")
+    print(f"   Assets: {args.assets}")
+    print(f"   Budget: {args.budget_kb:g} KB per image, quality floor {args.min_psnr:g} dB PSNR")
+    
+    stats = compress_all(args.assets, int(args.budget_kb * 1024), args.min_psnr, args.workers)
+    
+    before, after = stats['bytes_before'], stats['bytes_after']
+    print(f"\n✅ Compressed {stats['compressed']} of {stats['files']} PNGs in {stats['seconds']:.1f}s")
+    print(f"   Already palette: {stats['skipped']}, no gain: {stats['kept']}, "
+          f"kept for quality: {stats['regression']}, failed: {stats['failed']}")
+    print(f"   Size: {before / 1024 ** 2:.1f} MB → {after / 1024 ** 2:.1f} MB "
+          f"(saved {stats['bytes_saved'] / 1024 ** 2:.1f} MB, {100 * stats['bytes_saved'] / max(before, 1):.0f}%)")
+    if stats['over_budget']:
+        print(f"   ⚠️  {stats['over_budget']} PNG(s) still over budget (quality floor reached)")
+    for name, error in stats['failures']:
+        print(f"   ❌ {name}: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Credential Pool
+Spreads Imagen requests across several API keys, each with its own
+adaptive rate limit, so throughput isn't capped at one key's quota.
+
+Every request goes to the least-loaded usable key: soonest free token
+first, then fewest requests in flight. A throttled key is paused for as
+long as the server asked (other keys keep working); a key whose daily quota
+is used up, or that is rejected as invalid or revoked, leaves rotation for
+the rest of the run. Per-key requests, outcomes, rate and remaining quota
+are recorded in the run metrics.
+
+Keys come from GEMINI_API_KEYS (comma-separated) and/or GEMINI_API_KEY.
+"""
+
+import os
+import threading
+import time
+from typing import List, Optional, Union
+
+import rate_limiter
+from metrics import METRICS
+from rate_limiter import AdaptiveRateLimiter
+
+METRICS.describe('earlily_key_requests_total', 'API requests per key by outcome')
+METRICS.describe('earlily_key_rate', 'Current adaptive request rate per key (req/s)')
+METRICS.describe('earlily_key_quota_remaining', 'Requests left in the configured KEY_QUOTA per key')
+METRICS.describe('earlily_key_available', 'Whether a key is in rotation (1) or out of it (0)')
+
+# HTTP statuses meaning the key itself was rejected (not the request)
+REJECTED_STATUSES = (401, 403)
+REJECTED_MARKERS = ('api_key_invalid', 'api key not valid', 'api key expired', 'permission_denied')
+
+
+def load_api_keys(api_keys: Union[str, List[str], None] = None) -> List[str]:
+    """Keys from the argument, else GEMINI_API_KEYS and GEMINI_API_KEY; duplicates dropped"""
+    if isinstance(api_keys, str):
+        api_keys = [api_keys]
+    if not api_keys:
+        api_keys = os.getenv('GEMINI_API_KEYS', '').split(',') + [os.getenv('GEMINI_API_KEY', '')]
+    keys = [key.strip() for key in api_keys if key and key.strip()]
+    return list(dict.fromkeys(keys))
+
+
+class ApiKey:
+    """One credential and its usage"""
+    
+    def __init__(self, key: str, limiter: AdaptiveRateLimiter, quota: Optional[int] = None):
+        self.key = key
+        self.label = f"...{key[-4:]}"
+        self.limiter = limiter
+        self.quota_remaining = quota
+        self.in_flight = 0
+        self.requests = 0
+        self.outcomes = {}
+        self.removed: Optional[str] = None  # why the key left rotation
+    
+    @property
+    def usable(self) -> bool:
+        return self.removed is None and (self.quota_remaining is None or self.quota_remaining > 0)
+    
+    def wait_time(self, now: float) -> float:
+        """Seconds until this key could send (server pause or token deficit)"""
+        with self.limiter.lock:
+            pause = max(0.0, self.limiter.paused_until - now)
+            if self.limiter.rate <= 0:
+                return pause
+            self.limiter._refill(now)
+            deficit = max(0.0, 1.0 - self.limiter.tokens) / self.limiter.rate
+        return max(pause, deficit)
+
+
+class CredentialPool:
+    """Least-loaded selection over several API keys"""
+    
+    def __init__(self, keys: List[str], rate: float, capacity: Optional[float] = None,
+                 min_rate: float = 0.1, max_rate: Optional[float] = None, quota: Optional[int] = None):
+        """
+        Args:
+            keys: API keys (at least one)
+            rate: Starting requests per second, per key (0 = unlimited)
+            capacity: Burst size per key
+            min_rate / max_rate: Per-key AIMD bounds (see AdaptiveRateLimiter)
+            quota: Requests each key may make this run, e.g. what's left of its daily quota (or KEY_QUOTA env var)
+        """
+        if not keys:
+            raise ValueError("No API keys given")
+        if quota is None and os.getenv('KEY_QUOTA'):
+            quota = int(os.getenv('KEY_QUOTA'))
+        self.keys = [
+            ApiKey(key, AdaptiveRateLimiter(rate, capacity=capacity, min_rate=min_rate, max_rate=max_rate), quota)
+            for key in keys
+        ]
+        self.lock = threading.Lock()
+        for api_key in self.keys:
+            self._update_gauges(api_key)
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    @property
+    def usable_keys(self) -> List[ApiKey]:
+        return [k for k in self.keys if k.usable]
+    
+    def _pick(self) -> Optional[ApiKey]:
+        now = time.monotonic()
+        usable = self.usable_keys
+        if not usable:
+            return None
+        return min(usable, key=lambda k: (round(k.wait_time(now), 2), k.in_flight, k.requests))
+    
+    def acquire(self, stop_event: Optional[threading.Event] = None) -> Optional[ApiKey]:
+        """
+        Reserve the least-loaded key, waiting for its rate limit.
+
+        Returns None if a stop was requested while waiting or no key is left
+        in rotation.
+        """
+        while True:
+            with self.lock:
+                api_key = self._pick()
+                if api_key is None:
+                    return None
+                api_key.in_flight += 1
+            
+            if not api_key.limiter.acquire(stop_event=stop_event):
+                with self.lock:
+                    api_key.in_flight -= 1
+                return None
+            
+            with self.lock:
+                # Quota may have run out (or the key been rejected) while waiting
+                if api_key.usable:
+                    api_key.requests += 1
+                    if api_key.quota_remaining is not None:
+                        api_key.quota_remaining -= 1
+                    self._update_gauges(api_key)
+                    return api_key
+                api_key.in_flight -= 1
+    
+    def release(self, api_key: ApiKey, kind: str, status_code: Optional[int] = None,
+                retry_after: Optional[float] = None, detail: str = '') -> bool:
+        """
+        Record a request's outcome on its key.
+
+        Returns True if a failed request's key is out of rotation (because of
+        this response or a concurrent one), so it can be retried on another key.
+        """
+        api_key.limiter.record(kind, retry_after)
+        removed = False
+        with self.lock:
+            api_key.in_flight -= 1
+            api_key.outcomes[kind] = api_key.outcomes.get(kind, 0) + 1
+            
+            if api_key.removed is None:
+                if kind == rate_limiter.QUOTA:
+                    api_key.removed = 'quota exhausted'
+                    removed = True
+                elif kind == rate_limiter.FATAL and (
+                        status_code in REJECTED_STATUSES
+                        or any(marker in detail.lower() for marker in REJECTED_MARKERS)):
+                    api_key.removed = 'rejected'
+                    removed = True
+            self._update_gauges(api_key)
+        
+        METRICS.inc('earlily_key_requests_total', key=api_key.label, result=kind)
+        if removed:
+            print(f"   🔑 API key {api_key.label} out of rotation ({api_key.removed}), "
+                  f"{len(self.usable_keys)} key(s) left")
+        return kind != rate_limiter.OK and api_key.removed is not None
+    
+    def _update_gauges(self, api_key: ApiKey):
+        METRICS.set('earlily_key_rate', api_key.limiter.rate, key=api_key.label)
+        METRICS.set('earlily_key_available', int(api_key.usable), key=api_key.label)
+        if api_key.quota_remaining is not None:
+            METRICS.set('earlily_key_quota_remaining', api_key.quota_remaining, key=api_key.label)
+    
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Jittered exponential backoff; a throttled key's Retry-After only applies when no other key is ready"""
+        now = time.monotonic()
+        if retry_after and any(k.wait_time(now) == 0 for k in self.usable_keys):
+            retry_after = None
+        return self.keys[0].limiter.backoff_delay(attempt, retry_after)
+    
+    @property
+    def total_rate(self) -> float:
+        """Combined request rate of the keys in rotation (0 = unlimited)"""
+        rates = [k.limiter.rate for k in self.usable_keys]
+        return 0.0 if any(r <= 0 for r in rates) else sum(rates)
+    
+    def print_summary(self):
+        if len(self.keys) < 2:
+            return
+        print(f"\n🔑 API keys:")
+        for k in self.keys:
+            outcomes = ', '.join(f"{n} {kind}" for kind, n in sorted(k.outcomes.items())) or 'unused'
+            status = f" - {k.removed}" if k.removed else ''
+            print(f"   {k.label}: {k.requests} request(s), {outcomes}{status}")
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Near-Duplicate Finder
+Flags generated images that are near-identical to another word's image,
+using two 64-bit perceptual hashes per image:
+
+    dHash  brightness gradients of a 9x8 grayscale thumbnail
+    pHash  signs of the low-frequency DCT of a 32x32 thumbnail
+
+Worker processes only decode and downsample; both hashes are computed with
+NumPy over whole batches of thumbnails. Hashes are kept in tools/image_hashes.json
+keyed on path, size and mtime, so later runs only decode new or changed
+images.
+
+Pairs within DEDUPE_PHASH_DISTANCE bits (pHash) come from a multi-index
+hash table - every 64-bit hash split into bands, and any two hashes within
+`bands - 1` bits share at least one band exactly - so only bucket-mates are
+compared. A pair counts as a duplicate when its dHash distance is within
+DEDUPE_DHASH_DISTANCE too. `--requeue` keeps the oldest image of every
+group, drops the others from the log and the flashcard manifest, and
+queues them for `generate_images_imagen.py --retry-failed`.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from generation_cache import GenerationCache
+from image_io import write_bytes_atomic
+from manifest import Manifest
+from metadata_store import open_metadata_store
+
+load_dotenv()
+
+REPO_DIR = Path(__file__).parent.parent
+DEFAULT_SOURCE_DIR = REPO_DIR / 'GeneratedImages'
+DEFAULT_HASH_FILE = Path(__file__).parent / 'image_hashes.json'
+DEFAULT_METADATA_FILE = Path(__file__).parent / 'image_generation_log.json'
+
+DEFAULT_PHASH_DISTANCE = 6
+DEFAULT_DHASH_DISTANCE = 10
+
+# Error class recorded in the failure queue for requeued duplicates
+DUPLICATE = 'DUPLICATE'
+
+HASH_FILE_VERSION = 1
+PHASH_SIZE = 32
+DHASH_SIZE = (9, 8)  # width, height
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Set bits per uint64"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _POPCOUNT[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1)
+
+
+def dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix, so D @ X @ D.T is the 2-D DCT of X"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+def pack_bits(bits: np.ndarray) -> np.ndarray:
+    """(N, 64) booleans -> N uint64, first bit most significant"""
+    return np.packbits(bits, axis=1).view('>u8').ravel().astype(np.uint64)
+
+
+def dhash(thumbnails: np.ndarray) -> np.ndarray:
+    """(N, 8, 9) grayscale -> N uint64: is each pixel brighter than its right neighbour"""
+    bits = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    return pack_bits(bits.reshape(len(thumbnails), 64))
+
+
+def phash(thumbnails: np.ndarray) -> np.ndarray:
+    """(N, 32, 32) grayscale -> N uint64: low-frequency DCT coefficients above their median"""
+    d = dct_matrix(PHASH_SIZE)
+    coefficients = d @ thumbnails.astype(np.float32) @ d.T
+    low = coefficients[:, :8, :8].reshape(len(thumbnails), 64)
+    median = np.median(low[:, 1:], axis=1)  # DC term excluded: it only tracks overall brightness
+    return pack_bits(low > median[:, None])
+
+
+def load_thumbnails(paths: List[Path]) -> Tuple[List[Path], np.ndarray, np.ndarray, List[Tuple[Path, str]]]:
+    """Worker: decode and downsample a chunk of images to the dHash and pHash inputs"""
+    from PIL import Image
+    
+    loaded, small, large, errors = [], [], [], []
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                if img.mode in ('RGBA', 'LA', 'P'):
+                    # Transparent pixels count as the white background the prompts ask for
+                    img = img.convert('RGBA')
+                    background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+                    img = Image.alpha_composite(background, img)
+                gray = img.convert('L')
+                small.append(np.asarray(gray.resize(DHASH_SIZE, Image.Resampling.BOX), dtype=np.uint8))
+                large.append(np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BOX), dtype=np.uint8))
+                loaded.append(path)
+        except Exception as e:
+            errors.append((path, f"{type(e).__name__}: {e}"))
+    
+    if not loaded:
+        return [], np.empty((0, 8, 9), np.uint8), np.empty((0, PHASH_SIZE, PHASH_SIZE), np.uint8), errors
+    return loaded, np.stack(small), np.stack(large), errors
+
+
+def chunks(items: List, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class HashStore:
+    """Perceptual hashes of every image, cached on disk by relative path, size and mtime"""
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or DEFAULT_HASH_FILE)
+        self.images: Dict[str, Dict] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+                if data.get('version') == HASH_FILE_VERSION:
+                    self.images = data.get('images', {})
+            except (OSError, ValueError):
+                pass  # rebuilt from the images
+    
+    def update(self, source_dir: Path, workers: Optional[int] = None) -> Dict:
+        """Hash new or changed images under `source_dir`, forget deleted ones; returns counts"""
+        source_dir = Path(source_dir)
+        current: Dict[str, Tuple[Path, int, int]] = {}
+        for path in sorted(source_dir.glob('*/*.png')):
+            stat = path.stat()
+            current[path.relative_to(source_dir).as_posix()] = (path, stat.st_size, stat.st_mtime_ns)
+        
+        removed = [name for name in self.images if name not in current]
+        for name in removed:
+            del self.images[name]
+        
+        stale = [
+            path for name, (path, size, mtime_ns) in current.items()
+            if self.images.get(name, {}).get('size') != size or self.images[name].get('mtime_ns') != mtime_ns
+        ]
+        errors: List[Tuple[Path, str]] = []
+        if stale:
+            workers = max(1, min(workers or os.cpu_count() or 1, len(stale)))
+            batches = list(chunks(stale, max(1, len(stale) // (workers * 4))))
+            if workers == 1:
+                results = map(load_thumbnails, batches)
+                pool = None
+            else:
+                pool = ProcessPoolExecutor(workers)
+                results = pool.map(load_thumbnails, batches)
+            try:
+                for loaded, small, large, batch_errors in results:
+                    errors.extend(batch_errors)
+                    for path, d, p in zip(loaded, dhash(small), phash(large)):
+                        name = path.relative_to(source_dir).as_posix()
+                        _, size, mtime_ns = current[name]
+                        self.images[name] = {'size': size, 'mtime_ns': mtime_ns,
+                                             'dhash': f"{int(d):016x}", 'phash': f"{int(p):016x}"}
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+        
+        return {'images': len(current), 'hashed': len(stale) - len(errors), 'removed': len(removed),
+                'errors': errors}
+    
+    def save(self):
+        data = json.dumps({'version': HASH_FILE_VERSION, 'images': self.images}, separators=(',', ':'))
+        write_bytes_atomic(self.path, data.encode('utf-8'))
+    
+    def arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Image names and their dHash / pHash values as uint64 arrays"""
+        names = sorted(self.images)
+        d = np.array([int(self.images[n]['dhash'], 16) for n in names], dtype=np.uint64)
+        p = np.array([int(self.images[n]['phash'], 16) for n in names], dtype=np.uint64)
+        return names, d, p
+
+
+class HashIndex:
+    """Multi-index hash table over 64-bit hashes for Hamming-radius search"""
+    
+    def __init__(self, hashes: np.ndarray, max_distance: int):
+        """
+        Args:
+            hashes: uint64 hashes, indexed by position
+            max_distance: Largest Hamming distance searched for (at most 15)
+        """
+        if not 0 <= max_distance <= 15:
+            raise ValueError(f"max_distance must be between 0 and 15, got {max_distance}")
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.max_distance = max_distance
+        # Pigeonhole: with more bands than allowed differing bits, one band matches exactly
+        self.bands = 1
+        while self.bands <= max_distance:
+            self.bands *= 2
+        self.width = 64 // self.bands
+        
+        self.buckets: List[Dict[int, np.ndarray]] = []
+        for band in range(self.bands):
+            keys = self._band(self.hashes, band)
+            order = np.argsort(keys, kind='stable')
+            unique, starts = np.unique(keys[order], return_index=True)
+            groups = np.split(order, starts[1:])
+            self.buckets.append({int(key): group for key, group in zip(unique, groups)})
+    
+    def _band(self, values: np.ndarray, band: int) -> np.ndarray:
+        mask = np.uint64((1 << self.width) - 1)
+        return (values >> np.uint64(band * self.width)) & mask
+    
+    def neighbors(self, value: int, max_distance: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of hashes within `max_distance` of `value`, and their distances"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        value = np.array([value], dtype=np.uint64)
+        found = [self.buckets[b].get(int(self._band(value, b)[0])) for b in range(self.bands)]
+        found = [ids for ids in found if ids is not None]
+        if not found:
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        candidates = np.unique(np.concatenate(found))
+        distances = popcount(self.hashes[candidates] ^ value[0]).astype(np.int64)
+        keep = distances <= max_distance
+        return candidates[keep], distances[keep]
+    
+    def pairs(self) -> np.ndarray:
+        """Every (i, j, distance) with i < j within max_distance, as an (M, 3) array"""
+        found = []
+        for buckets in self.buckets:
+            for ids in buckets.values():
+                if len(ids) > 1:
+                    i, j = np.triu_indices(len(ids), 1)
+                    found.append(np.stack([ids[i], ids[j]], axis=1))
+        if not found:
+            return np.empty((0, 3), np.int64)
+        candidates = np.concatenate(found)
+        candidates = np.unique(np.sort(candidates, axis=1), axis=0)
+        distances = popcount(self.hashes[candidates[:, 0]] ^ self.hashes[candidates[:, 1]]).astype(np.int64)
+        keep = distances <= self.max_distance
+        return np.column_stack([candidates[keep], distances[keep]])
+
+
+def group_pairs(pairs: List[Tuple[int, int]]) -> List[List[int]]:
+    """Connected groups of duplicate pairs (union-find)"""
+    parent: Dict[int, int] = {}
+    
+    def find(i: int) -> int:
+        parent.setdefault(i, i)
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    for i, j in pairs:
+        parent[find(i)] = find(j)
+    groups: Dict[int, List[int]] = {}
+    for i in parent:
+        groups.setdefault(find(i), []).append(i)
+    return sorted(sorted(group) for group in groups.values())
+
+
+def find_duplicates(hashes: HashStore, phash_distance: int = DEFAULT_PHASH_DISTANCE,
+                    dhash_distance: int = DEFAULT_DHASH_DISTANCE) -> List[Dict]:
+    """
+    Groups of near-identical images, as {'images': [...], 'pairs': [...]}.
+
+    Images are named by their path under GeneratedImages/, so the same word
+    in two categories (two imagesets) is compared like any other pair.
+    """
+    names, d, p = hashes.arrays()
+    if len(names) < 2:
+        return []
+    
+    matches = []
+    for i, j, p_distance in HashIndex(p, phash_distance).pairs():
+        d_distance = int(popcount(d[i] ^ d[j]))
+        if d_distance <= dhash_distance:
+            matches.append((int(i), int(j), int(p_distance), d_distance))
+    
+    groups = []
+    for members in group_pairs([(i, j) for i, j, _, _ in matches]):
+        member_set = set(members)
+        groups.append({
+            'images': [names[i] for i in members],
+            'pairs': [{'a': names[i], 'b': names[j], 'phash': pd, 'dhash': dd}
+                      for i, j, pd, dd in matches if i in member_set],
+        })
+    return groups
+
+
+def requeue_duplicates(groups: List[Dict], source_dir: Path, store, cache: GenerationCache,
+                       manifest: Optional[Manifest] = None) -> List[Dict]:
+    """
+    Keep the oldest logged image of each group, queue the rest for regeneration.
+
+    Their log, cache and manifest entries are dropped (the cache would
+    return the same bytes) and a failure is recorded, due now, so
+    `--retry-failed` regenerates them. Returns the requeued words.
+    """
+    by_path = {}
+    for entry in store.generated_entries():
+        by_path[Path(entry['path']).resolve()] = entry
+    
+    now = time.time()
+    requeued = []
+    for group in groups:
+        entries = [by_path.get((Path(source_dir) / name).resolve()) for name in group['images']]
+        logged = sorted((e for e in entries if e is not None), key=lambda e: e.get('timestamp', 0))
+        if len(logged) < 2:
+            continue
+        keeper = logged[0]
+        for entry in logged[1:]:
+            word, category = entry['word'], entry['category']
+            store.forget(word, category)
+            if manifest is not None:
+                manifest.remove(word, category)
+            if entry.get('cache_key'):
+                cache.discard(entry['cache_key'])
+            previous = store.get_failure(word, category) or {}
+            store.record_failure(word, category, {
+                'error': f"near-duplicate of {keeper['word']} ({keeper['category']})",
+                'error_kind': DUPLICATE,
+                'status_code': None,
+                'attempts': previous.get('attempts', 0),
+                'failures': previous.get('failures', 0) + 1,
+                'first_failed': previous.get('first_failed', now),
+                'next_eligible': now,
+                'timestamp': now
+            })
+            requeued.append({'word': word, 'category': category, 'duplicate_of': keeper['word']})
+    return requeued
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Find near-identical generated images with perceptual hashes (no API calls)'
+    )
+    parser.add_argument('--source', type=Path, default=DEFAULT_SOURCE_DIR, help='GeneratedImages directory')
+    parser.add_argument('--hash-file', type=Path, default=DEFAULT_HASH_FILE,
+                        help=f'Hash cache (default: tools/{DEFAULT_HASH_FILE.name})')
+    parser.add_argument('--phash-distance', type=int,
+                        default=int(os.getenv('DEDUPE_PHASH_DISTANCE', DEFAULT_PHASH_DISTANCE)),
+                        help=f'Max pHash bits apart, 0-15 (or set DEDUPE_PHASH_DISTANCE env var, '
+                             f'default: {DEFAULT_PHASH_DISTANCE})')
+    parser.add_argument('--dhash-distance', type=int,
+                        default=int(os.getenv('DEDUPE_DHASH_DISTANCE', DEFAULT_DHASH_DISTANCE)),
+                        help=f'Max dHash bits apart (or set DEDUPE_DHASH_DISTANCE env var, '
+                             f'default: {DEFAULT_DHASH_DISTANCE})')
+    parser.add_argument('--requeue', action='store_true',
+                        help='Keep the oldest image of each group, queue the others for --retry-failed')
+    parser.add_argument('--metadata-backend', choices=['journal', 'sqlite'],
+                        help='Generation log format (or set METADATA_BACKEND env var, default: journal)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    
+    args = parser.parse_args()
+    
+    if not args.source.exists():
+        print(f"❌ Error: Source directory not found: {args.source}")
+        return
+    
+    print("🔎 Looking for near-duplicate images")
+    print(f"   Source: {args.source}")
+    print(f"   Thresholds: pHash ≤ {args.phash_distance}, dHash ≤ {args.dhash_distance} bits")
+    
+    start = time.perf_counter()
+    hashes = HashStore(args.hash_file)
+    stats = hashes.update(args.source, args.workers)
+    hashes.save()
+    groups = find_duplicates(hashes, args.phash_distance, args.dhash_distance)
+    
+    print(f"\n   Images: {stats['images']} ({stats['hashed']} hashed, "
+          f"{stats['images'] - stats['hashed'] - len(stats['errors'])} unchanged) in {time.perf_counter() - start:.1f}s")
+    for path, error in stats['errors']:
+        print(f"   ❌ {path.name}: {error}")
+    
+    if not groups:
+        print("✅ No near-duplicates found")
+        return
+    
+    print(f"\n⚠️  Near-duplicate groups ({len(groups)}):")
+    for group in groups[:20]:
+        closest = min(group['pairs'], key=lambda pair: pair['phash'])
+        print(f"   - {', '.join(group['images'])} (pHash {closest['phash']}, dHash {closest['dhash']})")
+    if len(groups) > 20:
+        print(f"   ... and {len(groups) - 20} more")
+    
+    if not args.requeue:
+        print("\n   Rerun with --requeue to regenerate all but the oldest image of each group")
+        return
+    
+    store = open_metadata_store(DEFAULT_METADATA_FILE, args.metadata_backend, legacy_file=DEFAULT_METADATA_FILE)
+    manifest = Manifest(args.source)
+    try:
+        requeued = requeue_duplicates(groups, args.source, store, GenerationCache(), manifest)
+    finally:
+        manifest.save()
+        store.close()
+    print(f"\n🔁 Requeued {len(requeued)} word(s) - run generate_images_imagen.py --retry-failed")
+    for item in requeued[:20]:
+        print(f"   - {item['word']} ({item['category']}), duplicate of {item['duplicate_of']}")
+
+
+if __name__ == '__main__':
+    main()
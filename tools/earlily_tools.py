@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Tools
+One entry point for the image pipeline scripts:
+
+    earlily-tools generate vocab.md      generate_images_imagen.py
+    earlily-tools plan vocab.md          planner.py
+    earlily-tools status                 status.py
+    earlily-tools retry-failed           generate_images_imagen.py --retry-failed
+    earlily-tools export [--atlases]     export_assets.py
+    earlily-tools compress               compress_assets.py
+    earlily-tools verify                 verify_assets.py
+    earlily-tools dedupe                 dedupe.py
+    earlily-tools quality images...      quality.py
+    earlily-tools manifest               manifest.py
+
+Everything after the command is passed to that script, so
+`earlily-tools generate --help` shows its options. Only the chosen
+command's module is imported: status, plan, verify and manifest never load
+requests, PIL or tqdm. `benchmark.py --startup` times every command's startup and
+fails if a light command starts importing a heavy module.
+"""
+
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+PROG = 'earlily-tools'
+
+# command -> (module, arguments put before the user's, help)
+COMMANDS = {
+    'generate': ('generate_images_imagen', [], 'Generate flashcard images with Imagen'),
+    'plan': ('planner', [], 'Estimate run time and API calls from past runs'),
+    'status': ('status', [], 'Show progress per category and the failure queue'),
+    'retry-failed': ('generate_images_imagen', ['--retry-failed'], 'Retry only the failure queue'),
+    'export': ('export_assets', [], 'Export @1x/@2x/@3x imagesets from GeneratedImages/'),
+    'compress': ('compress_assets', [], 'Palette-quantize imageset PNGs within a byte budget'),
+    'verify': ('verify_assets', [], 'Check logged images and imagesets are on disk and intact'),
+    'dedupe': ('dedupe', [], 'Find (and requeue) near-identical images by perceptual hash'),
+    'quality': ('quality', [], 'Check images against the quality gate'),
+    'manifest': ('manifest', [], 'Rebuild the flashcard manifest from the generation log'),
+}
+
+# Slow imports that commands reading only the log and vocabulary must not pay for
+HEAVY_MODULES = ('requests', 'PIL', 'tqdm', 'numpy', 'google.generativeai')
+LIGHT_COMMANDS = ('plan', 'status', 'verify', 'manifest')
+
+
+def run(command: str, argv: List[str]):
+    """Import the command's module and run its main() with `argv`"""
+    module_name, prefix, _ = COMMANDS[command]
+    module = importlib.import_module(module_name)
+    sys.argv = [f"{PROG} {command}", *prefix, *argv]
+    module.main()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog=PROG,
+        description='EarLiLy image pipeline tools',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='commands:\n' + '\n'.join(f"  {name:<14}{help_text}" for name, (_, _, help_text) in COMMANDS.items())
+               + f"\n\nRun '{PROG} <command> --help' for a command's options."
+    )
+    parser.add_argument('command', choices=list(COMMANDS), metavar='command', help='One of the commands below')
+    
+    # Only the command is parsed here; its options belong to its own parser
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv[:1])
+    run(args.command, argv[1:])
+
+
+if __name__ == '__main__':
+    main()
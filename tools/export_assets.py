@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Asset Export
+Rebuilds the Xcode FlashcardImages catalog from GeneratedImages/ without
+calling the API: every source PNG is resampled to @1x/@2x/@3x for the
+flashcard's point size and given a multi-scale Contents.json, in an
+imageset named <category>-<word> (a few words are in two categories).
+
+Resampling runs in a process pool (one worker per core by default), but
+only for sources that changed: export_state.json records each source's
+size, mtime and content hash, so an unchanged source is skipped after a
+stat, and a touched one after a hash. Renditions whose bytes come out the
+same are not rewritten, so a re-export only touches what actually changed
+and Xcode only recompiles that. With --vocab, imagesets for words not in
+that vocabulary (or under a pre-category <word>.imageset name) are removed.
+
+With --compress, renditions are palette-quantized within PNG_BUDGET_KB as
+they are encoded (see compress_assets.py). Quantization is deterministic,
+so compressed renditions compare equal on the next export and stay as
+they are.
+
+With --atlases, each category is instead packed into sprite atlases with
+one index file (see atlas.py).
+
+Either way, the app's card list is written last, to
+EarLiLy/Images/flashcards_manifest.json (see manifest.py).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from tqdm import tqdm
+
+from atlas import DEFAULT_ATLAS_DIR, pack_atlases
+from compress_assets import DEFAULT_BUDGET_KB, DEFAULT_MIN_PSNR, encode_rendition
+from manifest import DEFAULT_BUNDLE_DIR, write_bundle_manifest
+from image_io import (DEFAULT_POINT_SIZE, SCALES, PNG_SIGNATURE, asset_name, content_hash, scaled_filename,
+                      write_bytes_atomic, write_scaled_imageset)
+from vocabulary import parse_vocabulary
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_SOURCE_DIR = BASE_DIR / 'GeneratedImages'
+DEFAULT_ASSETS_DIR = BASE_DIR / 'EarLiLy' / 'Assets.xcassets' / 'FlashcardImages'
+DEFAULT_VOCAB_FILE = Path(__file__).parent / 'earlily_vocab_list.md'
+DEFAULT_STATE_FILE = Path(__file__).parent / 'export_state.json'
+STATE_VERSION = 1
+
+
+class ExportState:
+    """
+    What each imageset was last exported from, per asset folder:
+    name -> [source size, source mtime_ns, source content hash, point size, scales]
+    (plus [byte budget, PSNR floor] when exported with --compress)
+    """
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv('EXPORT_STATE_FILE') or DEFAULT_STATE_FILE)
+        self.folders: Dict[str, Dict[str, List]] = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+                if data.get('version') == STATE_VERSION:
+                    self.folders = data.get('folders', {})
+            except (OSError, ValueError):
+                pass  # rebuilt by the next export
+    
+    def entries(self, assets_dir: Path) -> Dict[str, List]:
+        return self.folders.setdefault(str(Path(assets_dir).resolve()), {})
+    
+    def save(self):
+        if self.dirty:
+            data = json.dumps({'version': STATE_VERSION, 'folders': self.folders}, separators=(',', ':'))
+            write_bytes_atomic(self.path, data.encode('utf-8'))
+            self.dirty = False
+
+
+def find_sources(source_dir: Path) -> Dict[str, Path]:
+    """
+    Source PNG under GeneratedImages/<category>/ for every asset name.
+
+    Names are category-qualified (see asset_name), so a word in two
+    categories gets an imageset for each.
+    """
+    return {asset_name(path.stem, path.parent.name): path for path in sorted(Path(source_dir).glob('*/*.png'))}
+
+
+def png_width(path: Path) -> int:
+    """Width from the IHDR chunk, reading only the header"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or not header.startswith(PNG_SIGNATURE):
+        return 0
+    return struct.unpack('>I', header[16:20])[0]
+
+
+def is_up_to_date(source: Path, name: str, imageset_dir: Path, point_size: int, scales: Tuple[int, ...]) -> bool:
+    """Every rendition exists, is newer than the source and has the expected 1x width"""
+    try:
+        source_mtime = source.stat().st_mtime
+        if (imageset_dir / 'Contents.json').stat().st_mtime < source_mtime:
+            return False
+        for scale in scales:
+            if (imageset_dir / scaled_filename(name, scale)).stat().st_mtime < source_mtime:
+                return False
+        return png_width(imageset_dir / scaled_filename(name, scales[0])) in (
+            point_size * scales[0], png_width(source)
+        )
+    except OSError:
+        return False
+
+
+def imageset_files(name: str, scales: Tuple[int, ...]) -> List[str]:
+    return ['Contents.json'] + [scaled_filename(name, scale) for scale in scales]
+
+
+def has_files(imageset_dir: Path, names: List[str]) -> bool:
+    return all(os.path.exists(imageset_dir / name) for name in names)
+
+
+def export_one(task: Tuple[Path, str, Path, int, Tuple[int, ...], Optional[Tuple[int, float]]]
+               ) -> Tuple[str, Optional[str], int, Dict, str]:
+    """Worker: (asset name, error message or None, bytes written, file counts, source hash)"""
+    source, name, assets_dir, point_size, scales, compress = task
+    counts = {'written': 0, 'skipped': 0, 'deleted': 0}
+    encode = partial(encode_rendition, budget=compress[0], min_psnr=compress[1]) if compress else None
+    try:
+        digest = content_hash(source.read_bytes())
+        written = write_scaled_imageset(source, name, assets_dir, point_size, scales, counts=counts, encode=encode)
+        return name, None, written, counts, digest
+    except Exception as e:
+        return name, f"{type(e).__name__}: {e}", 0, counts, ''
+
+
+def prune_orphans(assets_dir: Path, keep: Set[str], counts: Dict) -> List[str]:
+    """Remove imagesets whose name isn't in `keep`; returns their names"""
+    removed = []
+    for imageset_dir in sorted(Path(assets_dir).glob('*.imageset')):
+        if imageset_dir.stem in keep or not imageset_dir.is_dir():
+            continue
+        counts['deleted'] += sum(1 for path in imageset_dir.iterdir() if path.is_file())
+        shutil.rmtree(imageset_dir)
+        removed.append(imageset_dir.stem)
+    return removed
+
+
+def export_all(source_dir: Path = DEFAULT_SOURCE_DIR, assets_dir: Path = DEFAULT_ASSETS_DIR,
+               point_size: int = DEFAULT_POINT_SIZE, scales: Tuple[int, ...] = SCALES,
+               workers: int = None, force: bool = False, keep: Optional[Set[str]] = None,
+               state_file: Optional[Path] = None, compress: Optional[Tuple[int, float]] = None) -> Dict:
+    """
+    Sync the asset folder with every source image; returns counts, failures and timing.
+
+    Imagesets are skipped in this process when their source is unchanged
+    since the last export (by size and mtime, else by content hash), so a
+    no-op run never starts the pool. With `keep` (asset names of every
+    vocabulary word), imagesets for other words are deleted. `compress`
+    (byte budget, PSNR floor) palette-quantizes the renditions.
+    """
+    start = time.perf_counter()
+    sources = find_sources(source_dir)
+    if keep is not None:
+        sources = {name: path for name, path in sources.items() if name in keep}
+    assets_dir = Path(assets_dir)
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    scales = tuple(scales)
+    settings = [point_size, list(scales)]
+    if compress:
+        # Changing the budget or floor re-exports; entries without it are uncompressed
+        settings.append(list(compress))
+    state = ExportState(state_file)
+    exported = state.entries(assets_dir)
+    
+    stats = {'exported': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'orphans': []}
+    files = {'written': 0, 'skipped': 0, 'deleted': 0}
+    failures: List[Tuple[str, str]] = []
+    
+    tasks = []
+    sizes: Dict[str, Tuple[int, int]] = {}
+    for name, path in sorted(sources.items()):
+        stat = path.stat()
+        sizes[name] = (stat.st_size, stat.st_mtime_ns)
+        imageset_dir = assets_dir / f"{name}.imageset"
+        names = imageset_files(name, scales)
+        previous = exported.get(name)
+        if not force and has_files(imageset_dir, names):
+            current = False
+            if previous and previous[3:] == settings:
+                # Same stat, or touched (e.g. by a checkout) without changing content
+                current = tuple(previous[:2]) == sizes[name] or previous[2] == content_hash(path.read_bytes())
+            elif not previous and not compress:
+                # Exported before this state file existed
+                current = is_up_to_date(path, name, imageset_dir, point_size, scales)
+            if current:
+                if not previous or tuple(previous[:2]) != sizes[name]:
+                    digest = previous[2] if previous else content_hash(path.read_bytes())
+                    exported[name] = [*sizes[name], digest, *settings]
+                    state.dirty = True
+                stats['skipped'] += 1
+                files['skipped'] += len(names)
+                continue
+        tasks.append((path, name, assets_dir, point_size, scales, compress))
+    
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    if tasks:
+        with ProcessPoolExecutor(workers) as pool:
+            # Small chunks keep every core busy to the end without per-item IPC overhead
+            chunksize = max(1, len(tasks) // (workers * 8))
+            for name, error, written, counts, digest in tqdm(pool.map(export_one, tasks, chunksize=chunksize),
+                                                            total=len(tasks), desc='Exporting'):
+                for key, value in counts.items():
+                    files[key] += value
+                stats['bytes'] += written
+                if error:
+                    stats['failed'] += 1
+                    failures.append((name, error))
+                    exported.pop(name, None)
+                else:
+                    stats['exported'] += 1
+                    exported[name] = [*sizes[name], digest, *settings]
+                state.dirty = True
+    
+    if keep is not None:
+        stats['orphans'] = prune_orphans(assets_dir, keep, files)
+        for name in stats['orphans']:
+            exported.pop(name, None)
+        state.dirty = state.dirty or bool(stats['orphans'])
+    for name in [name for name in exported if name not in sources]:
+        del exported[name]
+        state.dirty = True
+    state.save()
+    
+    failed = {name for name, _ in failures}
+    stats['images'] = {name: path for name, path in sources.items() if name not in failed}
+    stats['files'] = files
+    stats['failures'] = failures
+    stats['seconds'] = time.perf_counter() - start
+    stats['workers'] = workers if tasks else 0
+    return stats
+
+
+def print_bundle_manifest(result: Dict):
+    print(f"   🗂️  App manifest: {result['cards']} card(s), {'written' if result['written'] else 'unchanged'} "
+          f"({result['path']})")
+    if result['unlisted']:
+        print(f"   ⚠️  {result['unlisted']} image(s) not in the generator's manifest - named after their files")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export @1x/@2x/@3x Xcode imagesets from GeneratedImages/ (no API calls)'
+    )
+    parser.add_argument('--source', type=Path, default=DEFAULT_SOURCE_DIR, help='GeneratedImages directory')
+    parser.add_argument('--assets', type=Path, default=DEFAULT_ASSETS_DIR, help='FlashcardImages asset folder')
+    parser.add_argument('--point-size', type=int, default=int(os.getenv('ASSET_POINT_SIZE', 0)) or DEFAULT_POINT_SIZE,
+                        help=f'On-screen size in points (or set ASSET_POINT_SIZE env var, default: {DEFAULT_POINT_SIZE})')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Re-export imagesets that look up to date')
+    parser.add_argument('--vocab', type=Path,
+                        help=f'Export only words in this vocabulary (e.g. {DEFAULT_VOCAB_FILE.name}) and remove '
+                             f'imagesets of every other word')
+    parser.add_argument('--atlases', action='store_true',
+                        help='Pack each category into sprite atlases with an index instead of imagesets')
+    parser.add_argument('--atlas-dir', type=Path, default=DEFAULT_ATLAS_DIR, help='Atlas output folder')
+    parser.add_argument('--compress', action='store_true',
+                        help='Palette-quantize renditions within PNG_BUDGET_KB, above PNG_MIN_PSNR '
+                             '(see compress_assets.py)')
+    parser.add_argument('--manifest-dir', type=Path, default=DEFAULT_BUNDLE_DIR,
+                        help='Where to write the app\'s flashcards_manifest.json (default: EarLiLy/Images, bundled as Images/)')
+    
+    args = parser.parse_args()
+    
+    if not args.source.exists():
+        print(f"❌ Error: Source directory not found: {args.source}")
+        return
+    if args.vocab and not args.vocab.exists():
+        print(f"❌ Error: Vocabulary file not found: {args.vocab}")
+        return
+    
+    if args.atlases:
+        print("🗺️  Packing sprite atlases")
+        print(f"   Source: {args.source}")
+        print(f"   Atlases: {args.atlas_dir}")
+        start = time.perf_counter()
+        stats = pack_atlases(args.source, args.atlas_dir, args.point_size, workers=args.workers, force=args.force)
+        print(f"\n✅ Packed {stats['packed']}, skipped {stats['skipped']} unchanged of {stats['categories']} "
+              f"categories ({stats['sprites']} images on {stats['pages']} atlas page(s))")
+        print(f"   {stats['bytes'] / 1024 ** 2:.1f} MB written, index {stats['index_bytes'] / 1024:.1f} KB, "
+              f"in {time.perf_counter() - start:.1f}s")
+        if stats['removed']:
+            print(f"   🗑️  Removed {stats['removed']} stale atlas page(s)")
+        print_bundle_manifest(write_bundle_manifest(args.source, find_sources(args.source), args.manifest_dir))
+        return
+    
+    print("🖼️  Exporting flashcard assets")
+    print(f"   Source: {args.source}")
+    print(f"   Assets: {args.assets}")
+    print(f"   Sizes: {', '.join(f'{args.point_size * s}px (@{s}x)' for s in SCALES)}")
+    
+    # Only an explicit vocabulary prunes: GeneratedImages/ may hold several vocabularies' words
+    keep = None
+    if args.vocab:
+        keep = {asset_name(word, category) for category, words in parse_vocabulary(args.vocab).items()
+                for word in words}
+        if not keep:
+            # Never read "no words" as "delete every imageset"
+            print(f"   ⚠️  No words in {args.vocab.name} - keeping every imageset")
+            keep = None
+    
+    compress = None
+    if args.compress:
+        compress = (int(float(os.getenv('PNG_BUDGET_KB', DEFAULT_BUDGET_KB)) * 1024),
+                    float(os.getenv('PNG_MIN_PSNR', DEFAULT_MIN_PSNR)))
+        print(f"   Compression: {compress[0] / 1024:g} KB per PNG, quality floor {compress[1]:g} dB PSNR")
+    
+    stats = export_all(args.source, args.assets, args.point_size, SCALES, args.workers, args.force, keep,
+                       compress=compress)
+    
+    total = stats['exported'] + stats['skipped'] + stats['failed']
+    files = stats['files']
+    print(f"\n✅ Exported {stats['exported']}, skipped {stats['skipped']} up-to-date, "
+          f"failed {stats['failed']} of {total}")
+    print(f"   Files: {files['written']} written, {files['skipped']} unchanged, {files['deleted']} deleted")
+    print(f"   {stats['bytes'] / 1024 ** 2:.1f} MB written in {stats['seconds']:.2f}s "
+          f"with {stats['workers']} worker(s)")
+    if stats['orphans']:
+        print(f"   🗑️  Removed {len(stats['orphans'])} imageset(s) not named for a vocabulary word: "
+              f"{', '.join(stats['orphans'][:10])}{' ...' if len(stats['orphans']) > 10 else ''}")
+    for name, error in stats['failures']:
+        print(f"   ❌ {name}: {error}")
+    print_bundle_manifest(write_bundle_manifest(args.source, stats['images'], args.manifest_dir))
+
+
+if __name__ == '__main__':
+    main()
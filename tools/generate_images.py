@@ -17,6 +17,8 @@ import requests
 from io import BytesIO
 from tqdm import tqdm
 
+from vocabulary import parse_vocabulary
+
 # Load environment variables
 load_dotenv()
 
@@ -61,25 +63,7 @@ class FlashcardImageGenerator:
     
     def parse_vocabulary_list(self, vocab_file: Path) -> Dict[str, List[str]]:
         """Parse the vocabulary markdown file into categories"""
-        categories = {}
-        current_category = None
-        
-        with open(vocab_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                
-                # Check for category headers (## Category Name)
-                if line.startswith('## ') and not line.startswith('## Complete'):
-                    current_category = line[3:].strip()
-                    categories[current_category] = []
-                
-                # Extract words (comma-separated lists)
-                elif current_category and line and not line.startswith('#') and not line.startswith('*'):
-                    # Split by comma and clean up
-                    words = [w.strip() for w in line.split(',') if w.strip()]
-                    categories[current_category].extend(words)
-        
-        return categories
+        return parse_vocabulary(vocab_file)
     
     def create_toddler_prompt(self, word: str, category: str) -> str:
         """Create an optimized prompt for toddler-friendly image generation"""
@@ -6,37 +6,109 @@ Optimized for Google AI Studio Pro subscription
 """
 
 import os
+import sys
 import json
 import time
-import re
+import threading
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple, Union
 from dotenv import load_dotenv
-import requests
-from PIL import Image
-from io import BytesIO
-from tqdm import tqdm
 import base64
 
+import rate_limiter
+from circuit_breaker import TRIPPING, CircuitBreaker
+from credentials import CredentialPool, load_api_keys
+from imagen_transport import IMAGEN_ENDPOINT, ImagenAPIError, ImagenTransport
+from metadata_store import open_metadata_store
+from generation_cache import GenerationCache, cache_key
+from image_io import write_flashcard_assets
+from manifest import Manifest
+from pipeline import GenerationPipeline
+from metrics import METRICS, MetricsExporter
+from quality import QualityError, QualityGate, write_checked_assets
+from planner import History, estimate_run, format_duration, percentile, print_estimate
+from shards import in_shard, parse_shard, shard_dir
+from scheduler import ORDERS, RunBudget, parse_duration, schedule
+from vocabulary import VocabularySnapshot, parse_vocabulary
+
 load_dotenv()
 
+# Exit status when the run stopped because the API or every key was unavailable (EX_TEMPFAIL)
+EXIT_RESUMABLE = 75
+
 class ImagenFlashcardGenerator:
     """Generate images using Imagen 3 API"""
     
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
+    def __init__(self, api_key: Union[str, List[str], None] = None, concurrency: Optional[int] = None,
+                 requests_per_second: Optional[float] = None, batch_size: Optional[int] = None,
+                 metadata_backend: Optional[str] = None, cpu_workers: Optional[int] = None,
+                 base_dir: Optional[Path] = None, metadata_file: Optional[Path] = None,
+                 metrics_file: Optional[Path] = None, shard: Optional[Tuple[int, int]] = None):
+        self.api_keys = load_api_keys(api_key)
+        if not self.api_keys:
             raise ValueError("GEMINI_API_KEY not found. Get it from https://aistudio.google.com/app/apikey")
-        
-        # Imagen 3 API endpoint
-        self.api_endpoint = "https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-001:predict"
+        self.api_key = self.api_keys[0]
         
         # Settings
-        self.batch_size = int(os.getenv('BATCH_SIZE', 5))
+        self.batch_size = max(1, batch_size or int(os.getenv('BATCH_SIZE', 5)))
         self.max_retries = int(os.getenv('MAX_RETRIES', 3))
-        
-        # Output paths
-        self.base_dir = Path(__file__).parent.parent
+        self.image_size = self.parse_image_size(os.getenv('IMAGE_SIZE'))
+        self.concurrency = max(1, concurrency or int(os.getenv('CONCURRENCY', 1)))
+        if requests_per_second is None:
+            requests_per_second = float(os.getenv('REQUESTS_PER_SECOND', 1.0))
+        self.requests_per_second = requests_per_second
+        if cpu_workers is None:
+            cpu_workers = int(os.getenv('CPU_WORKERS', os.cpu_count() or 1))
+        self.cpu_workers = max(0, cpu_workers)
+        
+        # Shared by all workers: one token per API request, per key. Throttling cuts a
+        # key's rate, successes slowly raise it back up to MAX_REQUESTS_PER_SECOND
+        self.credentials = CredentialPool(
+            self.api_keys,
+            self.requests_per_second,
+            capacity=self.concurrency,
+            min_rate=float(os.getenv('MIN_REQUESTS_PER_SECOND', 0.1)),
+            max_rate=float(os.getenv('MAX_REQUESTS_PER_SECOND', 0)) or None
+        )
+        self.stop_event = threading.Event()
+        self.budget = RunBudget()  # unlimited unless generate_all is given a deadline or max_requests
+        self.breaker = CircuitBreaker()
+        self.cpu_stage_error: Optional[str] = None   # set by the pipeline if its process pool breaks
+        
+        # Keep-alive connection pool sized to the worker count
+        self.transport = ImagenTransport(
+            self.api_key,
+            endpoint=os.getenv('IMAGEN_ENDPOINT', IMAGEN_ENDPOINT),
+            pool_size=int(os.getenv('HTTP_POOL_SIZE', 0)) or self.concurrency
+        )
+        self.api_endpoint = self.transport.endpoint
+        
+        # Everything besides the prompt that shapes the image - part of the cache key
+        self.parameters = {
+            'sampleCount': 1,
+            'aspectRatio': '1:1',
+            'safetyFilterLevel': 'block_only_high',
+            'personGeneration': 'allow_adult'
+        }
+        if os.getenv('IMAGEN_SEED'):
+            self.parameters['seed'] = int(os.getenv('IMAGEN_SEED'))
+            self.parameters['addWatermark'] = False  # Imagen ignores seeds on watermarked output
+        
+        # Checks every image against the prompt's framing before it's written
+        width, _, height = self.parameters['aspectRatio'].partition(':')
+        self.quality_gate = QualityGate(aspect_ratio=int(width) / int(height))
+        
+        # Raw API output, so prompt/setting changes are detected and re-exports are free
+        self.cache = GenerationCache()
+        
+        # Output paths (a shard gets its own tree, log and snapshot under shards/i-of-N)
+        self.shard = shard
+        self.base_dir = Path(base_dir or Path(__file__).parent.parent)
+        self.snapshot_file = None
+        if shard:
+            self.base_dir = shard_dir(shard, self.base_dir / 'shards')
+            metadata_file = metadata_file or self.base_dir / 'image_generation_log.json'
+            self.snapshot_file = self.base_dir / 'vocabulary_snapshot.json'
         self.output_dir = self.base_dir / 'GeneratedImages'
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
@@ -44,63 +116,34 @@ class ImagenFlashcardGenerator:
         self.assets_dir = self.base_dir / 'EarLiLy' / 'Assets.xcassets' / 'FlashcardImages'
         self.assets_dir.mkdir(parents=True, exist_ok=True)
         
-        # Metadata
-        self.metadata_file = Path(__file__).parent / 'image_generation_log.json'
-        self.metadata = self.load_metadata()
+        # Metadata (append-only journal or SQLite; the old JSON log is imported once)
+        self.legacy_metadata_file = Path(metadata_file or Path(__file__).parent / 'image_generation_log.json')
+        self.store = open_metadata_store(
+            self.legacy_metadata_file, metadata_backend, legacy_file=self.legacy_metadata_file
+        )
+        self.metadata_file = self.store.path
+        
+        # Card list the app loads in one read, rewritten at the end of each run
+        # (built from the log once if it's missing or from an older version)
+        self.manifest = Manifest(self.output_dir)
+        if self.manifest.dirty or not self.manifest.path.exists():
+            self.manifest.sync_store(self.store)
+        
+        # Stage timings and counters, written every METRICS_INTERVAL seconds and at the end
+        self.metrics = MetricsExporter(METRICS, metrics_file)
         
         print("🎨 Imagen 3 Flashcard Generator Initialized")
-        print(f"   API Key: {'✓ Configured' if self.api_key else '✗ Missing'}")
+        print(f"   API Keys: ✓ {len(self.api_keys)} configured")
         print(f"   Output: {self.output_dir}")
-    
-    def load_metadata(self) -> Dict:
-        """Load generation history"""
-        if self.metadata_file.exists():
-            with open(self.metadata_file, 'r') as f:
-                return json.load(f)
-        return {
-            'generated': {},
-            'failed': [],
-            'total_count': 0,
-            'categories_completed': []
-        }
-    
-    def save_metadata(self):
-        """Save generation progress"""
-        with open(self.metadata_file, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
+        if shard:
+            print(f"   Shard: {shard[0]}/{shard[1]}")
+        print(f"   Concurrency: {self.concurrency} worker(s), {self.requests_per_second:g} req/s"
+              f"{' per key' if len(self.api_keys) > 1 else ''}, "
+              f"{self.batch_size} word(s) per request, {self.cpu_workers} CPU worker(s)")
     
     def parse_vocabulary(self, vocab_file: Path) -> Dict[str, List[str]]:
         """Parse vocabulary markdown into categories"""
-        categories = {}
-        current_category = None
-        
-        with open(vocab_file, 'r') as f:
-            content = f.read()
-        
-        # Split by ## headers
-        sections = re.split(r'\n##\s+', content)
-        
-        for section in sections[1:]:  # Skip preamble
-            lines = section.split('\n')
-            category = lines[0].strip()
-            
-            # Skip metadata sections
-            if any(skip in category.lower() for skip in ['complete word list', 'total words', 'note:', 'recommended']):
-                continue
-            
-            # Extract words from the category
-            words = []
-            for line in lines[1:]:
-                line = line.strip()
-                if line and not line.startswith('#') and not line.startswith('*'):
-                    # Split by comma and clean
-                    line_words = [w.strip() for w in line.split(',') if w.strip()]
-                    words.extend(line_words)
-            
-            if words:
-                categories[category] = words
-        
-        return categories
+        return parse_vocabulary(vocab_file)
     
     def create_prompt(self, word: str, category: str) -> str:
         """Create toddler-optimized prompt for Imagen 3"""
@@ -137,237 +180,511 @@ The image should be instantly recognizable and engaging for young children."""
         
         return prompt
     
-    def generate_with_imagen(self, prompt: str, word: str) -> Optional[Image.Image]:
-        """Call Imagen 3 API to generate image"""
+    def generate_with_imagen(self, prompt: str, word: str) -> Optional['Image.Image']:
+        """
+        Call Imagen 3 API to generate image.
         
-        headers = {
-            'Content-Type': 'application/json',
-        }
+        Returns None only if a stop was requested while waiting for the rate
+        limiter; failed requests raise ImagenAPIError.
+        """
+        from io import BytesIO
+        from PIL import Image  # only this helper decodes; the pipeline writes the PNG bytes as-is
+        
+        images = self.generate_with_imagen_batch([prompt])
+        if images is None:
+            return None
+        if images[0] is None:
+            raise ImagenAPIError("No image in response (possibly safety filtered)", rate_limiter.EMPTY, 200)
+        return Image.open(BytesIO(images[0]))
+    
+    def generate_with_imagen_batch(self, prompts: List[str],
+                                   timings: Optional[Dict] = None) -> Optional[List[Optional[bytes]]]:
+        """
+        Generate one image per prompt with a single multi-instance :predict call.
+        
+        Returns the raw image bytes aligned with `prompts`; an entry is None when
+        that item came back without an image (e.g. safety filtered). Returns None
+        if a stop was requested while waiting for the rate limiter, or the run's
+        deadline or request budget was reached (which also stops the run).
+        
+        If `timings` is given, the request's latency (excluding any wait for the
+        rate limiter) is stored in it as 'latency'.
+        """
         
         payload = {
-            'instances': [
-                {
-                    'prompt': prompt
-                }
-            ],
-            'parameters': {
-                'sampleCount': 1,
-                'aspectRatio': '1:1',
-                'safetyFilterLevel': 'block_only_high',
-                'personGeneration': 'allow_adult'
-            }
+            'instances': [{'prompt': prompt} for prompt in prompts],
+            'parameters': dict(self.parameters)
         }
+        if len(prompts) > 1:
+            # Filtered items are returned as placeholders instead of being dropped,
+            # which keeps predictions aligned with instances
+            payload['parameters']['includeRaiReason'] = True
+        
+        # Paused here while the circuit is open; False once the breaker gives up
+        if not self.breaker.allow(self.stop_event):
+            if self.breaker.gave_up:
+                self.budget.exhaust('API unavailable (circuit breaker gave up)')
+                self.stop_event.set()
+            return None
+        if not self.budget.reserve():
+            self.breaker.release_probe()
+            self.stop_event.set()
+            return None
+        with METRICS.timer('rate_limit_wait'):
+            api_key = self.credentials.acquire(stop_event=self.stop_event)
+        if api_key is None:
+            self.breaker.release_probe()
+            if not self.stop_event.is_set():
+                print("   🔑 No API key left in rotation - stopping")
+                self.budget.exhaust('no API key left in rotation')
+                self.stop_event.set()
+            return None
         
+        request_start = time.perf_counter()
         try:
-            response = requests.post(
-                f"{self.api_endpoint}?key={self.api_key}",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Extract image from response
-                if 'predictions' in result and len(result['predictions']) > 0:
-                    image_data = result['predictions'][0]
-                    
-                    # Decode base64 image
-                    if 'bytesBase64Encoded' in image_data:
-                        img_bytes = base64.b64decode(image_data['bytesBase64Encoded'])
-                        img = Image.open(BytesIO(img_bytes))
-                        return img
-                    elif 'image' in image_data:
-                        img_bytes = base64.b64decode(image_data['image'])
-                        img = Image.open(BytesIO(img_bytes))
-                        return img
-            
-            print(f"   ⚠️  API Error {response.status_code}: {response.text[:200]}")
-            return None
-            
-        except Exception as e:
-            print(f"   ❌ Request failed: {str(e)}")
+            result = self.transport.predict(payload, api_key.key)
+        except ImagenAPIError as e:
+            if self.credentials.release(api_key, e.kind, e.status_code, e.retry_after, str(e)):
+                # The key, not the request, was refused - retry on another key
+                self.breaker.release_probe()
+                raise ImagenAPIError(str(e), rate_limiter.TRANSIENT, e.status_code)
+            self.breaker.record(e.kind)
+            raise
+        finally:
+            if timings is not None:
+                timings['latency'] = time.perf_counter() - request_start
+        
+        self.credentials.release(api_key, rate_limiter.OK)
+        self.breaker.record(rate_limiter.OK)
+        predictions = result.get('predictions', [])
+        
+        # Without one prediction per instance we can't tell which word an image
+        # belongs to, so only trust positions when the counts match
+        if len(predictions) != len(prompts):
+            if len(prompts) == 1 and predictions:
+                predictions = predictions[:1]
+            else:
+                return [None] * len(prompts)
+        
+        with METRICS.timer('decode'):
+            return [self.decode_prediction(prediction) for prediction in predictions]
+    
+    def decode_prediction(self, image_data: Dict) -> Optional[bytes]:
+        """Decode the base64 image in a single prediction"""
+        encoded = image_data.get('bytesBase64Encoded') or image_data.get('image')
+        if not encoded:
             return None
+        return base64.b64decode(encoded)
     
-    def save_image(self, img: Image.Image, word: str, category: str) -> Path:
-        """Save image and create Xcode asset"""
-        
-        # Create safe filename
-        safe_word = re.sub(r'[^a-zA-Z0-9_-]', '_', word.lower())
-        safe_category = re.sub(r'[^a-zA-Z0-9_-]', '_', category.lower().replace(' ', '_'))
-        
-        # Save high-res PNG in GeneratedImages
-        output_path = self.output_dir / safe_category
-        output_path.mkdir(parents=True, exist_ok=True)
-        
-        img_file = output_path / f"{safe_word}.png"
-        img.save(img_file, 'PNG', optimize=True)
-        
-        # Create Xcode imageset
-        imageset_dir = self.assets_dir / f"{safe_word}.imageset"
-        imageset_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Copy image to imageset
-        xcode_img = imageset_dir / f"{safe_word}.png"
-        img.save(xcode_img, 'PNG', optimize=True)
-        
-        # Create Contents.json
-        contents = {
-            "images": [
-                {
-                    "filename": f"{safe_word}.png",
-                    "idiom": "universal",
-                    "scale": "1x"
-                }
-            ],
-            "info": {
-                "author": "xcode",
-                "version": 1
-            },
-            "properties": {
-                "template-rendering-intent": "original"
-            }
-        }
+    def cache_key_for(self, word: str, category: str) -> str:
+        """Content address of the image the current prompt and settings would produce"""
+        return cache_key(self.api_endpoint, self.create_prompt(word, category), self.parameters,
+                         self.parameters.get('seed'))
+    
+    def is_current(self, word: str, category: str) -> bool:
+        """Whether word/category has a saved image made from the current prompt and settings"""
+        entry = self.store.get_generated(word, category)
+        if entry is None:
+            return False
+        
+        key = self.cache_key_for(word, category)
+        if 'cache_key' not in entry:
+            # Generated before cache keys were recorded - adopt it as current
+            self.store.record_generated(word, category, dict(entry, cache_key=key), count=False)
+            return True
         
-        with open(imageset_dir / 'Contents.json', 'w') as f:
-            json.dump(contents, f, indent=2)
+        return entry['cache_key'] == key and Path(entry['path']).exists()
+    
+    @staticmethod
+    def parse_image_size(value: Optional[str]) -> Optional[Tuple[int, int]]:
+        """Parse IMAGE_SIZE ("1024x1024") into (width, height)"""
+        if not value:
+            return None
+        width, _, height = value.lower().partition('x')
+        return int(width), int(height or width)
+    
+    def save_image(self, img_bytes: bytes, word: str, category: str) -> Path:
+        """
+        Save image and create Xcode asset.
         
-        return img_file
+        Valid PNG output is written straight to disk once and hardlinked into
+        the imageset; it is only decoded when IMAGE_SIZE asks for a resize or
+        the payload isn't a PNG. @1x/@2x/@3x renditions are left to
+        export_assets.py.
+        """
+        result = write_flashcard_assets(img_bytes, word, category, self.output_dir, self.assets_dir,
+                                        self.image_size)
+        return Path(result['path'])
     
-    def generate_image(self, word: str, category: str, attempt: int = 1) -> bool:
+    def generate_image(self, word: str, category: str) -> bool:
         """Generate and save a single flashcard image"""
+        ok = self.generate_batch([(word, category)])[0]
+        self.manifest.save()
+        return ok
+    
+    def save_generated(self, word: str, category: str, key: str, img_bytes: bytes, extra: Dict) -> bool:
+        """Check and write a fetched image, then record it (the in-process `on_image` handler)"""
+        try:
+            result = write_checked_assets(self.quality_gate, img_bytes, word, category, self.output_dir,
+                                          self.assets_dir, self.image_size)
+        except QualityError:
+            # Recorded as a failure by generate_batch; the next attempt must not reuse this image
+            self.cache.discard(key)
+            METRICS.inc('earlily_images_total', result='rejected')
+            raise
+        self.record_saved(word, category, key, result, extra)
+        return True
+    
+    def record_saved(self, word: str, category: str, key: str, result: Dict, extra: Dict):
+        """Record a written image in the metadata store"""
+        METRICS.observe('earlily_stage_seconds', result.get('encode_seconds', 0.0), stage='encode')
+        METRICS.observe('earlily_stage_seconds', result.get('write_seconds', 0.0), stage='write')
+        METRICS.inc('earlily_bytes_written_total', result['bytes'])
+        METRICS.inc('earlily_asset_files_total', result['files_written'], result='written')
+        METRICS.inc('earlily_asset_files_total', result['files_skipped'], result='unchanged')
+        METRICS.inc('earlily_images_total', result='cached' if extra.get('cached') else 'generated')
+        
+        with METRICS.timer('metadata'):
+            self.store.record_generated(word, category, {
+                'path': result['path'],
+                'cache_key': key,
+                'width': result['width'],
+                'height': result['height'],
+                'hash': result['hash'],
+                'timestamp': time.time(),
+                **extra
+            }, count=not extra.get('cached'))
+        self.manifest.update(word, category, result['path'], result['width'], result['height'], result['hash'])
+        
+        if extra.get('cached'):
+            print(f"   ♻️  Restored from cache: {word}")
+        else:
+            print(f"   ✅ Saved: {word}")
+    
+    def record_failed(self, word: str, category: str, error: Exception, attempts: int):
+        """Queue a word that could not be generated, replacing its previous failure"""
+        print(f"   ❌ Failed: {word} - {str(error)}")
+        METRICS.inc('earlily_images_total', result='failed')
+        previous = self.store.get_failure(word, category) or {}
+        now = time.time()
+        kind = getattr(error, 'kind', type(error).__name__)
+        failures = previous.get('failures', 1 if previous else 0) + 1
+        delay = rate_limiter.failure_retry_delay(kind, failures)
+        self.store.record_failure(word, category, {
+            'error': str(error),
+            'error_kind': kind,
+            'status_code': getattr(error, 'status_code', None),
+            'attempts': previous.get('attempts', 0) + attempts,
+            'failures': failures,
+            'first_failed': previous.get('first_failed', previous.get('timestamp', now)),
+            'next_eligible': now + delay if delay is not None else None,
+            'timestamp': now
+        })
+    
+    def generate_batch(self, items: List[Tuple[str, str]],
+                       on_image: Optional[Callable[[str, str, str, bytes, Dict], bool]] = None) -> List[bool]:
+        """
+        Generate and save a batch of (word, category) flashcards.
         
-        # Skip if already generated
-        if word in self.metadata['generated']:
-            return True
+        Each attempt sends every still-pending item in one request; items that
+        come back without an image are retried on their own next time.
         
-        try:
-            prompt = self.create_prompt(word, category)
-            
-            print(f"   🎨 '{word}' (attempt {attempt}/{self.max_retries})")
+        Fetched images are handed to `on_image(word, category, cache_key, bytes, extra)`,
+        which saves them in-process by default; the pipeline passes a handler
+        that queues them for its CPU stage instead.
+        """
+        on_image = on_image or self.save_generated
+        done = {item: self.is_current(*item) for item in items}
+        keys = {item: self.cache_key_for(*item) for item in items if not done[item]}
+        errors = {}
+        
+        def hand_off(item: Tuple[str, str], img_bytes: bytes, extra: Dict):
+            try:
+                done[item] = on_image(item[0], item[1], keys[item], img_bytes, extra)
+            except Exception as e:
+                errors[item] = e
+        
+        # Same prompt and settings already paid for - restore from the cache instead
+        for item in items:
+            if not done[item]:
+                with METRICS.timer('cache_get'):
+                    cached = self.cache.get(keys[item])
+                if cached is not None:
+                    hand_off(item, cached, {'cached': True})
+        
+        pending = [item for item in items if not done[item] and item not in errors]
+        if len(pending) > self.batch_size:
+            # Queued before BATCH_SIZE dropped to 1 - don't send a request the endpoint refuses
+            for item in pending:
+                done[item] = self.generate_batch([item], on_image)[0]
+            pending = []
+        with METRICS.timer('prompt'):
+            prompts = {item: self.create_prompt(*item) for item in pending}
+        started = time.perf_counter()
+        attempt = 0
+        
+        for attempt in range(1, self.max_retries + 1):
+            if not pending:
+                break  # images that failed in on_image (e.g. the quality gate) are recorded below
+            # Stop requested (Ctrl+C) - leave the words untried so the next run picks them up
+            if self.stop_event.is_set():
+                return [done[item] for item in items]
             
-            # Generate image
-            img = self.generate_with_imagen(prompt, word)
+            words = [word for word, _ in pending]
+            print(f"   🎨 {', '.join(repr(w) for w in words)} (attempt {attempt}/{self.max_retries})")
             
-            if img:
-                # Save image
-                img_path = self.save_image(img, word, category)
-                
-                # Update metadata
-                self.metadata['generated'][word] = {
-                    'path': str(img_path),
-                    'category': category,
-                    'timestamp': time.time()
-                }
-                self.metadata['total_count'] += 1
-                self.save_metadata()
+            timings = {}
+            try:
+                images = self.generate_with_imagen_batch([prompts[item] for item in pending], timings)
+            except ImagenAPIError as e:
+                if len(pending) > 1 and e.kind == rate_limiter.FATAL and e.status_code == 400:
+                    # One bad prompt fails the whole batch - retry each word on its own, and
+                    # only drop to one word per call for the run if batching itself is refused
+                    if rate_limiter.rejects_batches(e.body):
+                        print(f"   ⚠️  Batched requests rejected ({e.status_code}), using BATCH_SIZE=1")
+                        self.batch_size = 1
+                    else:
+                        print(f"   ⚠️  Batch rejected ({e.status_code}), retrying {len(pending)} words singly")
+                    for item in pending:
+                        done[item] = self.generate_batch([item], on_image)[0]
+                    pending = []
+                    break
                 
-                print(f"   ✅ Saved: {word}")
-                return True
-            else:
-                # Retry logic
+                print(f"   ⚠️  {', '.join(words)}: {str(e)}")
+                errors.update({item: e for item in pending})
+                if not e.retryable:
+                    break
                 if attempt < self.max_retries:
-                    print(f"   ⏳ Retrying...")
-                    time.sleep(2)
-                    return self.generate_image(word, category, attempt + 1)
-                else:
-                    raise Exception("Max retries exceeded")
-        
-        except Exception as e:
-            print(f"   ❌ Failed: {word} - {str(e)}")
-            self.metadata['failed'].append({
-                'word': word,
-                'category': category,
-                'error': str(e),
-                'timestamp': time.time()
-            })
-            self.save_metadata()
-            return False
+                    METRICS.inc('earlily_retries_total', status=e.status_code or e.kind)
+                    delay = self.credentials.backoff_delay(attempt, e.retry_after)
+                    if not self.budget.fits(delay):
+                        # The retry would overrun the deadline - stop the run instead
+                        self.stop_event.set()
+                        return [done[item] for item in items]
+                    print(f"   ⏳ Retrying in {delay:.1f}s...")
+                    if self.stop_event.wait(delay):
+                        return [done[item] for item in items]
+                continue
+            
+            if images is None:
+                return [done[item] for item in items]
+            
+            still_pending = []
+            for item, img_bytes in zip(pending, images):
+                if img_bytes is None:
+                    errors[item] = ImagenAPIError("No image in response (possibly safety filtered)",
+                                                  rate_limiter.EMPTY, 200)
+                    still_pending.append(item)
+                    continue
+                
+                with METRICS.timer('cache_put'):
+                    self.cache.put(keys[item], img_bytes)
+                errors.pop(item, None)
+                # Latency and elapsed time (including retries) feed the planner's estimates
+                hand_off(item, img_bytes, {
+                    'attempts': attempt,
+                    'batch_size': len(pending),
+                    'latency': round(timings['latency'], 3),
+                    'elapsed': round(time.perf_counter() - started, 3),
+                })
+            
+            pending = still_pending
+        
+        for item in items:
+            if not done[item] and item in errors:
+                # An outage or spent quota, not this word - leave it for the next run
+                if self.breaker.tripped and getattr(errors[item], 'kind', None) in TRIPPING:
+                    continue
+                self.record_failed(item[0], item[1], errors[item], attempt)
+        
+        return [done[item] for item in items]
+    
+    def remaining_words(self, category: str, words: List[str]) -> List[str]:
+        """Words without a current image (duplicates dropped, so two workers never share a word)"""
+        return [w for w in dict.fromkeys(words) if not self.is_current(w, category)]
     
     def generate_category(self, category: str, words: List[str]):
         """Generate all images for a category"""
         print(f"\n📦 Category: {category}")
         print(f"   Words: {len(words)}")
         
-        # Filter out already generated
-        remaining = [w for w in words if w not in self.metadata['generated']]
+        remaining = self.remaining_words(category, words)
         print(f"   Remaining: {len(remaining)}")
         
         if not remaining:
             print("   ✓ Already complete!")
             return
         
-        success_count = 0
-        with tqdm(total=len(remaining), desc=category[:40]) as pbar:
-            for word in remaining:
-                if self.generate_image(word, category):
-                    success_count += 1
-                pbar.update(1)
-                
-                # Rate limiting - be nice to the API
-                time.sleep(1)
-        
+        results = GenerationPipeline(self).run([(word, category) for word in remaining], desc=category[:40])
+        success_count = sum(results.values())
         print(f"   ✅ Completed: {success_count}/{len(remaining)}")
         
         if success_count == len(remaining):
-            self.metadata['categories_completed'].append(category)
-            self.save_metadata()
+            self.store.mark_category_complete(category)
+    
+    def retry_failed(self, concurrency: Optional[int] = None, force: bool = False,
+                     limit_categories: Optional[List[str]] = None, deadline: Optional[float] = None,
+                     max_requests: Optional[int] = None):
+        """
+        Retry only the failure queue - no vocabulary parse or scan.
+        
+        Words are eligible once their `next_eligible` time has passed; `force`
+        retries everything queued, including errors that never become eligible
+        on their own. Successes leave the queue, new failures are re-queued
+        with a longer delay. `deadline` and `max_requests` bound the pass as in
+        generate_all.
+        """
+        print("\n" + "=" * 70)
+        print("🔁 EarLiLy Flashcard Image Generator - Retry Failed")
+        print("=" * 70)
+        
+        now = time.time()
+        queued = self.store.failures()
+        if limit_categories:
+            queued = [f for f in queued if f['category'] in limit_categories]
+        
+        due, waiting, manual = [], [], []
+        for failure in queued:
+            item = (failure['word'], failure['category'])
+            next_eligible = failure.get('next_eligible', 0)
+            if self.is_current(*item):
+                self.store.clear_failure(*item)   # generated since it failed
+            elif force or (next_eligible is not None and next_eligible <= now):
+                due.append(item)
+            elif next_eligible is None:
+                manual.append(item)
+            else:
+                waiting.append(next_eligible)
+        
+        print(f"\n📊 Failure queue: {len(queued)}")
+        print(f"   Due now: {len(due)}")
+        if waiting:
+            print(f"   Waiting: {len(waiting)} (next in {format_duration(min(waiting) - now)})")
+        if manual:
+            print(f"   Needs --force: {len(manual)} (rejected requests)")
+        if not due:
+            return
+        
+        pipeline = GenerationPipeline(self, fetch_workers=concurrency or int(os.getenv('RETRY_CONCURRENCY', 0))
+                                      or self.concurrency)
+        print(f"   Retry workers: {pipeline.fetch_workers}\n")
+        latencies = History(self.store).latencies(self.batch_size)
+        self.budget = RunBudget(deadline, max_requests, request_seconds=percentile(latencies, 95))
+        self.metrics.start()
+        try:
+            results = pipeline.run(due, desc='Retrying')
+        finally:
+            self.metrics.stop()
+        
+        if self.budget.exhausted:
+            print(f"\n🛑 Stopped: {self.budget.exhausted}")
+        print(f"\n✅ Recovered: {sum(results.values())}/{len(due)}")
+        print(f"   Still queued: {self.store.failure_count}")
     
-    def generate_all(self, vocab_file: Path, limit_categories: Optional[List[str]] = None):
-        """Generate all flashcard images"""
+    def generate_all(self, vocab_file: Path, limit_categories: Optional[List[str]] = None, rescan: bool = False,
+                     confirm: bool = True, deadline: Optional[float] = None, max_requests: Optional[int] = None,
+                     order: str = 'round-robin'):
+        """
+        Generate all flashcard images.
+        
+        `deadline` (seconds) and `max_requests` bound the run; words are requested
+        in `order` (see scheduler.py) so a run that stops early still covers
+        every category.
+        """
         
         print("\n" + "=" * 70)
         print("🌼 EarLiLy Flashcard Image Generator - Imagen 3")
         print("=" * 70)
         
-        # Parse vocabulary
-        categories = self.parse_vocabulary(vocab_file)
+        # Parse vocabulary and diff it against the last run; the salt marks every
+        # section changed when the prompt template or model settings change
+        snapshot = VocabularySnapshot(self.snapshot_file)
+        plan = snapshot.plan(vocab_file, salt=lambda category: self.cache_key_for('', category))
+        categories = plan.categories
         
         # Filter if specified
         if limit_categories:
             categories = {k: v for k, v in categories.items() if k in limit_categories}
+        if self.shard:
+            categories = {k: [w for w in v if in_shard(w, self.shard)] for k, v in categories.items()}
+        
+        # Sections unchanged since a run that completed them need no per-word check
+        settled = set() if rescan else {
+            c for c in plan.unchanged_categories if c in categories and self.store.is_category_complete(c)
+        }
+        remaining_by_category = {
+            category: self.remaining_words(category, words)
+            for category, words in categories.items() if category not in settled
+        }
         
         total_words = sum(len(words) for words in categories.values())
-        already_done = len(self.metadata['generated'])
+        remaining = sum(len(words) for words in remaining_by_category.values())
+        already_done = total_words - remaining
         
         print(f"\n📊 Statistics:")
         print(f"   Categories: {len(categories)}")
         print(f"   Total words: {total_words}")
         print(f"   Already generated: {already_done}")
         print(f"   Remaining: {total_words - already_done}")
-        print(f"   Failed previously: {len(self.metadata['failed'])}")
-        
-        # Estimate cost and time
-        remaining = total_words - already_done
-        est_minutes = (remaining * 2) / 60  # ~2 seconds per image
-        print(f"\n⏱️  Estimated time: {est_minutes:.1f} minutes")
+        print(f"   Failed previously: {self.store.failure_count}")
+        print(f"   Vocabulary changes: {plan.summary()}")
+        
+        # Estimate time and API calls from past runs
+        print()
+        estimate = estimate_run(remaining, History(self.store), self.batch_size, self.concurrency,
+                                self.credentials.total_rate, self.max_retries)
+        print_estimate(estimate, self.concurrency, self.credentials.total_rate, self.batch_size)
+        
+        self.budget = RunBudget(deadline, max_requests, request_seconds=estimate['latency_p95'])
+        if self.budget.limited:
+            print(f"🧭 Budget: {self.budget.describe()}, {order} order")
         print(f"💰 API costs: Check your Google AI Studio usage\n")
         
-        input("Press Enter to start generation (Ctrl+C to cancel)...")
+        if confirm:
+            input("Press Enter to start generation (Ctrl+C to cancel)...")
+        snapshot.save(vocab_file, plan)
         
-        # Generate each category
-        for category, words in categories.items():
-            self.generate_category(category, words)
+        # One pipeline across every category keeps the fetch and CPU stages busy
+        items = schedule(remaining_by_category, order)
+        self.metrics.start()
+        try:
+            results = GenerationPipeline(self).run(items, desc='Generating') if items else {}
+        finally:
+            self.metrics.stop()
+        for category, words in remaining_by_category.items():
+            if all(results.get((word, category)) for word in words):
+                self.store.mark_category_complete(category)
         
         # Final summary
         print("\n" + "=" * 70)
-        print("✨ Generation Complete!")
+        if self.budget.exhausted:
+            print(f"🛑 Stopped: {self.budget.exhausted}")
+        else:
+            print("✨ Generation Complete!")
         print("=" * 70)
-        print(f"   Total generated: {self.metadata['total_count']}")
-        print(f"   Failed: {len(self.metadata['failed'])}")
-        print(f"   Categories completed: {len(self.metadata['categories_completed'])}")
+        if self.budget.exhausted:
+            covered = sum(1 for c, words in categories.items()
+                          if any(self.store.is_generated(w, c) for w in words))
+            print(f"   Requests made: {self.budget.requests}")
+            print(f"   Words left: {sum(not ok for ok in results.values())} - run again to continue")
+            print(f"   Categories with images: {covered}/{len(categories)}")
+        print(f"   Total generated: {self.store.total_count}")
+        print(f"   Failed: {self.store.failure_count}")
+        print(f"   Categories completed: {len(self.store.categories_completed())}")
         print(f"\n📁 Output locations:")
         print(f"   Images: {self.output_dir}")
         print(f"   Xcode Assets: {self.assets_dir}")
         print(f"   Metadata: {self.metadata_file}")
+        print(f"   Metrics: {self.metrics.path}")
+        self.credentials.print_summary()
         
-        if self.metadata['failed']:
-            print(f"\n⚠️  Failed images ({len(self.metadata['failed'])}):")
-            for item in self.metadata['failed'][:5]:
+        failed = self.store.failures()
+        if failed:
+            print(f"\n⚠️  Failed images ({len(failed)}):")
+            for item in failed[:5]:
                 print(f"   - {item['word']} ({item['category']})")
-            if len(self.metadata['failed']) > 5:
-                print(f"   ... and {len(self.metadata['failed']) - 5} more")
+            if len(failed) > 5:
+                print(f"   ... and {len(failed) - 5} more")
 
 
 def main():
@@ -386,22 +703,92 @@ Examples:
   
   # Use custom API key
   python generate_images_imagen.py vocab.md --api-key YOUR_KEY_HERE
+  
+  # Run 4 requests in flight, capped at 2 requests per second
+  python generate_images_imagen.py vocab.md --concurrency 4 --rate 2
+  
+  # Unattended: stop cleanly before 2 hours or 500 requests, whichever comes first
+  python generate_images_imagen.py vocab.md --deadline 2h --max-requests 500
+  
+  # Split a run across 4 machines (one shard each), then merge on one of them
+  python generate_images_imagen.py vocab.md --shard 1/4
+  python shards.py merge
+  
+  # Retry only the words that failed before (once their retry delay has passed)
+  python generate_images_imagen.py --retry-failed --retry-concurrency 2
+  
+  # Show generation cache usage
+  python generate_images_imagen.py --cache-stats
         """
     )
     
-    parser.add_argument('vocab_file', type=Path, help='Vocabulary markdown file')
+    parser.add_argument('vocab_file', type=Path, nargs='?', help='Vocabulary markdown file')
     parser.add_argument('--categories', nargs='+', help='Specific categories to generate')
-    parser.add_argument('--api-key', help='Google API key (or set GOOGLE_API_KEY env var)')
+    parser.add_argument('--api-key', action='append',
+                        help='Google API key, repeat for a key pool (or set GEMINI_API_KEYS / GEMINI_API_KEY)')
+    parser.add_argument('--concurrency', type=int, help='Requests in flight at once (or set CONCURRENCY env var)')
+    parser.add_argument('--rate', type=float, dest='requests_per_second',
+                        help='Max API requests per second, 0 = unlimited (or set REQUESTS_PER_SECOND env var)')
+    parser.add_argument('--batch-size', type=int, help='Words per API request (or set BATCH_SIZE env var)')
+    parser.add_argument('--cpu-workers', type=int,
+                        help='Processes writing assets, 0 = in-process (or set CPU_WORKERS env var)')
+    parser.add_argument('--metadata-backend', choices=['journal', 'sqlite'],
+                        help='Generation log format (or set METADATA_BACKEND env var, default: journal)')
+    parser.add_argument('--yes', '-y', action='store_true', help='Start without the confirmation prompt')
+    parser.add_argument('--deadline', type=parse_duration,
+                        help='Stop before this much time has passed, e.g. 45m or 2h (implies --yes)')
+    parser.add_argument('--max-requests', type=int,
+                        help='Stop after this many API requests, retries included (implies --yes)')
+    parser.add_argument('--order', choices=ORDERS, default='round-robin',
+                        help='round-robin across categories (default) or file order')
+    parser.add_argument('--shard', type=parse_shard,
+                        help='Generate only shard i of N (e.g. 2/4) into shards/i-of-N; combine with shards.py merge')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Retry only the failure queue (words past their retry delay), no vocabulary needed')
+    parser.add_argument('--retry-concurrency', type=int,
+                        help='Requests in flight for --retry-failed (or set RETRY_CONCURRENCY env var)')
+    parser.add_argument('--force', action='store_true', help='With --retry-failed: retry every queued word now')
+    parser.add_argument('--rescan', action='store_true',
+                        help='Check every word, even in categories unchanged since a completed run')
+    parser.add_argument('--metrics-file', type=Path,
+                        help='Metrics output, .prom or .json (or set METRICS_FILE env var)')
+    parser.add_argument('--cache-stats', action='store_true', help='Print generation cache usage and exit')
     
     args = parser.parse_args()
     
-    if not args.vocab_file.exists():
+    if args.cache_stats:
+        GenerationCache().print_stats()
+        return
+    
+    if args.vocab_file is None and not args.retry_failed:
+        parser.error('vocab_file is required')
+    
+    if args.vocab_file is not None and not args.vocab_file.exists():
         print(f"❌ Error: File not found: {args.vocab_file}")
         return
     
     try:
-        generator = ImagenFlashcardGenerator(api_key=args.api_key)
-        generator.generate_all(args.vocab_file, args.categories)
+        generator = ImagenFlashcardGenerator(
+            api_key=args.api_key,
+            concurrency=args.concurrency,
+            requests_per_second=args.requests_per_second,
+            batch_size=args.batch_size,
+            metadata_backend=args.metadata_backend,
+            cpu_workers=args.cpu_workers,
+            metrics_file=args.metrics_file,
+            shard=args.shard
+        )
+        if args.retry_failed:
+            generator.retry_failed(args.retry_concurrency, args.force, args.categories,
+                                   deadline=args.deadline, max_requests=args.max_requests)
+        else:
+            headless = args.yes or args.deadline is not None or args.max_requests is not None
+            generator.generate_all(args.vocab_file, args.categories, rescan=args.rescan, confirm=not headless,
+                                   deadline=args.deadline, max_requests=args.max_requests, order=args.order)
+        
+        if generator.breaker.gave_up or not generator.credentials.usable_keys or generator.cpu_stage_error:
+            print(f"\n⏸️  Stopped early - progress saved, rerun to resume (exit status {EXIT_RESUMABLE})")
+            sys.exit(EXIT_RESUMABLE)
     
     except KeyboardInterrupt:
         print("\n\n⏸️  Generation paused - progress saved")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Generation Cache
+Content-addressed store of raw Imagen output, keyed on everything that
+determines the image (endpoint, prompt, parameters, seed). Entries are
+gzip-compressed on disk and evicted least-recently-used once the cache
+exceeds its size budget.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / 'generation_cache'
+
+
+def cache_key(endpoint: str, prompt: str, parameters: Dict, seed: Optional[int] = None) -> str:
+    """Stable SHA-256 over the inputs that determine a generated image"""
+    material = json.dumps({
+        'endpoint': endpoint,
+        'prompt': prompt,
+        'parameters': parameters,
+        'seed': seed,
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """LRU-bounded, gzip-compressed, content-addressed image cache"""
+    
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            cache_dir: Cache location (or GENERATION_CACHE_DIR env var)
+            max_bytes: Size budget on disk (or CACHE_MAX_MB env var, default 2048 MB)
+        """
+        self.cache_dir = Path(cache_dir or os.getenv('GENERATION_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv('CACHE_MAX_MB', 2048)) * 1024 ** 2)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        # Sizes of every entry, for eviction without rescanning the tree
+        self.sizes: Dict[Path, int] = {
+            path: path.stat().st_size for path in self.cache_dir.glob('*/*.gz')
+        }
+        self.total_bytes = sum(self.sizes.values())
+    
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.gz"
+    
+    def __contains__(self, key: str) -> bool:
+        return self.path_for(key) in self.sizes
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for `key`, marking the entry recently used"""
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = gzip.decompress(f.read())
+        except (OSError, EOFError):
+            with self.lock:
+                self.misses += 1
+            return None
+        
+        os.utime(path)
+        with self.lock:
+            self.hits += 1
+        return data
+    
+    def put(self, key: str, data: bytes):
+        """Store `data` under `key` (atomically), then evict down to the budget"""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=6, mtime=0))
+        os.replace(tmp_path, path)
+        
+        size = path.stat().st_size
+        with self.lock:
+            self.total_bytes += size - self.sizes.get(path, 0)
+            self.sizes[path] = size
+        self.evict()
+    
+    def discard(self, key: str):
+        """Drop `key` so the next request for it goes to the API (e.g. a rejected image)"""
+        path = self.path_for(key)
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        with self.lock:
+            self.total_bytes -= self.sizes.pop(path, 0)
+    
+    def evict(self):
+        """Remove least-recently-used entries until the cache fits its budget"""
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            
+            by_age = []
+            for path in self.sizes:
+                try:
+                    by_age.append((path.stat().st_mtime, path))
+                except OSError:
+                    by_age.append((0.0, path))
+            by_age.sort()
+            
+            for _, path in by_age:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                self.total_bytes -= self.sizes.pop(path)
+                self.evictions += 1
+    
+    def stats(self) -> Dict:
+        """Size, occupancy and hit-rate figures"""
+        with self.lock:
+            mtimes = []
+            for path in self.sizes:
+                try:
+                    mtimes.append(path.stat().st_mtime)
+                except OSError:
+                    pass
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.sizes),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'oldest': min(mtimes) if mtimes else None,
+                'newest': max(mtimes) if mtimes else None,
+            }
+    
+    def print_stats(self):
+        """Human-readable report for --cache-stats"""
+        stats = self.stats()
+        print("🗄️  Generation Cache")
+        print(f"   Location: {self.cache_dir}")
+        print(f"   Entries: {stats['entries']}")
+        print(f"   Size: {stats['bytes'] / 1024 ** 2:.1f} MB of {stats['max_bytes'] / 1024 ** 2:.0f} MB "
+              f"({100 * stats['bytes'] / max(stats['max_bytes'], 1):.0f}%)")
+        if stats['oldest'] is not None:
+            print(f"   Least recently used: {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats['oldest']))}")
+            print(f"   Most recently used: {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats['newest']))}")
+        if stats['hits'] or stats['misses']:
+            print(f"   Hit rate: {100 * stats['hit_rate']:.0f}% ({stats['hits']} hits, {stats['misses']} misses)")
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Image I/O
+Writes API output to GeneratedImages/ and the Xcode asset catalog.
+
+PNG payloads are written to GeneratedImages/ as-is after a header check.
+Imagesets get @1x/@2x/@3x renditions resampled for the on-screen point
+size, or - with no point size - a hardlink (or reflink) of the source
+bytes. PIL is only imported when an image actually has to be decoded.
+
+Every write goes through a temp file and an atomic rename, so replacing one
+hardlinked copy never modifies the other. Files that already hold the
+bytes being written are left alone, keeping their mtimes, so Xcode doesn't
+recompile the asset catalog for a re-export that changed nothing.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+# Flashcard images are drawn in a 280x280 pt frame (FlashcardView.swift)
+DEFAULT_POINT_SIZE = 280
+SCALES = (1, 2, 3)
+
+# Linux FICLONE ioctl - copy-on-write clone on btrfs/xfs
+FICLONE = 0x40049409
+
+
+def safe_name(text: str) -> str:
+    """Filesystem- and asset-catalog-safe name for a word"""
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', text.lower())
+
+
+def safe_category_name(category: str) -> str:
+    """Directory name for a category under GeneratedImages/"""
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', category.lower().replace(' ', '_'))
+
+
+def asset_name(word: str, category: str) -> str:
+    """
+    Imageset name for word/category, e.g. food___drink-orange.
+
+    Category-qualified because asset names are global in the catalog and
+    some words (orange, clock, ring, ...) are in two categories.
+    """
+    return f"{safe_category_name(category)}-{safe_name(word)}"
+
+
+def png_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Width and height of a complete PNG, or None if `data` isn't one.
+
+    Checks the signature, the IHDR chunk (including its CRC) and the trailing
+    IEND chunk - enough to catch truncated or mislabelled payloads without
+    decompressing any pixel data.
+    """
+    if len(data) < 45 or not data.startswith(PNG_SIGNATURE) or not data.endswith(PNG_IEND):
+        return None
+    length, chunk_type = struct.unpack('>I4s', data[8:16])
+    if chunk_type != b'IHDR' or length != 13:
+        return None
+    ihdr = data[16:29]
+    (crc,) = struct.unpack('>I', data[29:33])
+    if zlib.crc32(b'IHDR' + ihdr) != crc:
+        return None
+    width, height = struct.unpack('>II', ihdr[:8])
+    if width == 0 or height == 0:
+        return None
+    return width, height
+
+
+def content_hash(data: bytes) -> str:
+    """Short SHA-256 of an image's bytes, as recorded in the log and the manifest"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def temp_path_for(path: Path) -> Path:
+    """Sibling temp file unique to this process and thread"""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def write_bytes_atomic(path: Path, data: bytes):
+    """Write `data` to `path` via a temp file and rename"""
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def tally(counts: Optional[Dict], key: str, n: int = 1):
+    """Add to a 'written' / 'skipped' / 'deleted' file count, if one is being kept"""
+    if counts is not None:
+        counts[key] = counts.get(key, 0) + n
+
+
+def same_content(path: Path, data: bytes) -> bool:
+    """`path` exists and holds exactly `data` (size checked before reading)"""
+    try:
+        return path.stat().st_size == len(data) and path.read_bytes() == data
+    except OSError:
+        return False
+
+
+def write_if_changed(path: Path, data: bytes, counts: Optional[Dict] = None) -> bool:
+    """write_bytes_atomic unless `path` already holds `data`; True if written"""
+    if same_content(path, data):
+        tally(counts, 'skipped')
+        return False
+    write_bytes_atomic(path, data)
+    tally(counts, 'written')
+    return True
+
+
+def link_if_changed(src: Path, dst: Path, counts: Optional[Dict] = None) -> bool:
+    """link_or_copy unless `dst` is already `src` (a hardlink) or has the same bytes; True if linked"""
+    try:
+        unchanged = os.path.samefile(src, dst) or (
+            dst.stat().st_size == src.stat().st_size and dst.read_bytes() == src.read_bytes()
+        )
+    except OSError:
+        unchanged = False
+    if unchanged:
+        tally(counts, 'skipped')
+        return False
+    link_or_copy(src, dst)
+    tally(counts, 'written')
+    return True
+
+
+def link_or_copy(src: Path, dst: Path):
+    """Make `dst` share `src`'s bytes: hardlink, else reflink, else a plain copy"""
+    tmp_path = temp_path_for(dst)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        try:
+            import fcntl
+            with open(src, 'rb') as fsrc, open(tmp_path, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except (ImportError, OSError):
+            shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def encode_png(data: bytes, size: Optional[Tuple[int, int]] = None) -> Tuple[bytes, Tuple[int, int]]:
+    """Decode any image PIL understands, optionally resize, and re-encode as PNG"""
+    from io import BytesIO
+    from PIL import Image
+    
+    img = Image.open(BytesIO(data))
+    if size is not None and img.size != size:
+        img = img.resize(size, Image.LANCZOS)
+    out = BytesIO()
+    img.save(out, 'PNG', optimize=True)
+    return out.getvalue(), img.size
+
+
+def imageset_contents(filename: str) -> Dict:
+    """Contents.json for a single-scale imageset"""
+    return multiscale_imageset_contents({1: filename})
+
+
+def multiscale_imageset_contents(filenames: Dict[int, str]) -> Dict:
+    """Contents.json for an imageset with one file per scale factor"""
+    return {
+        "images": [
+            {
+                "filename": filename,
+                "idiom": "universal",
+                "scale": f"{scale}x"
+            }
+            for scale, filename in sorted(filenames.items())
+        ],
+        "info": {
+            "author": "xcode",
+            "version": 1
+        },
+        "properties": {
+            "template-rendering-intent": "original"
+        }
+    }
+
+
+def scaled_filename(name: str, scale: int) -> str:
+    """Asset catalog naming: name.png, name@2x.png, name@3x.png"""
+    return f"{name}.png" if scale == 1 else f"{name}@{scale}x.png"
+
+
+def write_scaled_imageset(source: Path, name: str, assets_dir: Path, point_size: int = DEFAULT_POINT_SIZE,
+                          scales: Tuple[int, ...] = SCALES, timings: Optional[Dict] = None,
+                          counts: Optional[Dict] = None, encode: Optional[Callable] = None) -> int:
+    """
+    Resample `source` to every scale of `point_size` and write the imageset.
+
+    Each rendition is resampled from the full-size source (never from another
+    rendition), and is never upscaled past the source. `encode` turns a
+    rendition into PNG bytes (default: a plain PNG). Returns bytes written;
+    decode/resample/encode time is added to `timings['encode']` and files
+    written / skipped / deleted to `counts`, if given.
+    """
+    from io import BytesIO
+    from PIL import Image
+    
+    imageset_dir = Path(assets_dir) / f"{name}.imageset"
+    imageset_dir.mkdir(parents=True, exist_ok=True)
+    
+    written = 0
+    encode_seconds = 0.0
+    with Image.open(source) as img:
+        start = time.perf_counter()
+        img.load()
+        filenames = {}
+        for scale in scales:
+            pixels = min(point_size * scale, img.width)
+            height = round(img.height * pixels / img.width)
+            rendition = img
+            if (pixels, height) != img.size:
+                rendition = img.resize((pixels, height), Image.LANCZOS, reducing_gap=3.0)
+            if encode is not None:
+                data = encode(rendition)
+            else:
+                out = BytesIO()
+                rendition.save(out, 'PNG')
+                data = out.getvalue()
+            encode_seconds += time.perf_counter() - start
+            
+            filenames[scale] = scaled_filename(name, scale)
+            if write_if_changed(imageset_dir / filenames[scale], data, counts):
+                written += len(data)
+            start = time.perf_counter()
+    
+    if timings is not None:
+        timings['encode'] = timings.get('encode', 0.0) + encode_seconds
+    
+    contents = json.dumps(multiscale_imageset_contents(filenames), indent=2).encode('utf-8')
+    if write_if_changed(imageset_dir / 'Contents.json', contents, counts):
+        written += len(contents)
+    
+    prune_imageset(imageset_dir, filenames.values(), counts)
+    return written
+
+
+def prune_imageset(imageset_dir: Path, keep, counts: Optional[Dict] = None) -> None:
+    """Remove renditions Contents.json no longer references (e.g. after a scale change)"""
+    keep = set(keep)
+    for path in imageset_dir.glob('*.png'):
+        if path.name not in keep:
+            path.unlink()
+            tally(counts, 'deleted')
+
+
+def write_flashcard_assets(data: bytes, word: str, category: str, output_dir: Path, assets_dir: Path,
+                           size: Optional[Tuple[int, int]] = None, point_size: Optional[int] = None) -> Dict:
+    """
+    Save one generated image to GeneratedImages/ and its Xcode imageset.
+
+    `size` requests a resize; without it, valid PNG bytes are written untouched.
+    `point_size` writes @1x/@2x/@3x renditions; without it the imageset holds
+    a single 1x link to the source. The imageset is named by asset_name(). Files already holding the right bytes
+    are not rewritten. Returns the source path, dimensions, content hash,
+    bytes and files written, files left unchanged and the seconds spent
+    encoding vs. writing.
+    """
+    start = time.perf_counter()
+    timings = {'encode': 0.0}
+    counts = {'written': 0, 'skipped': 0, 'deleted': 0}
+    safe_word = safe_name(word)
+    name = asset_name(word, category)
+    
+    dimensions = png_dimensions(data)
+    if dimensions is None or (size is not None and dimensions != size):
+        data, dimensions = encode_png(data, size)
+        timings['encode'] = time.perf_counter() - start
+    
+    # Save high-res PNG in GeneratedImages
+    output_path = Path(output_dir) / safe_category_name(category)
+    output_path.mkdir(parents=True, exist_ok=True)
+    img_file = output_path / f"{safe_word}.png"
+    written = len(data) if write_if_changed(img_file, data, counts) else 0
+    
+    if point_size:
+        written += write_scaled_imageset(img_file, name, assets_dir, point_size, timings=timings, counts=counts)
+    else:
+        # Create Xcode imageset sharing the same bytes
+        imageset_dir = Path(assets_dir) / f"{name}.imageset"
+        imageset_dir.mkdir(parents=True, exist_ok=True)
+        link_if_changed(img_file, imageset_dir / f"{name}.png", counts)
+        
+        contents = json.dumps(imageset_contents(f"{name}.png"), indent=2).encode('utf-8')
+        if write_if_changed(imageset_dir / 'Contents.json', contents, counts):
+            written += len(contents)
+        prune_imageset(imageset_dir, [f"{name}.png"], counts)
+    
+    return {
+        'path': str(img_file),
+        'width': dimensions[0],
+        'height': dimensions[1],
+        'hash': content_hash(data),
+        'bytes': written,
+        'files_written': counts['written'],
+        'files_skipped': counts['skipped'],
+        'encode_seconds': timings['encode'],
+        'write_seconds': time.perf_counter() - start - timings['encode'],
+    }
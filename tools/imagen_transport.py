@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Imagen Transport
+Pooled, keep-alive HTTP client for the Imagen 3 :predict endpoint,
+shared by the generator and the test scripts
+"""
+
+import json
+import os
+import zlib
+from typing import Dict, Optional, Tuple
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+from metrics import METRICS
+
+IMAGEN_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-001:predict"
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ImagenAPIError(Exception):
+    """A failed Imagen request, classified for retry and rate limiting"""
+    
+    def __init__(self, message: str, kind: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None, body: str = ''):
+        super().__init__(message)
+        self.kind = kind
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.body = body
+    
+    @property
+    def retryable(self) -> bool:
+        return self.kind in rate_limiter.RETRYABLE
+
+
+def read_body(response: requests.Response) -> Tuple[bytes, int]:
+    """
+    Read a streamed response to the end; returns (decoded body, bytes on the wire).
+
+    requests only exposes the decoded body and urllib3 doesn't count chunked
+    bodies, so the compressed bytes are read here and inflated in one call.
+    Reading to the end returns the connection to the keep-alive pool.
+    """
+    try:
+        raw = b''.join(response.raw.stream(READ_CHUNK_SIZE, decode_content=False))
+    except BaseException:
+        response.close()
+        raise
+    if response.headers.get('Content-Encoding', '').lower() in ('gzip', 'deflate'):
+        return zlib.decompress(raw, 32 + zlib.MAX_WBITS), len(raw)  # 32: gzip or zlib header
+    return raw, len(raw)
+
+
+class ImagenTransport:
+    """Session-backed transport that reuses TLS connections across requests"""
+    
+    def __init__(self, api_key: str, endpoint: str = IMAGEN_ENDPOINT, pool_size: Optional[int] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None):
+        """
+        Args:
+            api_key: Google AI Studio API key
+            endpoint: Full :predict URL
+            pool_size: Keep-alive connections to hold open (match the worker count)
+            connect_timeout: Seconds to establish a connection (or CONNECT_TIMEOUT env var)
+            read_timeout: Seconds to wait for the response (or READ_TIMEOUT env var)
+        """
+        self.endpoint = endpoint
+        self.pool_size = max(1, pool_size or int(os.getenv('HTTP_POOL_SIZE', 1)))
+        self.timeout = (
+            connect_timeout or float(os.getenv('CONNECT_TIMEOUT', 10)),
+            read_timeout or float(os.getenv('READ_TIMEOUT', 60))
+        )
+        
+        # pool_block makes extra threads wait for a pooled connection instead of
+        # opening (and then discarding) a fresh TLS connection
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'x-goog-api-key': api_key,
+        })
+    
+    def predict(self, payload: Dict, api_key: Optional[str] = None) -> Dict:
+        """
+        POST a :predict payload and return the decoded JSON body, or raise ImagenAPIError.
+
+        `api_key` overrides the session's key for this request (credential pools
+        share one connection pool across keys).
+        """
+        headers = {'x-goog-api-key': api_key} if api_key else None
+        try:
+            with METRICS.timer('http'):
+                response = self.session.post(self.endpoint, json=payload, timeout=self.timeout,
+                                             headers=headers, stream=True)
+                body, wire_bytes = read_body(response)
+        except (requests.RequestException, urllib3.exceptions.HTTPError, zlib.error) as e:
+            METRICS.inc('earlily_requests_total', status=type(e).__name__)
+            raise ImagenAPIError(f"Request failed: {str(e)}", rate_limiter.TRANSIENT)
+        
+        METRICS.inc('earlily_requests_total', status=response.status_code)
+        METRICS.inc('earlily_bytes_downloaded_total', wire_bytes)
+        
+        text = body.decode('utf-8', 'replace')
+        kind = rate_limiter.classify_response(response.status_code, text)
+        if kind != rate_limiter.OK:
+            retry_after = (rate_limiter.parse_retry_after(response.headers.get('Retry-After'))
+                           or rate_limiter.retry_delay_from_body(text))
+            raise ImagenAPIError(
+                f"API Error {response.status_code} ({kind}): {text[:200]}",
+                kind, response.status_code, retry_after, text
+            )
+        
+        try:
+            with METRICS.timer('json'):
+                return json.loads(body)
+        except ValueError:
+            raise ImagenAPIError("Malformed JSON response", rate_limiter.TRANSIENT, response.status_code)
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
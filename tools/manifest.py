@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Flashcard Manifest
+One small JSON file listing every generated flashcard, so the app loads its
+card list in a single read instead of enumerating image directories:
+
+    {"version": 1,
+     "fields": ["word", "category", "path", "width", "height", "hash"],
+     "categories": ["Animals & Creatures", ...],
+     "cards": [["cat", 0, "animals_creatures/cat.png", 1024, 1024, "9f2c..."], ...]}
+
+Each card is a positional row (the category is an index into
+`categories`); `path` is relative to GeneratedImages/, where the manifest
+lives, and `hash` is the image's content_hash. The generator updates its
+in-memory copy as images are written and rewrites the file once per run,
+only if something changed. Rows are sorted, so an unchanged card list is
+byte-identical.
+
+The app reads a copy that export_assets.py writes to EarLiLy/Images/ (the
+folder bundled as Images/). It has an `image` field instead of `path`:
+the imageset name (see image_io.asset_name), which the app loads from the
+asset catalog or a sprite atlas.
+
+Rebuild it from the generation log (e.g. after merging shards):
+
+    python3 manifest.py
+"""
+
+import argparse
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from image_io import content_hash, png_dimensions, write_bytes_atomic
+
+MANIFEST_NAME = 'flashcards_manifest.json'
+MANIFEST_VERSION = 1
+FIELDS = ['word', 'category', 'path', 'width', 'height', 'hash']
+BUNDLE_FIELDS = ['word', 'category', 'image', 'width', 'height', 'hash']
+DEFAULT_BUNDLE_DIR = Path(__file__).parent.parent / 'EarLiLy' / 'Images'
+
+
+class Manifest:
+    """In-memory card list for one GeneratedImages/ tree, written atomically on save()"""
+    
+    def __init__(self, images_dir: Path, fields: List[str] = FIELDS):
+        self.images_dir = Path(images_dir)
+        self.fields = fields
+        self.path = self.images_dir / MANIFEST_NAME
+        self.lock = threading.Lock()
+        self.cards: Dict[Tuple[str, str], List] = {}
+        self.dirty = False
+        self.load()
+    
+    def load(self):
+        """Read the current file; a missing, corrupt or older-version manifest starts empty"""
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            self.dirty = True
+            return
+        try:
+            categories = data['categories']
+            for word, category, *rest in data['cards']:
+                self.cards[(word, categories[category])] = rest
+        except (KeyError, IndexError, TypeError, ValueError):
+            self.cards.clear()
+            self.dirty = True
+    
+    def relative(self, path) -> str:
+        """`path` relative to GeneratedImages/ (as stored in the log, it's absolute)"""
+        try:
+            return Path(path).resolve().relative_to(self.images_dir.resolve()).as_posix()
+        except ValueError:
+            return Path(path).as_posix()
+    
+    def update(self, word: str, category: str, path, width: int, height: int, digest: str):
+        """Add or replace one card"""
+        row = [self.relative(path), width, height, digest]
+        with self.lock:
+            if self.cards.get((word, category)) != row:
+                self.cards[(word, category)] = row
+                self.dirty = True
+    
+    def remove(self, word: str, category: str):
+        with self.lock:
+            if self.cards.pop((word, category), None) is not None:
+                self.dirty = True
+    
+    def __len__(self) -> int:
+        return len(self.cards)
+    
+    def to_bytes(self) -> bytes:
+        with self.lock:
+            categories = sorted({category for _, category in self.cards})
+            positions = {category: i for i, category in enumerate(categories)}
+            cards = [
+                [word, positions[category], *row]
+                for (word, category), row in sorted(self.cards.items(), key=lambda item: (item[0][1], item[0][0]))
+            ]
+        return json.dumps({
+            'version': MANIFEST_VERSION,
+            'fields': self.fields,
+            'categories': categories,
+            'cards': cards,
+        }, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    
+    def save(self, force: bool = False) -> bool:
+        """Write the file if any card changed since it was loaded; True if written"""
+        if not (self.dirty or force):
+            return False
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        write_bytes_atomic(self.path, self.to_bytes())
+        self.dirty = False
+        return True
+    
+    def sync_store(self, store) -> Dict:
+        """
+        Make the card list match the generation log's generated entries.
+
+        Hashes logged by the generator are reused; an image logged before
+        hashes were recorded is read once, unless this manifest already
+        has a card for the same file and size.
+        """
+        counts = {'cards': 0, 'hashed': 0, 'missing': 0, 'removed': 0}
+        seen = set()
+        for entry in store.generated_entries():
+            word, category = entry['word'], entry['category']
+            path = Path(entry['path']) if entry.get('path') else None
+            if path is None or not path.exists():
+                counts['missing'] += 1
+                continue
+            seen.add((word, category))
+            digest = entry.get('hash')
+            previous = self.cards.get((word, category))
+            if not digest and previous and previous[0] == self.relative(path) \
+                    and [previous[1], previous[2]] == [entry.get('width'), entry.get('height')]:
+                digest = previous[3]
+            if not digest:
+                digest = content_hash(path.read_bytes())
+                counts['hashed'] += 1
+            self.update(word, category, path, entry.get('width'), entry.get('height'), digest)
+            counts['cards'] += 1
+        for key in [key for key in self.cards if key not in seen]:
+            self.remove(*key)
+            counts['removed'] += 1
+        return counts
+
+
+def write_bundle_manifest(source_dir: Path, images: Dict[str, Path], bundle_dir: Path = DEFAULT_BUNDLE_DIR) -> Dict:
+    """
+    Write the app's manifest to `bundle_dir`: one card per exported image.
+
+    `images` maps imageset name -> source PNG under `source_dir`. Words,
+    categories and hashes come from the generator's manifest in
+    `source_dir`; an image it doesn't list (added by hand) is named after
+    its file and directory and read once.
+    """
+    generated = Manifest(source_dir)
+    by_path = {row[0]: (word, category, row) for (word, category), row in generated.cards.items()}
+    
+    cards: Dict[Tuple[str, str], List] = {}
+    unlisted = 0
+    for name, path in sorted(images.items()):
+        found = by_path.get(generated.relative(path))
+        if found:
+            word, category, (_, width, height, digest) = found
+        else:
+            data = path.read_bytes()
+            word, category = path.stem.replace('_', ' '), path.parent.name
+            width, height = png_dimensions(data) or (0, 0)
+            digest = content_hash(data)
+            unlisted += 1
+        cards[(word, category)] = [name, width, height, digest]
+    
+    bundle = Manifest(bundle_dir, BUNDLE_FIELDS)
+    if bundle.cards != cards:
+        bundle.cards = cards
+        bundle.dirty = True
+    written = bundle.save(force=not bundle.path.exists())
+    return {'path': bundle.path, 'cards': len(cards), 'unlisted': unlisted, 'written': written}
+
+
+def main():
+    # shards.py updates the manifest after a merge, so these can't be top-level imports
+    from shards import parse_shard, shard_dir
+    from status import REPO_DIR, metadata_file_for, open_existing_store
+    
+    parser = argparse.ArgumentParser(
+        description=f'Rebuild GeneratedImages/{MANIFEST_NAME} from the generation log (no API calls)'
+    )
+    parser.add_argument('--shard', type=parse_shard, help='Rebuild shard i of N (e.g. 2/4) instead of the canonical tree')
+    parser.add_argument('--metadata-backend', choices=['journal', 'sqlite'],
+                        help='Generation log format (or set METADATA_BACKEND env var, default: journal)')
+    
+    args = parser.parse_args()
+    
+    base_dir = shard_dir(args.shard, REPO_DIR / 'shards') if args.shard else REPO_DIR
+    store = open_existing_store(metadata_file_for(args.shard), args.metadata_backend)
+    if store is None:
+        print("❌ Error: No generation log found - nothing to list")
+        sys.exit(1)
+    
+    manifest = Manifest(base_dir / 'GeneratedImages')
+    try:
+        counts = manifest.sync_store(store)
+    finally:
+        store.close()
+    written = manifest.save(force=not manifest.path.exists())
+    
+    print(f"🗂️  {manifest.path}")
+    print(f"   Cards: {counts['cards']} ({counts['hashed']} hashed from disk)")
+    if counts['missing']:
+        print(f"   ⚠️  Logged but missing on disk: {counts['missing']} (run verify_assets.py)")
+    if counts['removed']:
+        print(f"   Removed: {counts['removed']} no longer in the log")
+    print(f"   {'Written' if written else 'Unchanged'}: {manifest.path.stat().st_size / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
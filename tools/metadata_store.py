@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Metadata Store
+Crash-safe generation history with O(1) lookups.
+
+Two interchangeable backends:
+- journal: append-only JSONL log, replayed into memory on start and
+  compacted into a fresh snapshot once it grows stale
+- sqlite: single-file database indexed on word, category and status
+
+Failures form a retry queue keyed by (word, category): recording a
+failure replaces the previous one, and recording the image clears it.
+
+Both import the legacy image_generation_log.json on first run. Opened
+read-only (status, verify, manifest), neither writes anything: the legacy
+log is then only imported into memory.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+BACKENDS = ('journal', 'sqlite')
+
+Key = Tuple[str, str]
+
+
+class MetadataStore(ABC):
+    """Interface shared by the metadata backends"""
+    
+    path: Path
+    
+    @abstractmethod
+    def is_generated(self, word: str, category: Optional[str] = None) -> bool:
+        """Whether `word` was generated (in `category`, or in any category if None)"""
+    
+    @abstractmethod
+    def get_generated(self, word: str, category: str) -> Optional[Dict]:
+        ...
+    
+    @abstractmethod
+    def record_generated(self, word: str, category: str, entry: Dict, count: bool = True):
+        """Store the entry for word/category; `count` adds it to total_count"""
+    
+    @abstractmethod
+    def record_failure(self, word: str, category: str, entry: Dict):
+        """Queue (or replace) the failure for word/category"""
+    
+    @abstractmethod
+    def get_failure(self, word: str, category: str) -> Optional[Dict]:
+        ...
+    
+    @abstractmethod
+    def clear_failure(self, word: str, category: str):
+        """Drop word/category from the failure queue (recording the image does this too)"""
+    
+    @abstractmethod
+    def forget(self, word: str, category: str):
+        """Drop a generated entry so the next run regenerates it"""
+    
+    @abstractmethod
+    def has_failed(self, word: str, category: str) -> bool:
+        ...
+    
+    @abstractmethod
+    def mark_category_complete(self, category: str):
+        ...
+    
+    @abstractmethod
+    def is_category_complete(self, category: str) -> bool:
+        ...
+    
+    @abstractmethod
+    def generated_entries(self) -> Iterator[Dict]:
+        """Every generated entry, including its word and category"""
+    
+    @abstractmethod
+    def failures(self) -> List[Dict]:
+        """The failure queue, one entry per word/category, least recently failed first"""
+    
+    @abstractmethod
+    def categories_completed(self) -> List[str]:
+        ...
+    
+    @property
+    @abstractmethod
+    def total_count(self) -> int:
+        ...
+    
+    @property
+    @abstractmethod
+    def generated_count(self) -> int:
+        ...
+    
+    @property
+    @abstractmethod
+    def failure_count(self) -> int:
+        ...
+    
+    def close(self):
+        pass
+    
+    def import_legacy(self, legacy_file: Path):
+        """Load a whole-file JSON log written by earlier versions of the generator"""
+        with open(legacy_file, 'r') as f:
+            legacy = json.load(f)
+        
+        for word, entry in legacy.get('generated', {}).items():
+            # generate_images.py stored a bare path string
+            if not isinstance(entry, dict):
+                entry = {'path': entry}
+            entry = dict(entry)
+            category = entry.pop('category', '')
+            self.record_generated(word, category, entry)
+        
+        for item in legacy.get('failed', []):
+            item = dict(item)
+            self.record_failure(item.pop('word'), item.pop('category', ''), item)
+        
+        for category in legacy.get('categories_completed', []):
+            self.mark_category_complete(category)
+        
+        self._set_total_count(max(legacy.get('total_count', 0), self.generated_count))
+    
+    @abstractmethod
+    def _set_total_count(self, count: int):
+        ...
+
+
+class JournalMetadataStore(MetadataStore):
+    """Append-only JSONL journal replayed into in-memory indexes"""
+    
+    def __init__(self, path: Path, fsync: bool = True, compact_ratio: float = 2.0, compact_min: int = 1000,
+                 read_only: bool = False):
+        """
+        Args:
+            path: Journal file (.jsonl)
+            fsync: Flush every record to disk before returning
+            compact_ratio: Compact once the journal holds this many records per live entry
+            compact_min: Never compact journals shorter than this
+            read_only: Never touch the file; records are only applied in memory
+        """
+        self.path = Path(path)
+        self.read_only = read_only
+        self.fsync = fsync
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self.lock = threading.RLock()
+        
+        self.generated: Dict[Key, Dict] = {}
+        self.by_word: Dict[str, set] = {}
+        self.failed: Dict[Key, Dict] = {}
+        self.completed: Dict[str, None] = {}
+        self._total_count = 0
+        self.records = 0
+        
+        self._replay()
+        self.fd = None if read_only else os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    
+    def _replay(self):
+        """Rebuild the indexes from the journal, dropping a torn final line"""
+        if not self.path.exists():
+            return
+        
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        
+        # A crash mid-append leaves a partial last line - cut it off so the
+        # next append starts on a fresh line
+        end = data.rfind(b'\n') + 1
+        if end < len(data) and not self.read_only:
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+        
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self._apply(record)
+            self.records += 1
+    
+    def _apply(self, record: Dict):
+        """Update the in-memory indexes for one journal record"""
+        op = record.get('op')
+        if op == 'generated':
+            key = (record['word'], record['category'])
+            self.generated[key] = record['entry']
+            self.by_word.setdefault(key[0], set()).add(key[1])
+            self.failed.pop(key, None)
+            if record.get('count', True):
+                self._total_count += 1
+        elif op == 'forget':
+            key = (record['word'], record['category'])
+            if self.generated.pop(key, None) is not None:
+                self.by_word[key[0]].discard(key[1])
+        elif op == 'failed':
+            # Re-inserted so the queue stays ordered by most recent failure
+            key = (record['word'], record['category'])
+            self.failed.pop(key, None)
+            self.failed[key] = dict(record['entry'], word=key[0], category=key[1])
+        elif op == 'failure_cleared':
+            self.failed.pop((record['word'], record['category']), None)
+        elif op == 'category_completed':
+            self.completed[record['category']] = None
+        elif op == 'total_count':
+            self._total_count = record['value']
+    
+    def _append(self, record: Dict):
+        """Apply a record and append it to the journal as a single write"""
+        with self.lock:
+            if self.read_only:
+                self._apply(record)
+                return
+            line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+            os.write(self.fd, line)
+            if self.fsync:
+                os.fsync(self.fd)
+            self._apply(record)
+            self.records += 1
+            
+            live = len(self.generated) + len(self.failed) + len(self.completed) + 1
+            if self.records >= self.compact_min and self.records > self.compact_ratio * live:
+                self.compact()
+    
+    def compact(self):
+        """Rewrite the journal as a minimal snapshot, swapped in atomically"""
+        with self.lock:
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            records = 0
+            with open(tmp_path, 'w') as f:
+                for (word, category), entry in self.generated.items():
+                    f.write(json.dumps({'op': 'generated', 'word': word, 'category': category, 'entry': entry},
+                                       separators=(',', ':')) + '\n')
+                    records += 1
+                for item in self.failed.values():
+                    entry = {k: v for k, v in item.items() if k not in ('word', 'category')}
+                    f.write(json.dumps({'op': 'failed', 'word': item['word'], 'category': item['category'],
+                                        'entry': entry}, separators=(',', ':')) + '\n')
+                    records += 1
+                for category in self.completed:
+                    f.write(json.dumps({'op': 'category_completed', 'category': category}) + '\n')
+                    records += 1
+                # Last, so it overrides the count implied by the generated records above
+                f.write(json.dumps({'op': 'total_count', 'value': self._total_count}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            
+            os.replace(tmp_path, self.path)
+            os.close(self.fd)
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self.records = records + 1
+    
+    def is_generated(self, word: str, category: Optional[str] = None) -> bool:
+        if category is None:
+            return bool(self.by_word.get(word))
+        return (word, category) in self.generated
+    
+    def get_generated(self, word: str, category: str) -> Optional[Dict]:
+        return self.generated.get((word, category))
+    
+    def record_generated(self, word: str, category: str, entry: Dict, count: bool = True):
+        record = {'op': 'generated', 'word': word, 'category': category, 'entry': entry}
+        if not count:
+            record['count'] = False
+        self._append(record)
+    
+    def record_failure(self, word: str, category: str, entry: Dict):
+        self._append({'op': 'failed', 'word': word, 'category': category, 'entry': entry})
+    
+    def get_failure(self, word: str, category: str) -> Optional[Dict]:
+        return self.failed.get((word, category))
+    
+    def clear_failure(self, word: str, category: str):
+        if (word, category) in self.failed:
+            self._append({'op': 'failure_cleared', 'word': word, 'category': category})
+    
+    def forget(self, word: str, category: str):
+        if (word, category) in self.generated:
+            self._append({'op': 'forget', 'word': word, 'category': category})
+    
+    def has_failed(self, word: str, category: str) -> bool:
+        return (word, category) in self.failed
+    
+    def mark_category_complete(self, category: str):
+        if category not in self.completed:
+            self._append({'op': 'category_completed', 'category': category})
+    
+    def is_category_complete(self, category: str) -> bool:
+        return category in self.completed
+    
+    def generated_entries(self) -> Iterator[Dict]:
+        with self.lock:
+            items = list(self.generated.items())
+        for (word, category), entry in items:
+            yield dict(entry, word=word, category=category)
+    
+    def failures(self) -> List[Dict]:
+        with self.lock:
+            return list(self.failed.values())
+    
+    def categories_completed(self) -> List[str]:
+        return list(self.completed)
+    
+    @property
+    def total_count(self) -> int:
+        return self._total_count
+    
+    @property
+    def generated_count(self) -> int:
+        return len(self.generated)
+    
+    @property
+    def failure_count(self) -> int:
+        return len(self.failed)
+    
+    def _set_total_count(self, count: int):
+        self._append({'op': 'total_count', 'value': count})
+    
+    def import_legacy(self, legacy_file: Path):
+        # One fsync for the whole import instead of one per entry
+        fsync, self.fsync = self.fsync, False
+        try:
+            super().import_legacy(legacy_file)
+        finally:
+            self.fsync = fsync
+        if not self.read_only:
+            self.compact()
+    
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                os.close(self.fd)
+
+
+class SQLiteMetadataStore(MetadataStore):
+    """SQLite-backed store; every write is its own transaction"""
+    
+    def __init__(self, path: Path, read_only: bool = False):
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        if read_only:
+            # An existing database, queried as it is (writes fail). Without a -wal file no
+            # writer has it open, and immutable keeps SQLite from creating -wal/-shm itself
+            wal = self.path.with_name(self.path.name + '-wal')
+            mode = 'mode=ro' if wal.exists() else 'mode=ro&immutable=1'
+            self.db = sqlite3.connect(f"{self.path.resolve().as_uri()}?{mode}", uri=True,
+                                      check_same_thread=False, isolation_level=None)
+            return
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                word TEXT NOT NULL,
+                category TEXT NOT NULL,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (word, category)
+            );
+            CREATE INDEX IF NOT EXISTS images_category ON images (category);
+            CREATE INDEX IF NOT EXISTS images_status ON images (status);
+
+            CREATE TABLE IF NOT EXISTS failures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                word TEXT NOT NULL,
+                category TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS failures_key ON failures (word, category);
+
+            CREATE TABLE IF NOT EXISTS categories (category TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        # Logs from before the failure queue hold one row per failed attempt, and
+        # keep failures of words generated since - collapse to the latest, unresolved ones
+        self._write([
+            ("DELETE FROM failures WHERE id NOT IN (SELECT MAX(id) FROM failures GROUP BY word, category)", ()),
+            ("DELETE FROM failures WHERE EXISTS (SELECT 1 FROM images WHERE images.word = failures.word "
+             "AND images.category = failures.category AND images.status = 'generated')", ()),
+        ])
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+    
+    def _write(self, statements: List[Tuple[str, tuple]]):
+        """Run statements in one transaction"""
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                for sql, params in statements:
+                    self.db.execute(sql, params)
+            except Exception:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+    
+    def is_generated(self, word: str, category: Optional[str] = None) -> bool:
+        if category is None:
+            rows = self._query("SELECT 1 FROM images WHERE word = ? AND status = 'generated' LIMIT 1", (word,))
+        else:
+            rows = self._query("SELECT 1 FROM images WHERE word = ? AND category = ? AND status = 'generated'",
+                               (word, category))
+        return bool(rows)
+    
+    def get_generated(self, word: str, category: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM images WHERE word = ? AND category = ? AND status = 'generated'",
+                           (word, category))
+        return json.loads(rows[0][0]) if rows else None
+    
+    def record_generated(self, word: str, category: str, entry: Dict, count: bool = True):
+        statements = [
+            ("INSERT OR REPLACE INTO images VALUES (?, ?, 'generated', ?, ?)",
+             (word, category, json.dumps(entry), time.time())),
+            ("DELETE FROM failures WHERE word = ? AND category = ?", (word, category)),
+        ]
+        if count:
+            statements.append(("INSERT INTO counters VALUES ('total_count', 1) "
+                               "ON CONFLICT(name) DO UPDATE SET value = value + 1", ()))
+        self._write(statements)
+    
+    def record_failure(self, word: str, category: str, entry: Dict):
+        self._write([
+            ("DELETE FROM failures WHERE word = ? AND category = ?", (word, category)),
+            ("INSERT INTO failures (word, category, data) VALUES (?, ?, ?)",
+             (word, category, json.dumps(entry))),
+            ("INSERT OR IGNORE INTO images VALUES (?, ?, 'failed', '{}', ?)",
+             (word, category, time.time())),
+        ])
+    
+    def get_failure(self, word: str, category: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM failures WHERE word = ? AND category = ?", (word, category))
+        return dict(json.loads(rows[0][0]), word=word, category=category) if rows else None
+    
+    def clear_failure(self, word: str, category: str):
+        self._write([
+            ("DELETE FROM failures WHERE word = ? AND category = ?", (word, category)),
+            ("DELETE FROM images WHERE word = ? AND category = ? AND status = 'failed'", (word, category)),
+        ])
+    
+    def forget(self, word: str, category: str):
+        self._write([("DELETE FROM images WHERE word = ? AND category = ? AND status = 'generated'",
+                      (word, category))])
+    
+    def has_failed(self, word: str, category: str) -> bool:
+        return bool(self._query("SELECT 1 FROM failures WHERE word = ? AND category = ? LIMIT 1",
+                                (word, category)))
+    
+    def mark_category_complete(self, category: str):
+        self._write([("INSERT OR IGNORE INTO categories VALUES (?)", (category,))])
+    
+    def is_category_complete(self, category: str) -> bool:
+        return bool(self._query("SELECT 1 FROM categories WHERE category = ?", (category,)))
+    
+    def generated_entries(self) -> Iterator[Dict]:
+        for word, category, data in self._query(
+                "SELECT word, category, data FROM images WHERE status = 'generated'"):
+            yield dict(json.loads(data), word=word, category=category)
+    
+    def failures(self) -> List[Dict]:
+        return [dict(json.loads(data), word=word, category=category)
+                for word, category, data in self._query("SELECT word, category, data FROM failures ORDER BY id")]
+    
+    def categories_completed(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT category FROM categories")]
+    
+    @property
+    def total_count(self) -> int:
+        rows = self._query("SELECT value FROM counters WHERE name = 'total_count'")
+        return rows[0][0] if rows else 0
+    
+    @property
+    def generated_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM images WHERE status = 'generated'")[0][0]
+    
+    @property
+    def failure_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM failures")[0][0]
+    
+    def _set_total_count(self, count: int):
+        self._write([("INSERT OR REPLACE INTO counters VALUES ('total_count', ?)", (count,))])
+    
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def open_metadata_store(base_path: Path, backend: Optional[str] = None,
+                        legacy_file: Optional[Path] = None, read_only: bool = False) -> MetadataStore:
+    """
+    Open the metadata store for `base_path` (suffix is replaced per backend).
+
+    On first run, `legacy_file` (the old whole-file JSON log) is imported.
+    With `read_only`, nothing is created or written: the backend file is
+    opened as it is, or, if there is none yet, the legacy log is imported
+    into an in-memory journal.
+    """
+    backend = backend or os.getenv('METADATA_BACKEND', 'journal')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown metadata backend '{backend}' (choose from {', '.join(BACKENDS)})")
+    
+    base_path = Path(base_path)
+    path = base_path.with_suffix('.sqlite3' if backend == 'sqlite' else '.jsonl')
+    first_run = not path.exists()
+    if read_only and first_run:
+        store = JournalMetadataStore(path, read_only=True)
+    elif backend == 'sqlite':
+        store = SQLiteMetadataStore(path, read_only=read_only)
+    else:
+        store = JournalMetadataStore(path, read_only=read_only)
+    
+    if first_run and legacy_file is not None and Path(legacy_file).exists():
+        store.import_legacy(Path(legacy_file))
+        if read_only:
+            store.path = Path(legacy_file)  # what was actually read
+        else:
+            print(f"   📥 Imported {store.generated_count} entries from {Path(legacy_file).name}")
+    
+    return store
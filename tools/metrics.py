@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Metrics
+Always-on counters, gauges and histograms for the generation pipeline,
+exported as Prometheus text (.prom) or a JSON summary (.json) both
+periodically and at the end of a run.
+
+Recording is a perf_counter call and a dict update under a lock, cheap
+enough to leave on for every request and image.
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+DEFAULT_METRICS_FILE = Path(__file__).parent / 'generation_metrics.prom'
+
+# Seconds; spans a fast cache hit to a slow, retried API call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus semantics: `le` upper bounds)"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.min = math.inf
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation,
+        clamped to the observed range"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i]
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class Metrics:
+    """Thread-safe registry of named, labelled counters, gauges and histograms"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+        self.started = time.time()
+    
+    @staticmethod
+    def _labels(labels: Dict) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+    
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+    
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+    
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges.setdefault(name, {})[self._labels(labels)] = value
+    
+    def observe(self, name: str, value: float, **labels):
+        key = self._labels(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+    
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time a block into earlily_stage_seconds{stage=...}"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('earlily_stage_seconds', time.perf_counter() - start, stage=stage)
+    
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+    
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        def fmt(labels: Labels, extra: Labels = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+        
+        lines = []
+        with self.lock:
+            for kind, registry in (('counter', self.counters), ('gauge', self.gauges)):
+                for name, series in sorted(registry.items()):
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{name}{fmt(labels)} {value:g}")
+            
+            for name, series in sorted(self.histograms.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        le = '+Inf' if math.isinf(bound) else f"{bound:g}"
+                        lines.append(f"{name}_bucket{fmt(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{fmt(labels)} {hist.sum:g}")
+                    lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+        return '\n'.join(lines) + '\n'
+    
+    def to_json(self) -> Dict:
+        """Counters and gauges as-is; histograms as count/sum/mean/p50/p95/p99"""
+        def key(name: str, labels: Labels) -> str:
+            return name + ''.join(f"[{k}={v}]" for k, v in labels)
+        
+        with self.lock:
+            return {
+                'started': self.started,
+                'updated': time.time(),
+                'counters': {key(n, l): v for n, s in self.counters.items() for l, v in s.items()},
+                'gauges': {key(n, l): v for n, s in self.gauges.items() for l, v in s.items()},
+                'histograms': {
+                    key(n, l): {
+                        'count': h.count,
+                        'sum': round(h.sum, 6),
+                        'mean': round(h.sum / h.count, 6) if h.count else 0.0,
+                        'max': round(h.max, 6),
+                        'p50': round(h.quantile(0.50), 6),
+                        'p95': round(h.quantile(0.95), 6),
+                        'p99': round(h.quantile(0.99), 6),
+                    }
+                    for n, s in self.histograms.items() for l, h in s.items()
+                },
+            }
+    
+    def write(self, path: Path):
+        """Write atomically; format follows the suffix (.json, otherwise Prometheus text)"""
+        path = Path(path)
+        if path.suffix == '.json':
+            data = json.dumps(self.to_json(), indent=2)
+        else:
+            data = self.to_prometheus()
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """Writes a Metrics registry to disk every `interval` seconds and on stop()"""
+    
+    def __init__(self, metrics: 'Metrics', path: Optional[Path] = None, interval: Optional[float] = None):
+        """
+        Args:
+            metrics: Registry to export
+            path: Output file (or METRICS_FILE env var, default: tools/generation_metrics.prom)
+            interval: Seconds between writes, 0 = only at the end (or METRICS_INTERVAL env var, default 15)
+        """
+        self.metrics = metrics
+        self.path = Path(path or os.getenv('METRICS_FILE') or DEFAULT_METRICS_FILE)
+        self.interval = interval if interval is not None else float(os.getenv('METRICS_INTERVAL', 15))
+        self.stopped = threading.Event()
+        self.thread = None
+    
+    def start(self) -> 'MetricsExporter':
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+    
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+    
+    def write(self):
+        try:
+            self.metrics.write(self.path)
+        except OSError as e:
+            print(f"   ⚠️  Could not write metrics to {self.path}: {e}")
+    
+    def stop(self):
+        """Stop periodic writes and write the final snapshot"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.write()
+
+
+# Process-wide registry used by the generator, transport and pipeline
+METRICS = Metrics()
+METRICS.describe('earlily_stage_seconds', 'Time spent per pipeline stage')
+METRICS.describe('earlily_requests_total', 'Imagen API requests by HTTP status')
+METRICS.describe('earlily_retries_total', 'Retried API requests by HTTP status or error class')
+METRICS.describe('earlily_bytes_downloaded_total', 'Response bytes received from the API (compressed, as sent)')
+METRICS.describe('earlily_bytes_written_total', 'Image and asset bytes written to disk')
+METRICS.describe('earlily_asset_files_total', 'Image and asset files written, or left alone because unchanged')
+METRICS.describe('earlily_images_total', 'Images by outcome (generated, cached, rejected, failed)')
+METRICS.describe('earlily_queue_depth', 'Pipeline queue depth by stage')
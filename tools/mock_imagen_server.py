@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Mock Imagen Server
+Local stand-in for the imagen-3.0-generate-001:predict endpoint, for
+measuring the generators without spending quota.
+
+Latency (log-normal from a median and p95), 5xx and 429 rates, filtered
+predictions and PNG payload size are all configurable. Point the generator
+at it with:
+
+    IMAGEN_ENDPOINT=http://127.0.0.1:8765/v1beta/models/imagen-3.0-generate-001:predict
+"""
+
+import argparse
+import base64
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Dict, Optional
+
+PREDICT_PATH = '/v1beta/models/imagen-3.0-generate-001:predict'
+
+
+def make_png(target_bytes: int, size: int = 1024) -> bytes:
+    """
+    Valid size x size PNG of roughly `target_bytes` that passes the quality
+    gate: white, with a centred flat-colour subject holding a noise block
+    """
+    from PIL import Image, ImageDraw
+    
+    img = Image.new('RGB', (size, size), 'white')
+    margin = size // 8
+    ImageDraw.Draw(img).ellipse((margin, margin, size - margin, size - margin), fill=(240, 160, 40))
+    # Noise compresses to ~3 bytes/pixel, so the block side sets the file size
+    side = min(size, int(math.sqrt(max(target_bytes, 0) / 3)))
+    if side:
+        img.paste(Image.effect_noise((side, side), 100).convert('RGB'), ((size - side) // 2, (size - side) // 2))
+    out = BytesIO()
+    img.save(out, 'PNG')
+    return out.getvalue()
+
+
+class MockImagenConfig:
+    """Behaviour of the mock endpoint"""
+    
+    def __init__(self, latency_ms: float = 1500, p95_ms: Optional[float] = None, per_image_ms: float = 0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, filter_rate: float = 0.0,
+                 retry_after: float = 1.0, payload_kb: float = 400, seed: Optional[int] = None):
+        """
+        Args:
+            latency_ms: Median response time
+            p95_ms: 95th percentile response time (default: same as median, i.e. fixed latency)
+            per_image_ms: Extra time per instance after the first in a batched request
+            error_rate: Fraction of requests answered with a 500
+            throttle_rate: Fraction of requests answered with a 429 + Retry-After
+            filter_rate: Fraction of predictions returned without an image (safety filtered)
+            retry_after: Retry-After seconds sent with 429s
+            payload_kb: Approximate size of each returned PNG
+            seed: Random seed for reproducible runs
+        """
+        self.latency_ms = latency_ms
+        self.p95_ms = p95_ms or latency_ms
+        self.per_image_ms = per_image_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.filter_rate = filter_rate
+        self.retry_after = retry_after
+        self.payload_kb = payload_kb
+        self.seed = seed
+    
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+class MockImagenServer:
+    """Threaded HTTP server answering :predict requests per a MockImagenConfig"""
+    
+    def __init__(self, config: Optional[MockImagenConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.config = config or MockImagenConfig()
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'images': 0, 'filtered': 0, 'errors': 0, 'throttled': 0, 'bytes_sent': 0}
+        
+        # Log-normal latency: median = latency_ms, 95th percentile = p95_ms
+        self.mu = math.log(max(self.config.latency_ms, 0.001))
+        self.sigma = max(0.0, math.log(max(self.config.p95_ms, 0.001) / max(self.config.latency_ms, 0.001)) / 1.645)
+        
+        self.image_b64 = base64.b64encode(make_png(int(self.config.payload_kb * 1024))).decode()
+        
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_POST(self):
+                server.handle_predict(self)
+        
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+    
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{PREDICT_PATH}"
+    
+    def _draw(self, instances: int):
+        """Status, latency and per-instance filtered flags for one request"""
+        with self.lock:
+            roll = self.rng.random()
+            latency = math.exp(self.rng.gauss(self.mu, self.sigma)) / 1000
+            filtered = [self.rng.random() < self.config.filter_rate for _ in range(instances)]
+        latency += self.config.per_image_ms * max(0, instances - 1) / 1000
+        
+        if roll < self.config.throttle_rate:
+            return 429, latency, filtered
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            return 500, latency, filtered
+        return 200, latency, filtered
+    
+    def handle_predict(self, handler: BaseHTTPRequestHandler):
+        length = int(handler.headers.get('Content-Length', 0))
+        body = json.loads(handler.rfile.read(length) or b'{}')
+        
+        if not handler.path.endswith(':predict'):
+            self._respond(handler, 404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+            return
+        if not handler.headers.get('x-goog-api-key'):
+            self._respond(handler, 403, {'error': {
+                'code': 403, 'message': 'Missing API key', 'status': 'PERMISSION_DENIED'
+            }})
+            return
+        
+        instances = body.get('instances', [])
+        status, latency, filtered = self._draw(len(instances))
+        time.sleep(latency)
+        
+        with self.lock:
+            self.stats['requests'] += 1
+            if status == 429:
+                self.stats['throttled'] += 1
+            elif status == 500:
+                self.stats['errors'] += 1
+            else:
+                self.stats['filtered'] += sum(filtered)
+                self.stats['images'] += len(filtered) - sum(filtered)
+        
+        if status == 429:
+            self._respond(handler, 429, {'error': {
+                'code': 429, 'message': 'Resource has been exhausted (e.g. check quota).', 'status': 'RESOURCE_EXHAUSTED'
+            }}, {'Retry-After': f"{self.config.retry_after:g}"})
+        elif status == 500:
+            self._respond(handler, 500, {'error': {'code': 500, 'message': 'Internal error', 'status': 'INTERNAL'}})
+        else:
+            self._respond(handler, 200, {'predictions': [
+                {'raiFilteredReason': 'Filtered by the mock server'} if is_filtered
+                else {'bytesBase64Encoded': self.image_b64, 'mimeType': 'image/png'}
+                for is_filtered in filtered
+            ]})
+    
+    def _respond(self, handler: BaseHTTPRequestHandler, status: int, payload: Dict, headers: Dict = None):
+        data = json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+        with self.lock:
+            self.stats['bytes_sent'] += len(data)
+    
+    def start(self) -> 'MockImagenServer':
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Mock endpoint options, shared with benchmark.py"""
+    parser.add_argument('--latency-ms', type=float, default=1500, help='Median response time (default: 1500)')
+    parser.add_argument('--p95-ms', type=float, help='95th percentile response time (default: = median)')
+    parser.add_argument('--per-image-ms', type=float, default=0, help='Extra time per additional batched instance')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--filter-rate', type=float, default=0.0, help='Fraction of predictions without an image')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--payload-kb', type=float, default=400, help='Approximate PNG size per image (default: 400)')
+    parser.add_argument('--seed', type=int, help='Random seed')
+
+
+def config_from_args(args: argparse.Namespace) -> MockImagenConfig:
+    return MockImagenConfig(
+        latency_ms=args.latency_ms, p95_ms=args.p95_ms, per_image_ms=args.per_image_ms,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, filter_rate=args.filter_rate,
+        retry_after=args.retry_after, payload_kb=args.payload_kb, seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the Imagen 3 :predict endpoint')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port (default: 8765)')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    server = MockImagenServer(config_from_args(args), args.host, args.port)
+    print("🧪 Mock Imagen server")
+    print(f"   IMAGEN_ENDPOINT={server.endpoint}")
+    print(f"   Config: {json.dumps(server.config.as_dict())}")
+    print("   Ctrl+C to stop")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {json.dumps(server.stats)}")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Generation Pipeline
+Runs generation as bounded stages so network and CPU work overlap:
+
+    fetch workers (threads)  ->  bounded queue  ->  process pool  ->  metadata
+    HTTP, retries, base64        caps images        quality gate, PNG checks,
+                                 held in memory     writes (byte copy + imageset link)
+
+An image the quality gate rejects is never written: its word goes back to
+the fetch workers for a new image, up to QUALITY_RETRIES times.
+
+Queue depths are shown on the progress bar and summarised at the end, so
+it's visible whether the network or the CPU stage is the bottleneck.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from tqdm import tqdm
+
+from metrics import METRICS
+from quality import QualityError, write_checked_assets
+
+Item = Tuple[str, str]
+
+_DONE = object()
+
+
+def _ignore_sigint():
+    """Pool initializer: Ctrl+C is handled by the parent, which drains the queue"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class GenerationPipeline:
+    """Producer/consumer pipeline around ImagenFlashcardGenerator"""
+    
+    def __init__(self, generator, fetch_workers: int = None, cpu_workers: int = None, queue_size: int = None):
+        """
+        Args:
+            generator: ImagenFlashcardGenerator that owns the API, cache and store
+            fetch_workers: Threads making API requests (default: generator.concurrency)
+            cpu_workers: Processes writing assets, 0 = one in-process thread (default: generator.cpu_workers)
+            queue_size: Fetched images allowed to wait for the CPU stage (or PIPELINE_QUEUE_SIZE env var)
+        """
+        self.generator = generator
+        self.fetch_workers = fetch_workers or generator.concurrency
+        self.cpu_workers = generator.cpu_workers if cpu_workers is None else max(0, cpu_workers)
+        self.queue_size = queue_size or int(os.getenv('PIPELINE_QUEUE_SIZE', 0)) or 2 * max(1, self.cpu_workers)
+        self.quality_retries = int(os.getenv('QUALITY_RETRIES', 2))
+        
+        self.work: queue.Queue = queue.Queue()
+        self.fetched: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self.cpu_slots = threading.Semaphore(max(1, self.cpu_workers))
+        self.lock = threading.Lock()
+        
+        self.results: Dict[Item, bool] = {}
+        self.handed_off = set()
+        self.in_cpu = 0   # images handed to the CPU stage and not settled yet
+        self.rejections: Dict[Item, int] = {}
+        self.cpu_busy = 0
+        self.samples: List[Tuple[int, int, int]] = []
+        self.pbar = None
+    
+    def depths(self) -> Dict[str, int]:
+        """Current per-stage queue depths"""
+        return {
+            'fetch_backlog': self.work.qsize(),
+            'cpu_queue': self.fetched.qsize(),
+            'cpu_busy': self.cpu_busy,
+        }
+    
+    def run(self, items: List[Item], desc: str = 'Generating') -> Dict[Item, bool]:
+        """Generate every (word, category) item; returns success per item"""
+        batch_size = self.generator.batch_size
+        for i in range(0, len(items), batch_size):
+            self.work.put(items[i:i + batch_size])
+        self.results = {item: False for item in items}
+        
+        if self.cpu_workers:
+            pool = ProcessPoolExecutor(self.cpu_workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_ignore_sigint)
+        else:
+            pool = ThreadPoolExecutor(1)
+        
+        fetchers = [threading.Thread(target=self._fetch_loop, daemon=True) for _ in range(self.fetch_workers)]
+        dispatcher = threading.Thread(target=self._dispatch_loop, args=(pool,), daemon=True)
+        
+        with tqdm(total=len(items), desc=desc) as pbar:
+            self.pbar = pbar
+            dispatcher.start()
+            for thread in fetchers:
+                thread.start()
+            
+            try:
+                while any(thread.is_alive() for thread in fetchers):
+                    self._sample()
+                    time.sleep(0.5)
+            except KeyboardInterrupt:
+                # Stop new requests, but finish in-flight ones and write every image
+                # already fetched, so everything paid for ends up in the log
+                print("\n   ⏸️  Stopping - finishing in-flight requests and queued images...")
+                self.generator.stop_event.set()
+                raise
+            finally:
+                for thread in fetchers:
+                    thread.join()
+                self.fetched.put(_DONE)
+                dispatcher.join()
+                pool.shutdown(wait=True)
+                self.generator.manifest.save()
+                self._sample()
+        
+        self.print_report()
+        return self.results
+    
+    def _fetch_loop(self):
+        """Network stage: take a batch, fetch it, hand images to the CPU stage"""
+        while not self.generator.stop_event.is_set():
+            try:
+                batch = self.work.get(timeout=0.2)
+            except queue.Empty:
+                # Images still in the CPU stage may be rejected and need a new fetch
+                with self.lock:
+                    if self.work.empty() and not self.in_cpu:
+                        return
+                continue
+            
+            outcomes = self.generator.generate_batch(batch, on_image=self._enqueue)
+            
+            # Items that never reached the CPU stage (already current, failed or
+            # stopped) are settled here; the rest are settled when written
+            with self.lock:
+                for item, ok in zip(batch, outcomes):
+                    if item not in self.handed_off:
+                        self.results[item] = ok
+                        self.pbar.update(1)
+    
+    def _enqueue(self, word: str, category: str, key: str, img_bytes: bytes, extra: Dict) -> bool:
+        """`on_image` handler: blocks while the CPU queue is full (backpressure)"""
+        with self.lock:
+            self.handed_off.add((word, category))
+            self.in_cpu += 1
+        self.fetched.put((word, category, key, img_bytes, extra))
+        return True
+    
+    def _dispatch_loop(self, pool):
+        """
+        Move fetched images into the pool, never more than it has workers.
+
+        Keeps draining the queue until the run ends even if the pool breaks,
+        so no fetcher stays blocked on a full queue.
+        """
+        generator = self.generator
+        while True:
+            job = self.fetched.get()
+            if job is _DONE:
+                return
+            
+            word, category, key, img_bytes, extra = job
+            self.cpu_slots.acquire()
+            with self.lock:
+                self.cpu_busy += 1
+            try:
+                future = pool.submit(write_checked_assets, generator.quality_gate, img_bytes, word, category,
+                                     generator.output_dir, generator.assets_dir, generator.image_size)
+            except Exception as e:
+                # Broken or shut-down pool: nothing more can be written this run
+                self._stop_cpu_stage(e)
+                future = Future()
+                future.set_exception(e)
+                self._finish(job, future)
+                continue
+            future.add_done_callback(lambda f, job=job: self._finish(job, f))
+    
+    def _stop_cpu_stage(self, error: Exception):
+        """Stop the run once the CPU stage can't write; the CLI exits as resumable"""
+        with self.lock:
+            if self.generator.cpu_stage_error:
+                return
+            self.generator.cpu_stage_error = f"{type(error).__name__}: {error}"
+        print(f"\n   ❌ CPU stage unavailable ({self.generator.cpu_stage_error}) - stopping")
+        self.generator.budget.exhaust('CPU stage unavailable (process pool broke)')
+        self.generator.stop_event.set()
+    
+    def _finish(self, job: Tuple, future: Future):
+        """Record the outcome of one CPU-stage job"""
+        word, category, key, _, extra = job
+        self.cpu_slots.release()
+        
+        requeue = False
+        try:
+            result = future.result()
+        except QualityError as e:
+            requeue = self._reject(job, e)
+            ok = False
+        except BrokenExecutor as e:
+            # A worker died (e.g. killed for memory); every later job would fail too
+            self._stop_cpu_stage(e)
+            self.generator.record_failed(word, category, e, extra.get('attempts', 0))
+            ok = False
+        except Exception as e:
+            self.generator.record_failed(word, category, e, extra.get('attempts', 0))
+            ok = False
+        else:
+            self.generator.record_saved(word, category, key, result, extra)
+            ok = True
+        
+        with self.lock:
+            self.cpu_busy -= 1
+            if requeue:
+                # Settled by the next attempt; queued before in_cpu drops so no fetcher exits early
+                self.handed_off.discard((word, category))
+                self.work.put([(word, category)])
+            else:
+                self.results[(word, category)] = ok
+                self.pbar.update(1)
+            self.in_cpu -= 1
+    
+    def _reject(self, job: Tuple, error: QualityError) -> bool:
+        """Handle a quality-gate rejection; True if the word should be fetched again"""
+        word, category, key, _, extra = job
+        # A cached copy would come straight back from generate_batch
+        self.generator.cache.discard(key)
+        METRICS.inc('earlily_images_total', result='rejected')
+        with self.lock:
+            rejections = self.rejections.get((word, category), 0) + 1
+            self.rejections[(word, category)] = rejections
+        
+        if rejections <= self.quality_retries and not self.generator.stop_event.is_set():
+            print(f"   🔍 Rejected: {word} - {'; '.join(error.reasons)} "
+                  f"(new image {rejections}/{self.quality_retries})")
+            return True
+        self.generator.record_failed(word, category, error, extra.get('attempts', 0))
+        return False
+    
+    def _sample(self):
+        """Record queue depths and show them on the progress bar"""
+        depths = self.depths()
+        for stage, depth in depths.items():
+            METRICS.set('earlily_queue_depth', depth, stage=stage)
+        self.samples.append((depths['fetch_backlog'], depths['cpu_queue'], depths['cpu_busy']))
+        if self.pbar is not None:
+            self.pbar.set_postfix(
+                fetch=depths['fetch_backlog'],
+                cpu_q=f"{depths['cpu_queue']}/{self.queue_size}",
+                cpu=f"{depths['cpu_busy']}/{max(1, self.cpu_workers)}",
+                refresh=False
+            )
+    
+    def print_report(self):
+        """Summarise stage utilisation and name the likely bottleneck"""
+        if len(self.samples) < 2:
+            return
+        
+        avg_queue = sum(s[1] for s in self.samples) / len(self.samples)
+        avg_busy = sum(s[2] for s in self.samples) / len(self.samples)
+        fill = avg_queue / self.queue_size
+        
+        print(f"   📊 Stages: avg CPU queue {avg_queue:.1f}/{self.queue_size}, "
+              f"avg CPU busy {avg_busy:.1f}/{max(1, self.cpu_workers)}")
+        if fill > 0.75:
+            print("   🐢 Bottleneck: CPU stage - raise CPU_WORKERS")
+        elif fill < 0.1:
+            print("   🐢 Bottleneck: network - raise --concurrency / --rate if quota allows")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Generation Planner
+Estimates how long a generation run will take and how many API calls it
+will make, from the latency and failure history in the metadata store.
+
+The run is simulated the way the generator executes it - BATCH_SIZE words
+per request, CONCURRENCY workers sharing a REQUESTS_PER_SECOND limit, up to
+MAX_RETRIES attempts with jittered exponential backoff - many times over,
+with latencies resampled from history, to get p50/p95 durations.
+
+Reads only the metadata store (read-only) and the vocabulary file: no PIL,
+no network.
+"""
+
+import argparse
+import heapq
+import math
+import os
+import random
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from metadata_store import MetadataStore
+from shards import in_shard, parse_shard
+from vocabulary import parse_vocabulary
+
+load_dotenv()
+
+# Assumed until the store has timing history
+DEFAULT_LATENCY = 8.0
+DEFAULT_FAILURE_RATE = 0.05
+
+# Generator's backoff defaults (AdaptiveRateLimiter)
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+# Enough samples of one batch size to use them without rescaling
+MIN_SAMPLES = 5
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m {int(seconds % 60):02d}s"
+    return f"{int(seconds // 3600)}h {int(seconds % 3600 // 60):02d}m"
+
+
+class History:
+    """Request latencies and failure rate from past runs (none without a store)"""
+    
+    def __init__(self, store: Optional[MetadataStore]):
+        self.samples: List[tuple] = []   # (batch_size, request latency)
+        self.elapsed: List[float] = []   # per image, first attempt to saved, including retries
+        ok_requests = 0
+        failed_requests = 0
+        
+        for entry in store.generated_entries() if store is not None else []:
+            if entry.get('cached') or 'attempts' not in entry:
+                continue
+            ok_requests += 1
+            failed_requests += entry['attempts'] - 1
+            if 'latency' in entry:
+                self.samples.append((entry.get('batch_size', 1), entry['latency']))
+            if 'elapsed' in entry:
+                self.elapsed.append(entry['elapsed'])
+        
+        for failure in store.failures() if store is not None else []:
+            failed_requests += failure.get('attempts') or 0
+        
+        total = ok_requests + failed_requests
+        self.requests = total
+        self.failure_rate = failed_requests / total if total else DEFAULT_FAILURE_RATE
+        self.has_timings = bool(self.samples)
+    
+    def latencies(self, batch_size: int) -> List[float]:
+        """Latency samples for requests of `batch_size` words"""
+        if not self.samples:
+            return [DEFAULT_LATENCY]
+        matching = [latency for size, latency in self.samples if size == batch_size]
+        if len(matching) >= MIN_SAMPLES:
+            return matching
+        # Too few at this size - scale per-word latency from every sample
+        return [latency * batch_size / max(size, 1) for size, latency in self.samples]
+
+
+def simulate_run(batches: int, batch_size: int, latencies: List[float], failure_rate: float,
+                 concurrency: int, rate: float, max_retries: int, rng: random.Random) -> Dict:
+    """One simulated run: wall time, API calls and words that ran out of retries"""
+    workers = [0.0] * concurrency
+    interval = 1.0 / rate if rate > 0 else 0.0
+    next_token = 0.0
+    calls = 0
+    failed = 0
+    
+    for _ in range(batches):
+        t = heapq.heappop(workers)
+        for attempt in range(1, max_retries + 1):
+            start = max(t, next_token)
+            next_token = start + interval
+            calls += 1
+            t = start + rng.choice(latencies)
+            if rng.random() >= failure_rate:
+                break
+            if attempt == max_retries:
+                failed += batch_size
+            else:
+                t += rng.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+        heapq.heappush(workers, t)
+    
+    return {'seconds': max(workers), 'calls': calls, 'failed': failed}
+
+
+def estimate_run(remaining: int, history: History, batch_size: int, concurrency: int, rate: float,
+                 max_retries: int, simulations: int = 200, seed: int = 0) -> Dict:
+    """p50/p95 run time, expected API calls and failures for `remaining` words"""
+    batch_size = max(1, batch_size)
+    batches = math.ceil(remaining / batch_size)
+    latencies = history.latencies(batch_size)
+    rng = random.Random(seed)
+    
+    runs = [
+        simulate_run(batches, batch_size, latencies, history.failure_rate,
+                     max(1, concurrency), rate, max(1, max_retries), rng)
+        for _ in range(simulations if batches else 0)
+    ]
+    durations = [run['seconds'] for run in runs] or [0.0]
+    per_image = history.elapsed or [latency / batch_size for latency in latencies]
+    
+    # Steady-state ceilings, to name the bottleneck
+    latency_p50 = percentile(latencies, 50)
+    concurrency_rps = concurrency / latency_p50 if latency_p50 else math.inf
+    bottleneck = 'rate limit' if rate > 0 and rate < concurrency_rps else 'concurrency / API latency'
+    
+    return {
+        'remaining': remaining,
+        'batches': batches,
+        'api_calls': sum(run['calls'] for run in runs) / len(runs) if runs else 0,
+        'expected_failures': sum(run['failed'] for run in runs) / len(runs) if runs else 0,
+        'failure_rate': history.failure_rate,
+        'latency_p50': latency_p50,
+        'latency_p95': percentile(latencies, 95),
+        'image_p50': percentile(per_image, 50),
+        'image_p95': percentile(per_image, 95),
+        'duration_p50': percentile(durations, 50),
+        'duration_p95': percentile(durations, 95),
+        'bottleneck': bottleneck,
+        'from_history': history.has_timings,
+        'history_requests': history.requests,
+    }
+
+
+def print_estimate(estimate: Dict, concurrency: int, rate: float, batch_size: int):
+    """Human-readable plan"""
+    source = (f"{estimate['history_requests']} past requests" if estimate['from_history']
+              else f"no timing history yet - assuming {DEFAULT_LATENCY:g}s/request")
+    print(f"⏱️  Plan for {estimate['remaining']} image(s) ({source})")
+    print(f"   Settings: {concurrency} worker(s), "
+          f"{f'{rate:g} req/s' if rate > 0 else 'no rate limit'}, {batch_size} word(s) per request")
+    print(f"   Request latency: p50 {estimate['latency_p50']:.1f}s, p95 {estimate['latency_p95']:.1f}s")
+    print(f"   Per image, including retries: p50 {estimate['image_p50']:.1f}s, p95 {estimate['image_p95']:.1f}s")
+    print(f"   API calls: ~{estimate['api_calls']:.0f} for {estimate['batches']} request(s) "
+          f"({100 * estimate['failure_rate']:.1f}% retried)")
+    if estimate['expected_failures'] >= 0.5:
+        print(f"   Expected failures after retries: ~{estimate['expected_failures']:.0f}")
+    print(f"   Run time: p50 {format_duration(estimate['duration_p50'])}, "
+          f"p95 {format_duration(estimate['duration_p95'])}")
+    if estimate['duration_p50']:
+        print(f"   Throughput: ~{60 * estimate['remaining'] / estimate['duration_p50']:.0f} images/min")
+    print(f"   Bottleneck: {estimate['bottleneck']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Estimate generation time and API calls from past runs (no API calls)'
+    )
+    parser.add_argument('vocab_file', type=Path, help='Vocabulary markdown file')
+    parser.add_argument('--categories', nargs='+', help='Specific categories to plan')
+    parser.add_argument('--concurrency', type=int, help='Requests in flight at once (or set CONCURRENCY env var)')
+    parser.add_argument('--rate', type=float, dest='requests_per_second',
+                        help='Max API requests per second, 0 = unlimited (or set REQUESTS_PER_SECOND env var)')
+    parser.add_argument('--batch-size', type=int, help='Words per API request (or set BATCH_SIZE env var)')
+    parser.add_argument('--shard', type=parse_shard, help='Plan shard i of N (e.g. 2/4) from its own log')
+    parser.add_argument('--metadata-backend', choices=['journal', 'sqlite'],
+                        help='Generation log format (or set METADATA_BACKEND env var, default: journal)')
+    
+    args = parser.parse_args()
+    
+    if not args.vocab_file.exists():
+        print(f"❌ Error: File not found: {args.vocab_file}")
+        return
+    
+    # Same defaults as the generator
+    concurrency = max(1, args.concurrency or int(os.getenv('CONCURRENCY', 1)))
+    rate = args.requests_per_second
+    if rate is None:
+        rate = float(os.getenv('REQUESTS_PER_SECOND', 1.0))
+    batch_size = max(1, args.batch_size or int(os.getenv('BATCH_SIZE', 5)))
+    max_retries = int(os.getenv('MAX_RETRIES', 3))
+    
+    # status imports format_duration from this module
+    from status import metadata_file_for, open_existing_store
+    
+    categories = parse_vocabulary(args.vocab_file)
+    if args.categories:
+        categories = {k: v for k, v in categories.items() if k in args.categories}
+    if args.shard:
+        categories = {k: [w for w in v if in_shard(w, args.shard)] for k, v in categories.items()}
+    
+    # Read-only: no log yet means no history and every word still to do
+    store = open_existing_store(metadata_file_for(args.shard), args.metadata_backend)
+    try:
+        # Words without a recorded image (prompt changes are only detected by the generator)
+        remaining = sum(
+            1 for category, words in categories.items() for word in dict.fromkeys(words)
+            if store is None or not store.is_generated(word, category)
+        )
+        
+        estimate = estimate_run(remaining, History(store), batch_size, concurrency, rate, max_retries)
+        print_estimate(estimate, concurrency, rate, batch_size)
+    finally:
+        if store is not None:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Quality Gate
+Checks each generated image against what create_prompt asks for before any
+asset is written:
+
+    blank        the image is near-uniform, with (almost) no subject
+    aspect       the image isn't the requested 1:1
+    background   the border of the image isn't (mostly) white
+    coverage     the subject's bounding box fills too little of the frame
+    centering    the subject's bounding box centre is too far off-centre
+
+Every measurement is a NumPy reduction over a 128px thumbnail, cheap
+enough to run on every image in the pipeline's CPU workers. Rejected images
+are never written; the pipeline requeues the word for a fresh image up to
+QUALITY_RETRIES times, then records it in the failure queue.
+
+    python3 quality.py ../GeneratedImages/animals_creatures/*.png
+"""
+
+import argparse
+import os
+import sys
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import rate_limiter
+from image_io import write_flashcard_assets
+
+# A pixel with every channel at or above this counts as white background
+WHITE_LEVEL = 235
+THUMBNAIL_SIZE = 128
+BORDER = 0.05            # border ring width, fraction of the shorter side
+MIN_SUBJECT = 0.005      # below this fraction of non-white pixels the image is blank
+MIN_CONTRAST = 2.0       # grayscale standard deviation of a near-uniform image
+ASPECT_TOLERANCE = 0.02
+ROW_THRESHOLD = 0.01     # rows/columns with less subject than this (specks, shadows) don't extend the box
+
+
+class QualityError(Exception):
+    """An image rejected by the quality gate"""
+    
+    kind = rate_limiter.QUALITY
+    status_code = None
+    
+    def __init__(self, reasons: List[str], measurements: Dict):
+        super().__init__(reasons, measurements)
+        self.reasons = reasons
+        self.measurements = measurements
+    
+    def __str__(self) -> str:
+        return f"Quality gate: {'; '.join(self.reasons)}"
+
+
+def measure(data: bytes) -> Dict:
+    """Background, subject and shape measurements of one encoded image"""
+    import numpy as np
+    from PIL import Image
+    
+    with Image.open(BytesIO(data)) as img:
+        width, height = img.size
+        img.draft('RGB', (THUMBNAIL_SIZE, THUMBNAIL_SIZE))  # JPEG decodes at reduced size
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # Transparent pixels are background
+            img = img.convert('RGBA')
+            img = Image.alpha_composite(Image.new('RGBA', img.size, (255, 255, 255, 255)), img)
+        thumbnail = img.convert('RGB')
+        thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BOX)
+    
+    pixels = np.asarray(thumbnail, dtype=np.uint8)
+    white = (pixels >= WHITE_LEVEL).all(axis=2)
+    subject = ~white
+    rows, cols = white.shape
+    
+    b = max(1, round(min(rows, cols) * BORDER))
+    ring = np.ones_like(white)
+    ring[b:-b, b:-b] = False
+    background = float(white[ring].mean())
+    
+    filled_rows = np.flatnonzero(subject.mean(axis=1) > ROW_THRESHOLD)
+    filled_cols = np.flatnonzero(subject.mean(axis=0) > ROW_THRESHOLD)
+    if filled_rows.size and filled_cols.size:
+        top, bottom = filled_rows[0], filled_rows[-1] + 1
+        left, right = filled_cols[0], filled_cols[-1] + 1
+        coverage = (bottom - top) * (right - left) / (rows * cols)
+        offset = max(abs((top + bottom) / 2 / rows - 0.5), abs((left + right) / 2 / cols - 0.5))
+    else:
+        coverage, offset = 0.0, 0.0
+    
+    return {
+        'width': width,
+        'height': height,
+        'background': round(background, 4),
+        'subject': round(float(subject.mean()), 4),
+        'contrast': round(float(pixels.mean(axis=2).std()), 2),
+        'coverage': round(float(coverage), 4),
+        'offset': round(float(offset), 4),
+    }
+
+
+class QualityGate:
+    """Thresholds for the checks above; picklable, so it travels to the CPU workers"""
+    
+    def __init__(self, enabled: Optional[bool] = None, min_background: Optional[float] = None,
+                 min_coverage: Optional[float] = None, max_offset: Optional[float] = None,
+                 aspect_ratio: float = 1.0):
+        """
+        Args:
+            enabled: Run the checks at all (or QUALITY_GATE env var, default on)
+            min_background: Fraction of the border that must be white (or QUALITY_MIN_BACKGROUND, default 0.85)
+            min_coverage: Subject bounding box as a fraction of the frame (or QUALITY_MIN_COVERAGE, default 0.25)
+            max_offset: Bounding box centre's distance from the frame centre, as a fraction of
+                the frame (or QUALITY_MAX_OFFSET, default 0.15)
+            aspect_ratio: Requested width / height
+        """
+        self.enabled = enabled if enabled is not None else os.getenv('QUALITY_GATE', '1') not in ('0', 'false', 'no')
+        self.min_background = (min_background if min_background is not None
+                               else float(os.getenv('QUALITY_MIN_BACKGROUND', 0.85)))
+        self.min_coverage = min_coverage if min_coverage is not None else float(os.getenv('QUALITY_MIN_COVERAGE', 0.25))
+        self.max_offset = max_offset if max_offset is not None else float(os.getenv('QUALITY_MAX_OFFSET', 0.15))
+        self.aspect_ratio = aspect_ratio
+    
+    def problems(self, m: Dict) -> List[str]:
+        """Reasons `m` (from measure) fails the gate; empty if it passes"""
+        if m['subject'] < MIN_SUBJECT or m['contrast'] < MIN_CONTRAST:
+            return ['blank or near-uniform image']
+        reasons = []
+        if abs(m['width'] / m['height'] / self.aspect_ratio - 1) > ASPECT_TOLERANCE:
+            reasons.append(f"{m['width']}x{m['height']} is not {self.aspect_ratio:g}:1")
+        if m['background'] < self.min_background:
+            reasons.append(f"border {m['background']:.0%} white (min {self.min_background:.0%})")
+        if m['coverage'] < self.min_coverage:
+            reasons.append(f"subject fills {m['coverage']:.0%} of the frame (min {self.min_coverage:.0%})")
+        if m['offset'] > self.max_offset:
+            reasons.append(f"subject {m['offset']:.0%} off-centre (max {self.max_offset:.0%})")
+        return reasons
+    
+    def check(self, data: bytes) -> Dict:
+        """Measurements of an image that passes; raises QualityError otherwise"""
+        if not self.enabled:
+            return {}
+        measurements = measure(data)
+        reasons = self.problems(measurements)
+        if reasons:
+            raise QualityError(reasons, measurements)
+        return measurements
+
+
+def write_checked_assets(gate: QualityGate, data: bytes, word: str, category: str, output_dir: Path,
+                         assets_dir: Path, size: Optional[Tuple[int, int]] = None,
+                         point_size: Optional[int] = None) -> Dict:
+    """CPU-stage job: run the gate, then write_flashcard_assets (nothing is written if it fails)"""
+    measurements = gate.check(data)
+    result = write_flashcard_assets(data, word, category, output_dir, assets_dir, size, point_size)
+    if measurements:
+        result['quality'] = measurements
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the quality gate over existing images (no API calls)')
+    parser.add_argument('images', type=Path, nargs='+', help='PNG files to check')
+    
+    args = parser.parse_args()
+    
+    gate = QualityGate(enabled=True)
+    failed = 0
+    for path in args.images:
+        try:
+            gate.check(path.read_bytes())
+        except QualityError as e:
+            failed += 1
+            print(f"   ❌ {path.name}: {'; '.join(e.reasons)}")
+        except OSError as e:
+            failed += 1
+            print(f"   ❌ {path.name}: {e}")
+    print(f"\n{'⚠️ ' if failed else '✅'} {len(args.images) - failed}/{len(args.images)} passed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Rate Limiting
+Token bucket shared by every generation worker so concurrent requests
+stay within the API's request rate, plus response classification and
+backoff helpers for throttled or failing requests
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Response classes
+OK = 'ok'
+THROTTLED = 'throttled'    # 429 - slow down
+QUOTA = 'quota'            # 403 / RESOURCE_EXHAUSTED - quota used up
+TRANSIENT = 'transient'    # 5xx, timeouts, connection errors
+EMPTY = 'empty'            # 200 without an image (e.g. safety filtered)
+FATAL = 'fatal'            # other 4xx - retrying will not help
+QUALITY = 'quality'        # image came back but failed the quality gate (quality.py)
+
+RETRYABLE = {THROTTLED, QUOTA, TRANSIENT, EMPTY}
+
+
+def classify_response(status_code: Optional[int], body: str = '') -> str:
+    """Map an HTTP status (None for network errors) and body to a response class"""
+    if status_code is None:
+        return TRANSIENT
+    text = body.lower()
+    # Google reports both per-minute throttling and daily quota as 429 RESOURCE_EXHAUSTED
+    if status_code == 429 or 'resource_exhausted' in text:
+        return QUOTA if 'per day' in text or 'perday' in text else THROTTLED
+    if status_code == 403 and 'quota' in text:
+        return QUOTA
+    if status_code == 408 or status_code >= 500:
+        return TRANSIENT
+    if 200 <= status_code < 300:
+        return OK
+    return FATAL
+
+
+# 400 bodies from endpoints or models that take one instance per :predict call
+SINGLE_INSTANCE_PATTERN = re.compile(
+    r'only (?:one|1|a single) instance|(?:multiple|more than one) instances?'
+    r'|instances?\b[^.]*\b(?:not supported|unsupported|at most 1\b|must be 1\b)',
+    re.IGNORECASE
+)
+
+
+def rejects_batches(body: str) -> bool:
+    """True if an error body says the endpoint doesn't accept multi-instance requests"""
+    return bool(SINGLE_INSTANCE_PATTERN.search(body or ''))
+
+
+# Failure queue: seconds before a failed word is eligible for retry-failed,
+# doubled for every run it has failed (FATAL needs a forced retry)
+FAILURE_RETRY_BASE = {THROTTLED: 300, TRANSIENT: 300, QUOTA: 3600, EMPTY: 3600, QUALITY: 3600}
+FAILURE_RETRY_CAP = 86400
+
+
+def failure_retry_delay(kind: str, failures: int) -> Optional[float]:
+    """Delay before a word that failed `failures` runs in a row may be retried (None = never automatically)"""
+    if kind == FATAL:
+        return None
+    base = FAILURE_RETRY_BASE.get(kind, FAILURE_RETRY_BASE[TRANSIENT])
+    return min(FAILURE_RETRY_CAP, base * 2 ** max(0, failures - 1))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay_from_body(body: str) -> Optional[float]:
+    """Read the RetryInfo hint (e.g. "retryDelay": "30s") from a Google API error body"""
+    try:
+        details = json.loads(body).get('error', {}).get('details', [])
+    except (ValueError, AttributeError):
+        return None
+    for detail in details:
+        delay = detail.get('retryDelay') if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith('s'):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                return None
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second (0 or less disables limiting)
+            capacity: Maximum burst size (defaults to one second of tokens)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        """Add the tokens earned since the last update"""
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+    
+    def acquire(self, tokens: float = 1.0, stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        Block until `tokens` are available and take them.
+
+        Returns False without taking anything if `stop_event` is set while waiting.
+        """
+        if self.rate <= 0:
+            return True
+        
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket that adapts to the server (AIMD).
+
+    Throttling and quota responses cut the rate multiplicatively and pause
+    every worker for as long as the server asked; a run of successes raises
+    it again additively, up to `max_rate`.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 min_rate: float = 0.1, max_rate: Optional[float] = None,
+                 increase_after: int = 10, increase_step: Optional[float] = None,
+                 decrease_factor: float = 0.5, backoff_base: float = 1.0, backoff_cap: float = 60.0):
+        super().__init__(rate, capacity)
+        self.max_rate = max(rate, max_rate or rate)
+        self.min_rate = min(min_rate, rate) if rate > 0 else min_rate
+        self.increase_after = increase_after
+        self.increase_step = increase_step or max(self.max_rate * 0.05, 0.01)
+        self.decrease_factor = decrease_factor
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        
+        self.successes = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+    
+    def acquire(self, tokens: float = 1.0, stop_event: Optional[threading.Event] = None) -> bool:
+        """Wait out any server-requested pause, then take tokens"""
+        while True:
+            with self.lock:
+                wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+        
+        return super().acquire(tokens, stop_event)
+    
+    def record(self, kind: str, retry_after: Optional[float] = None):
+        """Feed a response class back into the limiter"""
+        with self.lock:
+            now = time.monotonic()
+            
+            if kind == OK:
+                self.successes += 1
+                if self.rate > 0 and self.successes >= self.increase_after and self.rate < self.max_rate:
+                    self._refill(now)
+                    self.rate = min(self.max_rate, self.rate + self.increase_step)
+                    self.successes = 0
+                return
+            
+            self.successes = 0
+            if kind not in (THROTTLED, QUOTA):
+                return
+            
+            # Concurrent workers see the same burst of 429s - cut the rate once per window
+            if self.rate > 0 and now - self.last_decrease >= max(1.0, 1.0 / self.rate):
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self.last_decrease = now
+            
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+    
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with full jitter, never shorter than the server's hint"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1)))
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
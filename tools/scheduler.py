@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Run Scheduler
+Orders the words of a generation run and keeps it within a deadline and
+a request budget, so unattended runs stop cleanly with useful coverage.
+
+Orders:
+    round-robin  first word of every category, then the second, ... so a
+                 partial run leaves every category with its first-listed words
+    file         categories in file order, each finished before the next
+
+The budget is checked before every API request (including retries): a
+request is only sent if the request count stays within --max-requests and
+it can be expected to finish, at p95 latency, before the deadline.
+"""
+
+import heapq
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+Item = Tuple[str, str]
+
+ORDERS = ('round-robin', 'file')
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds from '90', '90s', '45m', '1h30m' or '2d'"""
+    text = text.strip().lower()
+    if re.fullmatch(r'\d+(\.\d+)?', text):
+        return float(text)
+    parts = re.findall(r'(\d+(?:\.\d+)?)([smhd])', text)
+    if not parts or ''.join(n + u for n, u in parts) != text:
+        raise ValueError(f"Invalid duration: {text!r} (e.g. 90s, 45m, 1h30m)")
+    return sum(float(n) * DURATION_UNITS[u] for n, u in parts)
+
+
+def schedule(remaining_by_category: Dict[str, List[str]], order: str = 'round-robin') -> List[Item]:
+    """(word, category) items in the order they should be requested"""
+    if order not in ORDERS:
+        raise ValueError(f"Unknown order: {order!r} (choose from {', '.join(ORDERS)})")
+    
+    # Priority (position in category, category position) for round-robin,
+    # (category position, position in category) for file order
+    heap = []
+    for c, (category, words) in enumerate(remaining_by_category.items()):
+        for w, word in enumerate(words):
+            priority = (w, c) if order == 'round-robin' else (c, w)
+            heap.append((priority, word, category))
+    heapq.heapify(heap)
+    
+    items = []
+    while heap:
+        _, word, category = heapq.heappop(heap)
+        items.append((word, category))
+    return items
+
+
+class RunBudget:
+    """Deadline and request cap shared by every fetch worker"""
+    
+    def __init__(self, deadline: Optional[float] = None, max_requests: Optional[int] = None,
+                 request_seconds: float = 0.0):
+        """
+        Args:
+            deadline: Seconds from now by which the last request must finish (None = no deadline)
+            max_requests: API requests allowed, retries included (None = unlimited)
+            request_seconds: Expected time for one request, reserved before the deadline
+        """
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline if deadline else None
+        self.max_requests = max_requests
+        self.request_seconds = request_seconds
+        self.requests = 0
+        self.exhausted: Optional[str] = None   # why the run was stopped
+        self.lock = threading.Lock()
+    
+    @property
+    def limited(self) -> bool:
+        return self.deadline is not None or self.max_requests is not None
+    
+    def fits(self, wait: float = 0.0) -> bool:
+        """Whether a request started after `wait` seconds would still finish before the deadline"""
+        with self.lock:
+            return self._fits(wait)
+    
+    def _fits(self, wait: float) -> bool:
+        if self.exhausted:
+            return False
+        if self.deadline is not None and time.monotonic() + wait + self.request_seconds > self.deadline:
+            self.exhausted = 'deadline reached'
+            return False
+        return True
+    
+    def reserve(self) -> bool:
+        """Claim one request; False (and stays False) once the budget or deadline is reached"""
+        with self.lock:
+            if not self._fits(0.0):
+                return False
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                self.exhausted = 'request budget reached'
+                return False
+            self.requests += 1
+            return True
+    
+    def exhaust(self, reason: str):
+        """Stop handing out requests for a reason outside the budget (e.g. no API key left)"""
+        with self.lock:
+            self.exhausted = self.exhausted or reason
+    
+    def describe(self) -> str:
+        parts = []
+        if self.max_requests is not None:
+            parts.append(f"{self.max_requests} request(s)")
+        if self.deadline is not None:
+            minutes = (self.deadline - self.started) / 60
+            parts.append(f"deadline in {minutes:.0f} min")
+        return ', '.join(parts) or 'unlimited'
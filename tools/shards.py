@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Sharded Generation
+Splits a generation run across machines and merges the results back.
+
+`generate_images_imagen.py vocab.md --shard 2/4` generates only the words
+whose stable hash falls in shard 2 of 4, into its own directory:
+
+    shards/2-of-4/
+        GeneratedImages/<category>/<word>.png
+        EarLiLy/Assets.xcassets/FlashcardImages/<category>-<word>.imageset/
+        image_generation_log.jsonl
+        vocabulary_snapshot.json
+
+Words are hashed on their file name, so every spelling that would write
+the same files (and a word listed in two categories) lands on one shard. Copy each host's shard directory
+into shards/, then `python3 shards.py merge` combines them into the
+canonical GeneratedImages/, FlashcardImages, generation log and flashcard
+manifest.
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from image_io import asset_name, link_if_changed, prune_imageset, safe_category_name, safe_name
+from manifest import Manifest
+from metadata_store import MetadataStore, open_metadata_store
+
+Shard = Tuple[int, int]   # (index, count), index 1-based
+
+REPO_DIR = Path(__file__).parent.parent
+DEFAULT_SHARDS_DIR = REPO_DIR / 'shards'
+DEFAULT_METADATA_FILE = Path(__file__).parent / 'image_generation_log.json'
+
+SHARD_DIR_NAME = re.compile(r'^(\d+)-of-(\d+)$')
+
+
+def parse_shard(text: str) -> Shard:
+    """'2/4' -> (2, 4)"""
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', text)
+    if not match:
+        raise ValueError(f"Invalid shard: {text!r} (expected i/N, e.g. 1/4)")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard: {text!r} (i must be between 1 and N)")
+    return index, count
+
+
+def shard_of(word: str, count: int) -> int:
+    """1-based shard for `word`; stable across machines, Python versions and runs"""
+    digest = hashlib.blake2b(safe_name(word).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count + 1
+
+
+def in_shard(word: str, shard: Optional[Shard]) -> bool:
+    return shard is None or shard_of(word, shard[1]) == shard[0]
+
+
+def shard_dir(shard: Shard, shards_dir: Optional[Path] = None) -> Path:
+    return Path(shards_dir or DEFAULT_SHARDS_DIR) / f"{shard[0]}-of-{shard[1]}"
+
+
+def image_path(base_dir: Path, word: str, category: str) -> Path:
+    """Where write_flashcard_assets puts the source PNG under `base_dir`"""
+    return Path(base_dir) / 'GeneratedImages' / safe_category_name(category) / f"{safe_name(word)}.png"
+
+
+def assets_dir(base_dir: Path) -> Path:
+    return Path(base_dir) / 'EarLiLy' / 'Assets.xcassets' / 'FlashcardImages'
+
+
+def find_shards(shards_dir: Path) -> List[Tuple[Shard, Path]]:
+    """Shard directories under `shards_dir`, in shard order"""
+    found = []
+    for path in Path(shards_dir).iterdir() if Path(shards_dir).is_dir() else []:
+        match = SHARD_DIR_NAME.match(path.name)
+        if match and path.is_dir():
+            found.append(((int(match.group(1)), int(match.group(2))), path))
+    return sorted(found)
+
+
+def open_shard_store(path: Path) -> Optional[MetadataStore]:
+    """A shard's generation log, whichever backend wrote it (None if it has none)"""
+    base = path / 'image_generation_log.json'
+    for backend in ('sqlite', 'journal'):
+        candidate = base.with_suffix('.sqlite3' if backend == 'sqlite' else '.jsonl')
+        if candidate.exists():
+            return open_metadata_store(base, backend)
+    return None
+
+
+def same_bytes(a: Path, b: Path) -> bool:
+    if a.stat().st_size != b.stat().st_size:
+        return False
+    return a.read_bytes() == b.read_bytes()
+
+
+def copy_imageset(src_dir: Path, dst_dir: Path, counts: Optional[Dict] = None):
+    """Mirror one imageset: link every changed file across, drop renditions the source doesn't have"""
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    names = []
+    for src in sorted(src_dir.iterdir()):
+        if src.is_file() and not src.name.startswith('.'):
+            link_if_changed(src, dst_dir / src.name, counts)
+            names.append(src.name)
+    prune_imageset(dst_dir, names, counts)
+
+
+def merge_shards(shards_dir: Path, base_dir: Path, metadata_file: Path, backend: Optional[str] = None,
+                 force: bool = False) -> Dict:
+    """
+    Merge every shard under `shards_dir` into the canonical tree at `base_dir`.
+
+    A word is a conflict, and left untouched, when shards disagree about it
+    (different cache keys, or words from two shards claiming one imageset), when the
+    canonical log already has a newer image for it, or when an untracked
+    canonical file would be overwritten with different bytes. `force` takes
+    the newest image instead. Merging again is a no-op.
+    """
+    shards = find_shards(shards_dir)
+    if not shards:
+        raise ValueError(f"No shard directories (N-of-M) found in {shards_dir}")
+    counts = {count for (_, count), _ in shards}
+    
+    canonical = open_metadata_store(metadata_file, backend, legacy_file=metadata_file)
+    canonical_assets = assets_dir(base_dir)
+    
+    candidates: Dict[Tuple[str, str], List[Tuple[Path, Dict]]] = {}
+    failures: Dict[Tuple[str, str], Dict] = {}
+    completed_in: Dict[str, set] = {}
+    for shard, path in shards:
+        store = open_shard_store(path)
+        if store is None:
+            continue
+        for entry in store.generated_entries():
+            entry = dict(entry)
+            key = (entry.pop('word'), entry.pop('category'))
+            candidates.setdefault(key, []).append((path, entry))
+        for failure in store.failures():
+            failure = dict(failure)
+            failures[(failure.pop('word'), failure.pop('category'))] = failure
+        for category in store.categories_completed():
+            completed_in.setdefault(category, set()).add(shard)
+        store.close()
+    
+    summary = {'shards': len(shards), 'merged': 0, 'unchanged': 0, 'failures': 0, 'categories_completed': 0}
+    files = {'written': 0, 'skipped': 0, 'deleted': 0}
+    conflicts: List[Dict] = []
+    claims: Dict[str, Tuple[str, Path]] = {}   # imageset name -> (word, shard) merged into it
+    
+    def conflict(word: str, category: str, reason: str):
+        conflicts.append({'word': word, 'category': category, 'reason': reason})
+    
+    for (word, category), found in sorted(candidates.items()):
+        keys = {entry.get('cache_key') for _, entry in found}
+        if len(keys) > 1 and not force:
+            conflict(word, category, f"{len(found)} shards hold different images")
+            continue
+        path, entry = max(found, key=lambda f: f[1].get('timestamp', 0))
+        
+        name = asset_name(word, category)
+        claimant = claims.get(name)
+        if claimant and claimant[1] != path and not force:
+            conflict(word, category, f"imageset {name} also claimed by {claimant[0]} ({claimant[1].name})")
+            continue
+        
+        src = image_path(path, word, category)
+        if not src.exists():
+            conflict(word, category, f"missing {src.relative_to(path)} in shard {path.name}")
+            continue
+        dst = image_path(base_dir, word, category)
+        current = canonical.get_generated(word, category)
+        
+        if current and current.get('cache_key') == entry.get('cache_key') and dst.exists():
+            claims[name] = (word, path)
+            summary['unchanged'] += 1
+            continue
+        if current and current.get('timestamp', 0) > entry.get('timestamp', 0) and not force:
+            conflict(word, category, "canonical image is newer")
+            continue
+        if not current and dst.exists() and not same_bytes(src, dst) and not force:
+            conflict(word, category, f"untracked {dst.name} differs")
+            continue
+        
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        link_if_changed(src, dst, files)
+        imageset = assets_dir(path) / f"{name}.imageset"
+        if imageset.is_dir():
+            copy_imageset(imageset, canonical_assets / imageset.name, files)
+        canonical.record_generated(word, category, dict(entry, path=str(dst)), count=current is None)
+        claims[name] = (word, path)
+        summary['merged'] += 1
+    
+    for (word, category), failure in failures.items():
+        if (word, category) not in candidates and not canonical.is_generated(word, category) \
+                and not canonical.has_failed(word, category):
+            canonical.record_failure(word, category, failure)
+            summary['failures'] += 1
+    
+    # Complete only when every shard of a full set finished its part of the category
+    conflicted = {c['category'] for c in conflicts}
+    for count in counts:
+        full_set = set(range(1, count + 1))
+        for category, shard_set in completed_in.items():
+            done = {index for index, n in shard_set if n == count}
+            if done == full_set and category not in conflicted and not canonical.is_category_complete(category):
+                canonical.mark_category_complete(category)
+                summary['categories_completed'] += 1
+    
+    # The app's card list follows the merged log
+    manifest = Manifest(Path(base_dir) / 'GeneratedImages')
+    manifest.sync_store(canonical)
+    manifest.save()
+    
+    summary['files'] = files
+    summary['conflicts'] = conflicts
+    summary['shard_counts'] = sorted(counts)
+    summary['metadata'] = str(canonical.path)
+    summary['manifest_cards'] = len(manifest)
+    canonical.close()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge sharded generation runs into the canonical tree')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    merge = subparsers.add_parser('merge', help='Combine shard logs and assets into GeneratedImages/ and FlashcardImages')
+    merge.add_argument('--shards-dir', type=Path, default=DEFAULT_SHARDS_DIR,
+                       help='Directory holding the N-of-M shard directories (default: shards/)')
+    merge.add_argument('--force', action='store_true', help='Resolve conflicts by taking the newest image')
+    merge.add_argument('--metadata-backend', choices=['journal', 'sqlite'],
+                       help='Canonical generation log format (or set METADATA_BACKEND env var, default: journal)')
+    
+    which = subparsers.add_parser('which', help='Show which shard each word belongs to')
+    which.add_argument('count', type=int, help='Number of shards')
+    which.add_argument('words', nargs='+', help='Words to look up')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'which':
+        for word in args.words:
+            print(f"   {word}: {shard_of(word, args.count)}/{args.count}")
+        return
+    
+    print(f"🔀 Merging shards from {args.shards_dir}")
+    try:
+        summary = merge_shards(args.shards_dir, REPO_DIR, DEFAULT_METADATA_FILE, args.metadata_backend, args.force)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    
+    if len(summary['shard_counts']) > 1:
+        print(f"   ⚠️  Mixed shard counts: {', '.join(map(str, summary['shard_counts']))}")
+    print(f"   Shards: {summary['shards']}")
+    print(f"   Merged: {summary['merged']}")
+    print(f"   Already up to date: {summary['unchanged']}")
+    files = summary['files']
+    print(f"   Files: {files['written']} written, {files['skipped']} unchanged, {files['deleted']} deleted")
+    print(f"   Failures carried over: {summary['failures']}")
+    print(f"   Categories completed: {summary['categories_completed']}")
+    print(f"   Metadata: {summary['metadata']}")
+    print(f"   Manifest: {summary['manifest_cards']} card(s)")
+    
+    conflicts = summary['conflicts']
+    if conflicts:
+        print(f"\n⚠️  Conflicts ({len(conflicts)}) - left untouched, rerun with --force to take the newest:")
+        for item in conflicts[:20]:
+            print(f"   - {item['word']} ({item['category']}): {item['reason']}")
+        if len(conflicts) > 20:
+            print(f"   ... and {len(conflicts) - 20} more")
+        sys.exit(1)
+    print("✅ Merge complete")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Generation Status
+Shows progress per category from the generation log: images generated,
+words in the failure queue and words not tried yet.
+
+Reads only the metadata store and the vocabulary file (no PIL, requests or
+tqdm), so it answers instantly even for a large log.
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from metadata_store import BACKENDS, MetadataStore, open_metadata_store
+from planner import format_duration
+from shards import in_shard, parse_shard, shard_dir
+from vocabulary import parse_vocabulary
+
+load_dotenv()
+
+REPO_DIR = Path(__file__).parent.parent
+DEFAULT_VOCAB_FILE = Path(__file__).parent / 'earlily_vocab_list.md'
+DEFAULT_METADATA_FILE = Path(__file__).parent / 'image_generation_log.json'
+
+
+def metadata_file_for(shard: Optional[Tuple[int, int]] = None) -> Path:
+    """The generation log the generator writes for `shard` (or the canonical one)"""
+    if shard:
+        return shard_dir(shard, REPO_DIR / 'shards') / 'image_generation_log.json'
+    return DEFAULT_METADATA_FILE
+
+
+def open_existing_store(metadata_file: Path, backend: Optional[str] = None) -> Optional[MetadataStore]:
+    """Open the generation log read-only if a run has written one; never creates or migrates a file"""
+    backend = backend or os.getenv('METADATA_BACKEND', 'journal')
+    suffix = '.sqlite3' if backend == 'sqlite' else '.jsonl'
+    if backend not in BACKENDS or not (metadata_file.with_suffix(suffix).exists() or metadata_file.exists()):
+        return None
+    return open_metadata_store(metadata_file, backend, legacy_file=metadata_file, read_only=True)
+
+
+def category_status(store: Optional[MetadataStore], categories: Dict[str, List[str]]) -> List[Dict]:
+    """Generated / failed / pending counts per category"""
+    rows = []
+    for category, words in categories.items():
+        words = list(dict.fromkeys(words))
+        generated = failed = 0
+        for word in words:
+            if store is not None and store.is_generated(word, category):
+                generated += 1
+            elif store is not None and store.has_failed(word, category):
+                failed += 1
+        rows.append({
+            'category': category,
+            'words': len(words),
+            'generated': generated,
+            'failed': failed,
+            'pending': len(words) - generated - failed,
+            'complete': store is not None and store.is_category_complete(category),
+        })
+    return rows
+
+
+def print_status(store: Optional[MetadataStore], categories: Dict[str, List[str]], metadata_file: Path):
+    print("📊 EarLiLy generation status")
+    print(f"   Log: {store.path if store is not None else f'{metadata_file.name} (no runs yet)'}")
+    
+    rows = category_status(store, categories)
+    if rows:
+        width = max(len('Category'), *(len(row['category']) for row in rows))
+        print(f"\n   {'Category':<{width}}  {'Done':>9}  {'Failed':>6}  {'Pending':>7}")
+        for row in rows:
+            done = f"{row['generated']}/{row['words']}"
+            mark = ' ✅' if row['complete'] or row['generated'] == row['words'] else ''
+            print(f"   {row['category']:<{width}}  {done:>9}  {row['failed']:>6}  {row['pending']:>7}{mark}")
+        
+        words = sum(row['words'] for row in rows)
+        generated = sum(row['generated'] for row in rows)
+        print(f"\n   Total: {generated}/{words} ({100 * generated / max(words, 1):.0f}%), "
+              f"{sum(row['failed'] for row in rows)} failed, {sum(row['pending'] for row in rows)} pending")
+    
+    if store is None:
+        return
+    now = time.time()
+    queued = store.failures()
+    due = [f for f in queued if f.get('next_eligible') is not None and f['next_eligible'] <= now]
+    waiting = [f['next_eligible'] for f in queued if f.get('next_eligible') is not None and f['next_eligible'] > now]
+    manual = len(queued) - len(due) - len(waiting)
+    print(f"   Failure queue: {len(queued)}", end='')
+    if queued:
+        parts = [f"{len(due)} due now"]
+        if waiting:
+            parts.append(f"{len(waiting)} waiting, next in {format_duration(min(waiting) - now)}")
+        if manual:
+            parts.append(f"{manual} need --force")
+        print(f" ({', '.join(parts)})", end='')
+    print()
+    print(f"   Images generated (all time): {store.total_count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Show generation progress per category (no API calls, no image decoding)'
+    )
+    parser.add_argument('vocab_file', type=Path, nargs='?', default=DEFAULT_VOCAB_FILE,
+                        help=f'Vocabulary markdown file (default: {DEFAULT_VOCAB_FILE.name})')
+    parser.add_argument('--categories', nargs='+', help='Specific categories to show')
+    parser.add_argument('--shard', type=parse_shard, help='Show shard i of N (e.g. 2/4) instead of the canonical log')
+    parser.add_argument('--metadata-backend', choices=['journal', 'sqlite'],
+                        help='Generation log format (or set METADATA_BACKEND env var, default: journal)')
+    
+    args = parser.parse_args()
+    
+    if not args.vocab_file.exists():
+        print(f"❌ Error: File not found: {args.vocab_file}")
+        return
+    
+    categories = parse_vocabulary(args.vocab_file)
+    if args.categories:
+        categories = {k: v for k, v in categories.items() if k in args.categories}
+    if args.shard:
+        categories = {k: [w for w in v if in_shard(w, args.shard)] for k, v in categories.items()}
+    
+    metadata_file = metadata_file_for(args.shard)
+    store = open_existing_store(metadata_file, args.metadata_backend)
+    try:
+        print_status(store, categories, metadata_file)
+    finally:
+        if store is not None:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
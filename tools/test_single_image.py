@@ -29,10 +29,10 @@ print(f"✅ API Key found (ends with ...{api_key[-8:]})")
 try:
     import google.generativeai as genai
     from PIL import Image
-    import requests
     from io import BytesIO
     import json
     from pathlib import Path
+    from imagen_transport import ImagenAPIError, ImagenTransport
 except ImportError:
     print("\n❌ Missing dependencies")
     print("Run: pip3 install google-generativeai pillow python-dotenv requests")
@@ -73,15 +73,9 @@ try:
     from google.generativeai import ImageGenerationModel
     
     # Note: This requires Imagen access through Vertex AI
-    # For Google AI Studio, we'll use the REST API
+    # For Google AI Studio, we'll use the REST API via the generator's transport
     
-    import requests
-    
-    url = "https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-001:predict"
-    
-    headers = {
-        'Content-Type': 'application/json',
-    }
+    transport = ImagenTransport(api_key, read_timeout=30)
     
     payload = {
         'instances': [{'prompt': prompt}],
@@ -91,17 +85,18 @@ try:
         }
     }
     
-    response = requests.post(
-        f"{url}?key={api_key}",
-        headers=headers,
-        json=payload,
-        timeout=30
-    )
+    api_error = None
+    try:
+        result = transport.predict(payload)
+        status_code = 200
+    except ImagenAPIError as e:
+        api_error = e
+        result = None
+        status_code = e.status_code
     
-    print(f"   Response status: {response.status_code}")
+    print(f"   Response status: {status_code}")
     
-    if response.status_code == 200:
-        result = response.json()
+    if result is not None:
         print(f"\n✅ API call successful!")
         
         # Save result for inspection
@@ -115,8 +110,8 @@ try:
         print(f"\n🎉 Test completed! Check the response file.")
         
     else:
-        print(f"\n❌ API Error: {response.status_code}")
-        print(f"   Message: {response.text[:500]}")
+        print(f"\n❌ API Error: {status_code} ({api_error.kind})")
+        print(f"   Message: {str(api_error)}")
         print(f"\n💡 Possible issues:")
         print(f"   - Imagen 3 may not be available in your region")
         print(f"   - API key may need Vertex AI access")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Asset Verification
+Checks that every image in the generation log is on disk and intact: the
+source PNG under GeneratedImages/ and the imageset the app loads, with
+every rendition its Contents.json lists.
+
+PNGs are checked structurally (signature, IHDR CRC, trailing IEND) without
+decoding pixels, so no PIL is needed. Exits 1 if anything is missing or
+corrupt - rerun the generator or export_assets.py to repair it.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from image_io import asset_name, png_dimensions
+from shards import assets_dir, image_path, parse_shard, shard_dir
+from status import REPO_DIR, metadata_file_for, open_existing_store
+
+
+def check_png(path: Path, size: Optional[Tuple[int, int]] = None) -> Optional[str]:
+    """Why `path` isn't a usable PNG (of `size`), or None"""
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return 'missing'
+    dimensions = png_dimensions(data)
+    if dimensions is None:
+        return 'not a complete PNG'
+    if size and tuple(size) != dimensions:
+        return f"{dimensions[0]}x{dimensions[1]}, log says {size[0]}x{size[1]}"
+    return None
+
+
+def check_imageset(imageset_dir: Path) -> List[str]:
+    """Problems with one imageset's Contents.json and renditions"""
+    try:
+        contents = json.loads((imageset_dir / 'Contents.json').read_text())
+    except FileNotFoundError:
+        return ['Contents.json missing']
+    except (OSError, ValueError):
+        return ['Contents.json unreadable']
+    
+    filenames = [image.get('filename') for image in contents.get('images', [])]
+    if not any(filenames):
+        return ['Contents.json lists no images']
+    problems = []
+    for filename in filter(None, filenames):
+        problem = check_png(imageset_dir / filename)
+        if problem:
+            problems.append(f"{filename} {problem}")
+    return problems
+
+
+def verify_assets(store, base_dir: Path) -> Dict:
+    """Check every generated entry in `store` against the tree under `base_dir`"""
+    problems: List[Dict] = []
+    checked_imagesets = set()
+    entries = 0
+    catalog = assets_dir(base_dir)
+    
+    for entry in store.generated_entries():
+        entries += 1
+        word, category = entry['word'], entry['category']
+        source = Path(entry['path']) if entry.get('path') else image_path(base_dir, word, category)
+        size = (entry['width'], entry['height']) if entry.get('width') and entry.get('height') else None
+        problem = check_png(source, size)
+        if problem:
+            problems.append({'word': word, 'category': category, 'problem': f"{source.name} {problem}"})
+        
+        name = asset_name(word, category)
+        if name in checked_imagesets:
+            continue
+        checked_imagesets.add(name)
+        imageset_dir = catalog / f"{name}.imageset"
+        if not imageset_dir.is_dir():
+            problems.append({'word': word, 'category': category, 'problem': f"{imageset_dir.name} missing"})
+            continue
+        for problem in check_imageset(imageset_dir):
+            problems.append({'word': word, 'category': category, 'problem': f"{imageset_dir.name}: {problem}"})
+    
+    untracked = sorted(
+        path.name for path in catalog.glob('*.imageset')
+        if path.stem not in checked_imagesets
+    ) if catalog.is_dir() else []
+    
+    return {
+        'entries': entries,
+        'imagesets': len(checked_imagesets),
+        'problems': problems,
+        'untracked': untracked,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check that every logged image and imageset exists and is a complete PNG (no API calls)'
+    )
+    parser.add_argument('--shard', type=parse_shard, help='Verify shard i of N (e.g. 2/4) instead of the canonical tree')
+    parser.add_argument('--metadata-backend', choices=['journal', 'sqlite'],
+                        help='Generation log format (or set METADATA_BACKEND env var, default: journal)')
+    
+    args = parser.parse_args()
+    
+    base_dir = shard_dir(args.shard, REPO_DIR / 'shards') if args.shard else REPO_DIR
+    store = open_existing_store(metadata_file_for(args.shard), args.metadata_backend)
+    if store is None:
+        print("❌ Error: No generation log found - nothing to verify")
+        sys.exit(1)
+    
+    print(f"🔍 Verifying assets against {store.path.name}")
+    try:
+        result = verify_assets(store, base_dir)
+    finally:
+        store.close()
+    
+    print(f"   Logged images: {result['entries']}")
+    print(f"   Imagesets: {result['imagesets']}")
+    if result['untracked']:
+        print(f"   Imagesets not in the log: {len(result['untracked'])} (exported or added by hand)")
+    
+    problems = result['problems']
+    if problems:
+        print(f"\n❌ Problems ({len(problems)}):")
+        for item in problems[:20]:
+            print(f"   - {item['word']} ({item['category']}): {item['problem']}")
+        if len(problems) > 20:
+            print(f"   ... and {len(problems) - 20} more")
+        sys.exit(1)
+    print("✅ All assets present and intact")
+
+
+if __name__ == '__main__':
+    main()
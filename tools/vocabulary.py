@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+EarLiLy Vocabulary Parser
+Single streaming parser for the vocabulary markdown, shared by both
+generators, plus a snapshot of the last parse so a re-run only has to
+reconcile the sections that actually changed.
+
+Format: `## Category` headers followed by comma-separated word lines.
+Lines starting with `#` or `*`, horizontal rules and metadata sections
+("Complete Word List", "Note:" ...) are skipped.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_SNAPSHOT_FILE = Path(__file__).parent / 'vocabulary_snapshot.json'
+
+# Headers of sections that describe the list rather than hold words
+SKIP_SECTIONS = ('complete word list', 'total words', 'note:', 'recommended')
+
+# ASCII, full-width and ideographic commas, for non-English lists
+WORD_SEPARATORS = re.compile(r'[,，、]')
+
+
+def fingerprint(words: List[str], salt: str = '') -> str:
+    """Short stable hash of a section's word list"""
+    digest = hashlib.blake2b(salt.encode('utf-8'), digest_size=12)
+    for word in words:
+        digest.update(b'\x00' + word.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def iter_sections(vocab_file: Path) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (category, words) one section at a time, reading the file line by line"""
+    category = None
+    words: List[str] = []
+    
+    with open(vocab_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            
+            if line.startswith('## '):
+                if category and words:
+                    yield category, words
+                category = line[3:].strip()
+                words = []
+                if any(skip in category.lower() for skip in SKIP_SECTIONS):
+                    category = None
+            
+            elif category and line and not line.startswith(('#', '*', '---')):
+                words.extend(w.strip() for w in WORD_SEPARATORS.split(line) if w.strip())
+    
+    if category and words:
+        yield category, words
+
+
+def parse_vocabulary(vocab_file: Path) -> Dict[str, List[str]]:
+    """Parse vocabulary markdown into {category: [words]}"""
+    categories: Dict[str, List[str]] = {}
+    for category, words in iter_sections(vocab_file):
+        # A repeated header continues the same category
+        categories.setdefault(category, []).extend(words)
+    return categories
+
+
+class VocabularyPlan:
+    """What changed in the vocabulary since the last snapshot"""
+    
+    def __init__(self, categories: Dict[str, List[str]], fingerprints: Dict[str, str],
+                 changed_categories: List[str], added: List[Tuple[str, str]],
+                 removed: List[Tuple[str, str]], changed: List[Tuple[str, str]]):
+        self.categories = categories
+        self.fingerprints = fingerprints
+        self.changed_categories = changed_categories  # new or edited sections
+        self.added = added          # (word, category) not in the previous snapshot
+        self.removed = removed      # (word, category) no longer in the vocabulary
+        self.changed = changed      # (word, new category) for words that moved category
+    
+    @property
+    def unchanged_categories(self) -> List[str]:
+        changed = set(self.changed_categories)
+        return [c for c in self.categories if c not in changed]
+    
+    def summary(self) -> str:
+        return (f"+{len(self.added)} added, -{len(self.removed)} removed, ~{len(self.changed)} moved, "
+                f"{len(self.unchanged_categories)}/{len(self.categories)} categories unchanged")
+
+
+class VocabularySnapshot:
+    """Last parsed vocabulary per file: section fingerprints and word lists"""
+    
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Args:
+            path: Snapshot location (or VOCAB_SNAPSHOT_FILE env var, default: tools/vocabulary_snapshot.json)
+        """
+        self.path = Path(path or os.getenv('VOCAB_SNAPSHOT_FILE') or DEFAULT_SNAPSHOT_FILE)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {'version': 1, 'files': {}}
+    
+    def previous(self, vocab_file: Path) -> Dict[str, Dict]:
+        """{category: {'fingerprint', 'words'}} from the last run on this file"""
+        return self.data['files'].get(str(Path(vocab_file).resolve()), {})
+    
+    def plan(self, vocab_file: Path, salt: Optional[Callable[[str], str]] = None) -> VocabularyPlan:
+        """
+        Parse `vocab_file` and diff it against the snapshot.
+
+        `salt(category)` is folded into each section's fingerprint, so that
+        anything else a section's output depends on (prompt template, model
+        settings) also marks it changed.
+        """
+        previous = self.previous(vocab_file)
+        categories = parse_vocabulary(vocab_file)
+        
+        fingerprints = {
+            category: fingerprint(words, salt(category) if salt else '')
+            for category, words in categories.items()
+        }
+        changed_categories = [
+            category for category, fp in fingerprints.items()
+            if previous.get(category, {}).get('fingerprint') != fp
+        ]
+        
+        # Word-level diff, only over sections whose fingerprint moved
+        dirty = set(changed_categories) | (set(previous) - set(categories))
+        old_words = {(w, c) for c in dirty for w in previous.get(c, {}).get('words', [])}
+        new_words = {(w, c) for c in dirty if c in categories for w in categories[c]}
+        
+        old_category = {w: c for w, c in old_words}
+        added, changed = [], []
+        for word, category in sorted(new_words - old_words):
+            if word in old_category and (word, old_category[word]) not in new_words:
+                changed.append((word, category))
+            else:
+                added.append((word, category))
+        moved = {w for w, _ in changed}
+        removed = [(w, c) for w, c in sorted(old_words - new_words) if w not in moved]
+        
+        return VocabularyPlan(categories, fingerprints, changed_categories, added, removed, changed)
+    
+    def save(self, vocab_file: Path, plan: VocabularyPlan):
+        """Record `plan` as the latest parse of `vocab_file` (atomic rewrite)"""
+        self.data['files'][str(Path(vocab_file).resolve())] = {
+            category: {'fingerprint': plan.fingerprints[category], 'words': words}
+            for category, words in plan.categories.items()
+        }
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Show vocabulary changes since the last generation run')
+    parser.add_argument('vocab_file', type=Path, help='Vocabulary markdown file')
+    parser.add_argument('--save', action='store_true', help='Update the snapshot after showing the diff')
+    args = parser.parse_args()
+    
+    snapshot = VocabularySnapshot()
+    plan = snapshot.plan(args.vocab_file)
+    
+    print(f"📚 {args.vocab_file}: {sum(len(w) for w in plan.categories.values())} words "
+          f"in {len(plan.categories)} categories")
+    print(f"   {plan.summary()}")
+    for label, items in (('➕', plan.added), ('➖', plan.removed), ('🔀', plan.changed)):
+        for word, category in items[:20]:
+            print(f"   {label} {word} ({category})")
+        if len(items) > 20:
+            print(f"   {label} ... and {len(items) - 20} more")
+    
+    if args.save:
+        snapshot.save(args.vocab_file, plan)
+        print(f"💾 Snapshot saved: {snapshot.path}")
+
+
+if __name__ == '__main__':
+    main()